@@ -1,23 +1,96 @@
 from typing import Annotated, TypedDict, List
 from langchain_openai import ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from langchain_core.messages import HumanMessage, AIMessage
 import json
 import os
 
-with open("openai_key.txt", "r") as f:
-    api_key = f.read().strip()  # strip /n
-os.environ["OPENAI_API_KEY"] = api_key
-
-def get_openai_llm(temperature=0):
-    return ChatOpenAI(model="gpt-3.5-turbo", temperature=temperature)
+from cassette import cassette
+from exercise_catalog import get_exercise_catalog
+from food_db import get_food_db
+from llm_gateway import invoke_routed, parse_json
+from local_llm import local_chat_model
+from model_routing import DEFAULT_BACKEND, RouteTable
+from periodization import build_program
+from plan_digest import stale_days, tag_meal_plan
+from prompt_registry import PromptRegistry
+from prompt_templates import (ADJUST_WORKOUT_COMPACT_PROMPT, ADJUST_WORKOUT_PROMPT, GOAL_ADVICE_PROMPT,
+                              HEALTH_RECOMMENDATIONS_PROMPT, MEAL_DAYS_UPDATE_PROMPT, MEAL_PLAN_COMPACT_PROMPT,
+                              MEAL_PLAN_PROMPT, PLANS_FUSED_PROMPT, WORKOUT_PLAN_COMPACT_PROMPT,
+                              WORKOUT_PLAN_PROMPT)
+from risk_model import assess
+from tracing import span, traced
+from wire_schema import compact_workout_plan, expand_meal_plan, expand_workout_plan, split_fused_plans
+from meal_macros import fill_macros_from_ingredients, validate_meal_plan
+from workout_totals import recompute_workout_totals
+
+# An on-prem deployment running only the local backend has no API key
+if DEFAULT_BACKEND != 'local' or os.path.exists("openai_key.txt"):
+    with open("openai_key.txt", "r") as f:
+        api_key = f.read().strip()  # strip /n
+    os.environ["OPENAI_API_KEY"] = api_key
+
+def get_openai_llm(temperature=0, model="gpt-3.5-turbo", timeout=None, backend=None, json_schema=None):
+    # Retries are handled by the shared rate limiter (rate_limit.py), not per client;
+    # with COVERFITNESS_CASSETTE_MODE set, calls are recorded or replayed (cassette.py).
+    # backend 'local' runs on a CPU model instead (local_llm.py), held to json_schema if given
+    if (backend or DEFAULT_BACKEND) == 'local':
+        return cassette.wrap(local_chat_model(model, temperature=temperature, timeout=timeout,
+                                              json_schema=json_schema))
+    # stream_usage: streamed responses report their token usage too, which settles the rate limiter's budget
+    return cassette.wrap(ChatOpenAI(model=model, temperature=temperature, timeout=timeout, max_retries=0,
+                                    stream_usage=True))
+
+# Per-method model, timeout and fallback (model_routes.json)
+model_routes = RouteTable(llm_factory=get_openai_llm)
+
+# Prompts are parsed once here; register more variants of a name to A/B test them
+prompts = PromptRegistry()
+prompts.register('health_recommendations', HEALTH_RECOMMENDATIONS_PROMPT)
+prompts.register('goal_advice', GOAL_ADVICE_PROMPT)
+
+# Plan prompts exist in the verbose format and a compact wire format (wire_schema.py) that
+# needs far fewer output tokens; COVERFITNESS_WIRE_FORMAT picks one, set_weights() can split traffic
+COMPACT_WIRE = os.environ.get('COVERFITNESS_WIRE_FORMAT', 'compact') == 'compact'
+for name, verbose, compact in (('generate_workout_plan', WORKOUT_PLAN_PROMPT, WORKOUT_PLAN_COMPACT_PROMPT),
+                               ('adjust_workout_plan', ADJUST_WORKOUT_PROMPT, ADJUST_WORKOUT_COMPACT_PROMPT),
+                               ('generate_meal_plan', MEAL_PLAN_PROMPT, MEAL_PLAN_COMPACT_PROMPT)):
+    prompts.register(name, verbose, weight=0.0 if COMPACT_WIRE else 1.0)
+    prompts.register(name, compact, variant='compact', weight=1.0 if COMPACT_WIRE else 0.0)
+# Both plans in one request; always in the compact format (a verbose one would be ~4k output tokens)
+prompts.register('generate_plans', PLANS_FUSED_PROMPT)
+prompts.register('update_meal_plan', MEAL_DAYS_UPDATE_PROMPT)
+
+
+def wire_plan(prompt, plan):
+    # A workout plan embedded in a prompt, in the same format the prompt asks for
+    return compact_workout_plan(plan) if prompt.variant == 'compact' else plan
+
+MET_ADJUSTMENT = 1.05
+
+# Representative METs per workout preference
+BASE_METS = {
+    "Weight training": 3.5 * MET_ADJUSTMENT,
+    "Cardio": 6.0 * MET_ADJUSTMENT,
+    "HIIT": 8.0 * MET_ADJUSTMENT,
+    "Yoga": 2.5 * MET_ADJUSTMENT,
+    "Pilates": 3.0 * MET_ADJUSTMENT,
+    "Bodyweight": 4.0 * MET_ADJUSTMENT,
+    "Swimming": 6.0 * MET_ADJUSTMENT,
+    "Running": 9.8 * MET_ADJUSTMENT,
+    "Cycling": 7.5 * MET_ADJUSTMENT
+}
+
+
+def kcal_per_min(met, weight_kg):
+    # kcal/min = MET * 3.5 * weight / 200
+    return round(met * 3.5 * weight_kg / 200, 2)
 
 class AIHealthCoach:
     def __init__(self):
         print("Initializing AIFitnessCoach")
-        self.llm = get_openai_llm()
+        self.routes = model_routes
 
+    @traced(cat='coach')
     def calculate_tdee_and_calorie_goal(self, user_data):
         """
         Calculated based on user basic data:
@@ -69,76 +142,104 @@ class AIHealthCoach:
             'goal_type': goal_type
         }
 
-    def generate_meal_plan(self, user_data, plan):
-        # Get basic data
-        goal_type = user_data['goal_type']
-        dietary_preferences = user_data['dietary_preferences']
-        dietary_notes = user_data['dietary_notes']
+    def meal_variables(self, user_data, tdee_info):
+        # Prompt variables shared by the meal prompt and the fused plans prompt
+        return {
+            "goal_type": user_data['goal_type'],
+            "dietary_preferences": ', '.join(user_data['dietary_preferences']),
+            "dietary_notes": user_data['dietary_notes'],
+            "daily_consuming_cal": tdee_info['tdee'],
+            "food_list": ', '.join(get_food_db().names),
+        }
 
+    @traced(cat='coach')
+    def generate_meal_plan(self, user_data, plan):
         # 1。
         tdee_info = self.calculate_tdee_and_calorie_goal(user_data)
 
-        meal_cot_prompt = ChatPromptTemplate.from_template("""
-        You are a certified nutrition expert specializing in personalized meal planning for fitness goals.
-
-        USER PROFILE:
-        - Fitness goal: {goal_type}
-        - TDEE (daily calorie needs): {daily_consuming_cal}
-        - Dietary preferences: {dietary_preferences}
-        - Dietary notes: {dietary_notes}
-
-        EXERCISE SCHEDULE:
-        {workout_plan}
-
-        Please design a comprehensive 7-day meal plan with the following requirements:
-        1. On exercise days, design meals that support performance and recovery, accounting for the specific exercises performed
-        2. On rest days, adjust the meal plan to support the user's fitness goals while maintaining appropriate calorie intake
-        3. Ensure all meals accommodate the user's dietary preferences and restrictions
-        4. Include macro distribution percentages for each day
-        5. Check if the total calories for each day's meal plan is reasonable for the user's physical condition and fitness goal
-
-        Output as structured JSON with the following format for each day:
-
-        {{
-          "Monday": {{
-            "Total_Calories": 1800,
-            "Macro_Distribution": "30% carbs, 40% protein, 30% fat",
-            "Exercise": "Swimming (30 min) + Yoga (20 min)",
-            "Meals": {{
-              "Breakfast": {{
-                "Menu": "Vegan protein smoothie with berries and chia seeds",
-                "Macros": "300 calories, 25g carbs, 30g protein, 12g fat"
-              }},
-              "Lunch": {{
-                "Menu": "Quinoa bowl with roasted vegetables and tofu",
-                "Macros": "650 calories, 40g carbs, 25g protein, 20g fat"
-              }},
-              "Dinner": {{
-                "Menu": "Zucchini noodles with lentil bolognese",
-                "Macros": "650 calories, 45g carbs, 35g protein, 20g fat"
-              }}
-            }},
-            "Hydration": "Minimum 2.5 liters of water, +500ml during workout"
-          }},"Tuesday":{{ ...}}, ...}}
-        """)
-
-        meal_chain = meal_cot_prompt | self.llm | StrOutputParser()
-        response = meal_chain.invoke({
-                   "goal_type": goal_type,
-                   "dietary_preferences": ', '.join(dietary_preferences),
-                   "dietary_notes": dietary_notes,
-                   "workout_plan": plan,
-                   "daily_consuming_cal": tdee_info['tdee'],
-               })
+        meal_cot_prompt = prompts.get('generate_meal_plan')
+
+        variables = self.meal_variables(user_data, tdee_info)
+        variables["workout_plan"] = wire_plan(meal_cot_prompt, plan)
+        response = invoke_routed(self.routes, 'generate_meal_plan', meal_cot_prompt, variables,
+                                 expected_output_tokens=1100 if meal_cot_prompt.variant == 'compact' else 2500)
 
         try:
-            parsed_response = json.loads(response)
+            parsed_response = expand_meal_plan(parse_json(self.routes, response))
 
         except Exception as e:
                 print("Error parsing LLM response:", e)
                 print("Raw response:", response)
                 parsed_response = {}
 
+        return tag_meal_plan(self.finish_meal_plan(parsed_response, tdee_info), plan)
+
+    @traced(cat='coach')
+    def update_meal_plan(self, user_data, meal_plan, plan):
+        """
+        Bring a meal plan in line with a changed workout plan: only the days whose
+        workouts changed (plan_digest.py) get new meals, from one request; the
+        other days are kept. Days the model leaves out keep their old meals.
+        """
+        days = stale_days(meal_plan, plan)
+        if not days:
+            return meal_plan
+        if len(days) == len(meal_plan):
+            return self.generate_meal_plan(user_data, plan)
+
+        tdee_info = self.calculate_tdee_and_calorie_goal(user_data)
+        workouts = {day_plan.get('day'): day_plan for day_plan in plan.get('weekly_plan', [])}
+
+        # 1. Ask for the changed days only
+        variables = self.meal_variables(user_data, tdee_info)
+        variables.update({
+            "days": ', '.join(days),
+            "day_workouts": {day: [[ex.get('name'), ex.get('duration_min'), ex.get('target_muscle')]
+                                   for ex in workouts[day].get('exercises', [])] if day in workouts else 'Rest day'
+                             for day in days},
+            # Days and meals that aren't dicts are skipped, as in plan_archive.flatten_meals
+            "kept_menus": ', '.join(sorted({meal.get('Menu', '') for day, day_data in meal_plan.items()
+                                            if day not in days and isinstance(day_data, dict)
+                                            for meal in (day_data.get('Meals') or {}).values()
+                                            if isinstance(meal, dict)})),
+        })
+        response = invoke_routed(self.routes, 'update_meal_plan', prompts.get('update_meal_plan'), variables,
+                                 expected_output_tokens=160 * len(days))
+
+        try:
+            new_days = expand_meal_plan(parse_json(self.routes, response))
+        except Exception as e:
+            print("Error parsing LLM response:", e)
+            print("Raw response:", response)
+            new_days = {}
+
+        # 2. Nutrition numbers for the new days, then merge them in
+        new_days = {day: day_data for day, day_data in new_days.items() if day in days}
+        missing = [day for day in days if day not in new_days]
+        if missing:
+            print("Meal update returned no meals for:", ', '.join(missing))
+        self.finish_meal_plan(new_days, tdee_info)
+        updated = dict(meal_plan)
+        updated.update(new_days)
+        return tag_meal_plan(updated, plan, days=new_days)
+
+    def finish_meal_plan(self, parsed_response, tdee_info):
+        """Fill in and check a parsed meal plan's nutrition numbers from the local food table."""
+        food_db = get_food_db()
+        with span('meal.local_macros', cat='compute', days=len(parsed_response)):
+            # 2. All nutrition numbers come from the local food table
+            unknown_foods, bad_quantities = fill_macros_from_ingredients(parsed_response, food_db)
+            if unknown_foods:
+                print("Foods not in the local table:", ', '.join(sorted(set(unknown_foods))))
+            if bad_quantities:
+                print("Ingredients without a usable quantity:", ', '.join(bad_quantities))
+
+            # 3. Check the numbers locally and rescale days that don't add up
+            macro_report = validate_meal_plan(parsed_response, tdee_info['calorie_goal'])
+        for day, day_report in macro_report.items():
+            if day_report['fixed']:
+                print(f"Rescaled {day} meal plan:", "; ".join(day_report['issues']))
+
         return parsed_response
 
 
@@ -146,7 +247,7 @@ class AIHealthCoach:
 class AIFitnessCoach:
     def __init__(self):
         print("Initializing AIFitnessCoach")
-        self.llm = get_openai_llm()
+        self.routes = model_routes
 
     # 计算 BMI 并确定身体状况和目标
     def _get_bmi(self, user_data):
@@ -154,134 +255,91 @@ class AIFitnessCoach:
         bmi = round(user_data['weight'] / (height_m ** 2), 1)
         return bmi
 
+    @traced(cat='coach')
     def health_risk_assessment(self, user_data):
-        """Placeholder function to assess health risks via LLM"""
+        """BMI category, risk scores and overall level, computed locally (see risk_model.py)"""
 
         # 先算 BMI（如果你希望直接传进去）
         user_data['bmi'] = self._get_bmi(user_data)
 
-        health_risk_prompt = ChatPromptTemplate.from_template("""
-            You are a certified fitness and nutrition expert. Analyze the user's profile and detect potential health risks.
-
-            User Profile:
-            {user_data}
-
-            Perform the following tasks:
-
-            1. Calculate and classify the BMI category (Underweight / Normal / Overweight / Obese) based on the user's BMI value.
-            2. Assess the following risks (scale: 1 = very healthy, 100 = very severe), based on BMI, user history (e.g., eating disorders, joint injuries), and goal:
-               - BMI Risk
-               - Joint Injury Risk
-               - Cardiovascular Risk
-               - Overtraining Risk
-               - Nutritional Risk
-            3. Provide one short recommendation (~20 words each) from:
-               - Diet perspective
-               - Workout perspective
-
-            Return the result as a JSON object with:
-            - bmi (float)
-            - bmi_category (string)
-            - risk_level (Low / Moderate / High, based on combined risk)
-            - risks (dict with keys above and values 1–100)
-            - recommendations (list of 2 short sentences)
-            """)
-
-        health_risk_chain = health_risk_prompt | self.llm | StrOutputParser()
-
-        result = health_risk_chain.invoke({
-            "user_data": user_data
-        })
-
-        parsed_response = json.loads(result)
-        return parsed_response
+        assessment = assess(user_data, user_data['bmi'])
+        assessment['recommendations'] = []  # filled in later by health_recommendations()
+        return assessment
+
+    @traced(cat='coach')
+    def health_recommendations(self, user_data, assessment):
+        """Two short recommendations (diet, workout) for a local assessment, via LLM"""
+        result = invoke_routed(self.routes, 'health_recommendations', prompts.get('health_recommendations'), {
+            "user_data": user_data,
+            "bmi": assessment['bmi'],
+            "bmi_category": assessment['bmi_category'],
+            "risk_level": assessment['risk_level'],
+            "risks": assessment['risks'],
+        }, expected_output_tokens=80)
+
+        parsed_response = parse_json(self.routes, result)
+        if isinstance(parsed_response, dict):
+            parsed_response = parsed_response.get('recommendations', [])
+        return [str(rec) for rec in parsed_response][:2]
 
     def _calculate_realistic_months(self, goal_type, current_weight, target_weight):
         weight_diff = abs(current_weight - target_weight)
 
-        # Safe rate rules
-        if goal_type == "Lose Weight":
+        # Safe rate rules (the UI says "Lose weight" / "Gain muscle")
+        goal = goal_type.lower()
+        if goal == "lose weight":
             safe_rate = 0.5  # kg per week
-        elif goal_type == "Gain Muscle":
+        elif goal == "gain muscle":
             safe_rate = 0.25
         else:
             safe_rate = 0.4  # fallback for rehabilitation/general
 
         weeks_needed = weight_diff / safe_rate
-        realistic_months = round(weeks_needed / 4)
+        realistic_months = max(1, round(weeks_needed / 4))
         return realistic_months, safe_rate
 
+    @traced(cat='coach')
     def enhanced_goal_feasibility(self, user_data):
+        """Verdict and timeline computed locally; the advice text comes separately from goal_advice()"""
         goal_type = user_data['goal_type']
 
         current_weight = user_data['weight']
-        target_weight = user_data['target_weight']
+        target_weight = user_data.get('target_weight', current_weight)
 
-        target_months = user_data['target_months']
+        target_months = max(1, user_data.get('target_months', 3))
 
         realistic_months, safe_rate = self._calculate_realistic_months(goal_type, current_weight, target_weight)
         is_feasible = target_months >= realistic_months
 
-        # LLM for personalized advice
-        cot_prompt = ChatPromptTemplate.from_template("""
-                 You are a certified health coach AI.
-                The user wants to {goal_type} from {current_weight} kg to {target_weight} kg in {target_months} months.
-                The assumed safe rate is {safe_rate} kg per week.
-
-                First, evaluate whether this safe rate is reasonable based on the user's current body state:
-                    - Consider basic metabolic rate (BMR), which is roughly 22 * weight in kg
-                    - Factor in realistic weekly weight fluctuation ranges from clinical research:
-                        - For fat loss: 0.5–1.0 kg/week
-                        - For muscle gain: 0.2–0.5 kg/week
-                    - If the safe rate appears too fast or too slow based on the user's body state:
-                        - Recommend a more appropriate safe rate
-                        - Recalculate the realistic timeframe accordingly:
-                            -  weight_diff = abs({current_weight} - {target_weight})
-                            -  weeks_needed = weight_diff / safe_rate
-                            -  realistic_months = round(weeks_needed / 4)
-
-                Then, determine if the goal is achievable within {target_months} months based on this analysis. Return `is_feasible` as either true or false.
-
-                Finally, give the advice: explaining why the goal timeframe might need to be adjusted or not, considering the user's body state and health perspective:
-                    - Based on the recalculated safe rate and BMR, explain whether the goal is realistic within the given timeframe.
-                    - Provide reasoning for adjusting the timeframe if necessary (e.g., faster or slower rate of progress due to body type, metabolism, and other health factors).
-                    - If the goal timeframe is feasible, explain why this is a safe and sustainable approach.
-                    - The explanation should include insights on the safe rate's appropriateness, the user's BMR, and how it impacts their ability to achieve the goal.
-                    - keep your word around 30-70 words
-
-
-                Output JSON:
-                {{
-                    "is_feasible": true/false,
-                    "suggested_timeframe": realistic_months,
-                    "advice": "text"
-                    }}
-                    """)
-
-        feasibility_chain = cot_prompt | self.llm | StrOutputParser()
-        response = feasibility_chain.invoke({
-            "goal_type": goal_type.lower(),
-            "current_weight": current_weight,
-            "target_weight": target_weight,
-            "target_months": target_months,
-            "safe_rate": safe_rate})
-
-        parsed_response = json.loads(response)
-
         # Optional: Combine with visualization data
         timeline_data = {
             'Target': [current_weight, target_weight],
             'Realistic': [current_weight, target_weight],
-            'Month': [0, target_months if target_months >= parsed_response['suggested_timeframe'] else parsed_response[
-                'suggested_timeframe']]
+            'Month': [0, max(target_months, realistic_months)]
         }
 
         return {
-            'is_feasible': parsed_response['is_feasible'],
-            'suggested_timeframe': parsed_response['suggested_timeframe'],
+            'is_feasible': is_feasible,
+            'suggested_timeframe': realistic_months,
+            'safe_rate': safe_rate,
             'timeline_data': timeline_data,
-            'advice': parsed_response['advice']}
-
+            'advice': None}
+
+    @traced(cat='coach')
+    def goal_advice(self, user_data, feasibility):
+        """Short personalized explanation of a feasibility verdict, via LLM"""
+        response = invoke_routed(self.routes, 'goal_advice', prompts.get('goal_advice'), {
+            "goal_type": user_data['goal_type'].lower(),
+            "current_weight": user_data['weight'],
+            "target_weight": user_data.get('target_weight', user_data['weight']),
+            "target_months": max(1, user_data.get('target_months', 3)),
+            "safe_rate": feasibility['safe_rate'],
+            "realistic_months": feasibility['suggested_timeframe'],
+            "verdict": "feasible" if feasibility['is_feasible'] else "too aggressive"}, expected_output_tokens=120)
+
+        return str(response).strip()
+
+    @traced(cat='coach')
     def calculate_tdee_and_calorie_goal(self, user_data):
         """
         Calculated based on user basic data:
@@ -333,6 +391,7 @@ class AIFitnessCoach:
             'goal_type': goal_type
         }
 
+    @traced(cat='coach')
     def estimate_weekly_exercise_target(self, tdee_info):
         # 1. weekly calorie goal
         daily_calorie_change, goal_type = tdee_info['daily_calorie_change'], tdee_info['goal_type']
@@ -349,6 +408,7 @@ class AIFitnessCoach:
         weekly_exercise_target = abs(weekly_net_change) * exercise_contrib_ratio
         return round(weekly_exercise_target, 2)
 
+    @traced(cat='coach')
     def search_sport_range(self, user_data, activity_list=None):
 
         height_cm = user_data['height']
@@ -356,39 +416,78 @@ class AIFitnessCoach:
         bmi = user_data['bmi']
 
         preferences = user_data['workout_preferences']
-        # METs （：MET）
-        base_mets = {
-            "Weight training": 3.5 * 1.05,
-            "Cardio": 6.0 * 1.05,
-            "HIIT": 8.0 * 1.05,
-            "Yoga": 2.5 * 1.05,
-            "Pilates": 3.0 * 1.05,
-            "Bodyweight": 4.0 * 1.05,
-            "Swimming": 6.0 * 1.05,
-            "Running": 9.8 * 1.05,
-            "Cycling": 7.5 * 1.05
-        }
-
-        #
-        if activity_list:
-            base_mets = {k: v for k, v in base_mets.items() if k in activity_list}
+        catalog = get_exercise_catalog()
 
-        # kcal/min = MET * 3.5 * weight / 200
         result = {}
-        for activity, met in base_mets.items():
-            if activity in preferences:
-                kcal_min = met * 3.5 * weight_kg / 200
-                result[activity] = round(kcal_min, 2)
+        for preference in preferences:
+            # Preferences map to a category ("weights" -> "Weight training") or a specific activity ("Tennis")
+            category = catalog.match_category(preference)
+            if category in BASE_METS:
+                activity, met = category, BASE_METS[category]
+            else:
+                i = catalog.lookup(preference)
+                if i is None:
+                    print("Unknown workout preference:", preference)
+                    continue
+                activity, met = catalog.names[i], float(catalog.met[i]) * MET_ADJUSTMENT
+
+            if activity_list and activity not in activity_list and preference not in activity_list:
+                continue
+            result[activity] = kcal_per_min(met, weight_kg)
 
         return result
 
-    def generate_workout_plan(self, user_data, sport_range=""):
-        goal_type = user_data['goal_type']
-        fitness_level = user_data['fitness_level']
-        workout_days = user_data['workout_days']
-        workout_duration = user_data['workout_duration']
-        focus_areas = user_data['focus_areas']
+    @traced(cat='coach')
+    def recompute_plan_totals(self, plan, user_data, sport_range=None, weekly_target=None):
+        """
+        Replace LLM-estimated calories with kcal/min (from the user's weight) x duration
+        and rebuild the daily totals. Attaches the weekly budget report as plan['calorie_budget'].
+        """
+        rates = {activity: kcal_per_min(met, user_data['weight']) for activity, met in BASE_METS.items()}
+        # Activities only known through the prompt's sport range (e.g. 'Bodyweight exercises')
+        for activity, rate in (sport_range or {}).items():
+            rates.setdefault(activity, rate)
 
+        if weekly_target is None:
+            weekly_target = self.estimate_weekly_exercise_target(self.calculate_tdee_and_calorie_goal(user_data))
+
+        catalog = get_exercise_catalog()
+
+        def catalog_rate(name):
+            met = catalog.met_for(name)
+            return None if met is None else kcal_per_min(met * MET_ADJUSTMENT, user_data['weight'])
+
+        report = recompute_workout_totals(plan, rates, weekly_target, lookup=catalog_rate)
+        if plan and isinstance(plan, dict):
+            plan['calorie_budget'] = report
+        return report
+
+    @traced(cat='coach')
+    def generate_program(self, base_plan, user_data, weeks=None):
+        """
+        Periodized program over the user's target_months (12-24 weeks) from one
+        base week: progressive overload, deloads and weekly calorie targets are
+        all computed locally (see periodization.py), so no further LLM calls.
+        """
+        return build_program(base_plan, user_data, self.calculate_tdee_and_calorie_goal,
+                             self.estimate_weekly_exercise_target, weeks)
+
+    def workout_variables(self, user_data, sport_range, target_consuming_cal):
+        # Prompt variables shared by the workout prompt and the fused plans prompt
+        return {
+            "goal_type": user_data['goal_type'],
+            "fitness_level": user_data['fitness_level'],
+            "workout_days": ', '.join(user_data['workout_days']),
+            "workout_duration": user_data['workout_duration'],
+            "selected_sport_context": ", ".join(
+                [f"{sport} ({mets} kcal/min)" for sport, mets in sport_range.items()]
+            ),
+            "target_consuming_cal": target_consuming_cal,
+            "focus_areas": user_data['focus_areas'],
+        }
+
+    @traced(cat='coach')
+    def generate_workout_plan(self, user_data, sport_range=""):
         """ 1.  """
         tdee_info = self.calculate_tdee_and_calorie_goal(user_data)
         target_consuming_cal = self.estimate_weekly_exercise_target(tdee_info)
@@ -396,79 +495,62 @@ class AIFitnessCoach:
         if sport_range == "":
             sport_range = {'Yoga':2.5 , 'Bodyweight exercises':5, 'Swimming':7}
 
-        selected_sport_context = ", ".join(
-            [f"{sport} ({mets} kcal/min)" for sport, mets in sport_range.items()]
-        )
-
-        cot_prompt = ChatPromptTemplate.from_template("""
-            You are a certified health and fitness coach AI.
-
-            Help design a personalized weekly workout plan for a user. The plan must:
-            - Match user's fitness goal: {goal_type}
-            - Match user's current fitness level: {fitness_level}
-            - Fit user’s schedule: available {workout_days} days per week, {workout_duration} minutes per session
-            - Fit user’s preference: top exercises are {selected_sport_context}
-            - Satisfy weekly calorie consumption target: {target_consuming_cal} kcal/week
-            - Distribute daily workouts reasonably
-
-            Tasks:
-            1. From the listed exercises, choose a daily set for each of the {workout_days} days.
-                - Each day should contain 2-4 actions (can vary).
-                - Each action should include:
-                    • Name
-                    • Duration (minutes)
-                    • Estimated calorie burn
-                    • Primary target muscle group
-                - Try not to repeat same muscle group across consecutive days.
-                - Maintain variety.
-            2. Make sure daily total:
-                - Duration ≈ {workout_duration} ± 10 minutes
-                - Total calorie burn ≈ {target_consuming_cal} / {workout_days} kcal
-            3. Incorporate user's focus areas: {focus_areas}
-                - At least one action per day should match a focus area.
-            4. For each day, suggest an order of exercises for optimal effectiveness and recovery.
-
-            Output structured JSON:
-            {{
-                "weekly_plan": [
-                    {{
-                        "day": "Monday",
-                        "exercises": [
-                            {{
-                                "name": "Swimming",
-                                "duration_min": 30,
-                                "calories_burned": 210,
-                                "target_muscle": "Full body"
-                            }},
-                            ...
-                        ],
-                        "total_duration": 60,
-                        "total_calories": 450
-                    }},
-                    ...
-                ]
-            }}
-        """)
-        workout_chain = cot_prompt | self.llm | StrOutputParser()
-        response = workout_chain.invoke({
-            "goal_type": goal_type,
-            "fitness_level": fitness_level,
-            "workout_days": ', '.join(workout_days),
-            "workout_duration": workout_duration,
-            "selected_sport_context": selected_sport_context,
-            "target_consuming_cal": target_consuming_cal,
-            "focus_areas": focus_areas
-        })
+        cot_prompt = prompts.get('generate_workout_plan')
+        response = invoke_routed(self.routes, 'generate_workout_plan', cot_prompt,
+                                 self.workout_variables(user_data, sport_range, target_consuming_cal),
+                                 expected_output_tokens=450 if cot_prompt.variant == 'compact' else 1200)
 
         try:
-            parsed_response = json.loads(response)
+            parsed_response = expand_workout_plan(parse_json(self.routes, response))
         except Exception as e:
             print("Error parsing LLM response:", e)
             print("Raw response:", response)
             parsed_response = {}
 
+        # 2. Recompute calories and day totals deterministically
+        self.recompute_plan_totals(parsed_response, user_data, sport_range, target_consuming_cal)
+
         return parsed_response
 
+    @traced(cat='coach')
+    def generate_plans(self, user_data, health_coach, sport_range=""):
+        """
+        Workout and meal plan from one request (COVERFITNESS_PLAN_MODE=fused) instead of two
+        sequential ones. A half the model got wrong is generated again on its own.
+        """
+        tdee_info = self.calculate_tdee_and_calorie_goal(user_data)
+        target_consuming_cal = self.estimate_weekly_exercise_target(tdee_info)
+
+        if sport_range == "":
+            sport_range = {'Yoga':2.5 , 'Bodyweight exercises':5, 'Swimming':7}
+
+        # 1. One request for both plans
+        variables = self.workout_variables(user_data, sport_range, target_consuming_cal)
+        variables.update(health_coach.meal_variables(user_data, tdee_info))
+        response = invoke_routed(self.routes, 'generate_plans', prompts.get('generate_plans'), variables,
+                                 expected_output_tokens=1500)
+
+        try:
+            workout_plan, meal_plan = split_fused_plans(parse_json(self.routes, response))
+        except Exception as e:
+            print("Error parsing LLM response:", e)
+            print("Raw response:", response)
+            workout_plan, meal_plan = {}, {}
+
+        # 2. Fall back to the sequential calls for whatever is missing
+        if not workout_plan.get('weekly_plan'):
+            print("Fused plans response had no usable workout plan; generating the plans separately")
+            workout_plan = self.generate_workout_plan(user_data, sport_range)
+            meal_plan = {}
+        else:
+            self.recompute_plan_totals(workout_plan, user_data, sport_range, target_consuming_cal)
+
+        if not meal_plan:
+            return {'workout': workout_plan, 'meal': health_coach.generate_meal_plan(user_data, workout_plan)}
+        meal_plan = tag_meal_plan(health_coach.finish_meal_plan(meal_plan, tdee_info), workout_plan)
+        return {'workout': workout_plan, 'meal': meal_plan}
+
+    @traced(cat='coach')
     def adjust_workout_plan(self, plan, adjust_intensity, adjust_exercises, user_data, sport_range=""):
         goal_type = user_data['goal_type']
         fitness_level = user_data['fitness_level']
@@ -487,69 +569,11 @@ class AIFitnessCoach:
             [f"{sport} ({mets} kcal/min)" for sport, mets in sport_range.items()]
         )
 
-        adjust_prompt = ChatPromptTemplate.from_template("""
-        You are a certified health and fitness coach AI.
-        The user wants to adjust their workout plan based on recent feedback.
-
-        Here is the current weekly workout plan to revise:
-        {orginal_plan}
-        
-        Adjustment instructions:
-        - Adjust workout intensity based on feedback: {adjust_intensity}
-        - Add more of these exercise types: {adjust_exercises}
-
-        Now adjust the plan by completing the following tasks:
-        1. From the listed exercises, choose a daily set for each of the {workout_days} days.
-            - Each day should contain 2-4 actions (can vary).
-            - Each action should include:
-                • Name
-                • Duration (minutes)
-                • Estimated calorie burn
-                • Primary target muscle group
-            - Avoid repeating the same muscle group on consecutive days.
-            - Maintain variety.
-
-        2. Make sure daily totals:
-            - Duration ≈ {workout_duration} ± 10 minutes
-            - Total calorie burn ≈ {target_consuming_cal} / {workout_days} kcal
-        
-        3. Incorporate user's focus areas: {focus_areas}
-            - At least one action per day should target a focus area.
-        
-        4. Suggest the best exercise order for each day to maximize effectiveness and recovery.
-
-        Context:
-        - User's goal: {goal_type}
-        - User's fitness level: {fitness_level}
-        - Preferred exercises and METs: {selected_sport_context}
-        
-        Output a valid JSON like:
-        {{
-            "weekly_plan": [
-                {{
-                    "day": "Monday",
-                    "exercises": [
-                        {{
-                            "name": "Swimming",
-                            "duration_min": 30,
-                            "calories_burned": 210,
-                            "target_muscle": "Full body"
-                        }},
-                        ...
-                    ],
-                    "total_duration": 60,
-                    "total_calories": 450
-                }},
-                ...
-            ]
-        }}
-        Make sure your output is well-structured and JSON-compatible.
-        """)
-
-
-        workout_chain = adjust_prompt | self.llm | StrOutputParser()
-        response = workout_chain.invoke({
-            "orginal_plan":plan,
+        adjust_prompt = prompts.get('adjust_workout_plan')
+
+
+        response = invoke_routed(self.routes, 'adjust_workout_plan', adjust_prompt, {
+            "orginal_plan":wire_plan(adjust_prompt, plan),
             "adjust_intensity":adjust_intensity,
             "adjust_exercises":adjust_exercises,
             "goal_type": goal_type,
@@ -559,15 +583,18 @@ class AIFitnessCoach:
             "selected_sport_context": selected_sport_context,
             "target_consuming_cal": target_consuming_cal,
             "focus_areas": focus_areas
-        })
+        }, expected_output_tokens=450 if adjust_prompt.variant == 'compact' else 1200)
 
         try:
-            parsed_response = json.loads(response)
+            parsed_response = expand_workout_plan(parse_json(self.routes, response))
         except Exception as e:
             print("Error parsing LLM response:", e)
             print("Raw response:", response)
             parsed_response = {}
 
+        # 2. Recompute calories and day totals deterministically
+        self.recompute_plan_totals(parsed_response, user_data, sport_range, target_consuming_cal)
+
         return parsed_response
 
 
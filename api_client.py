@@ -0,0 +1,117 @@
+"""
+Thin client for api_server.py.
+
+RemoteFitnessCoach / RemoteHealthCoach have the same methods as the local
+coaches, so the Streamlit app can switch to the HTTP API by setting
+COVERFITNESS_API_URL. The caller's deadline (deadline.py) is sent as
+X-Request-Timeout and also bounds the HTTP call.
+"""
+import os
+
+import httpx
+
+from deadline import DeadlineExceeded, check, current
+from rate_limit import RateLimitExceeded
+
+API_URL = os.environ.get('COVERFITNESS_API_URL')
+DEFAULT_TIMEOUT = 180.0
+
+
+class CoachAPIError(Exception):
+    pass
+
+
+class CoachAPIClient:
+    def __init__(self, base_url=API_URL, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        # One pooled, keep-alive connection set for every session in this process
+        self._http = httpx.Client(base_url=self.base_url, timeout=timeout)
+
+    def post(self, path, payload):
+        check()
+        ctx = current()
+        timeout = ctx.timeout(self.timeout) if ctx is not None else self.timeout
+        try:
+            response = self._http.post(path, json=payload, timeout=timeout,
+                                       headers={'X-Request-Timeout': f"{timeout:.3f}"})
+        except httpx.TimeoutException as e:
+            if ctx is not None and ctx.expired():
+                raise DeadlineExceeded(f"deadline exceeded calling {path}") from e
+            raise CoachAPIError(f"{path} timed out") from e
+
+        if response.status_code == 504:
+            raise DeadlineExceeded(response.json().get('detail', 'deadline exceeded'))
+        if response.status_code == 429:
+            raise RateLimitExceeded(response.json().get('detail', 'rate limited'))
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get('detail')
+            except ValueError:
+                detail = response.text
+            raise CoachAPIError(f"{path} failed ({response.status_code}): {detail}")
+        return response.json()
+
+    def get(self, path):
+        response = self._http.get(path)
+        response.raise_for_status()
+        return response.json()
+
+    def close(self):
+        self._http.close()
+
+
+class RemoteFitnessCoach:
+    """AIFitnessCoach over HTTP."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def health_risk_assessment(self, user_data):
+        assessment = self.client.post('/v1/health-risk', {'user_data': user_data})
+        user_data['bmi'] = assessment['bmi']  # the local coach stores it on user_data too
+        return assessment
+
+    def health_recommendations(self, user_data, assessment):
+        return self.client.post('/v1/health-risk/recommendations',
+                                {'user_data': user_data, 'assessment': assessment})['recommendations']
+
+    def enhanced_goal_feasibility(self, user_data):
+        return self.client.post('/v1/feasibility', {'user_data': user_data})
+
+    def goal_advice(self, user_data, feasibility):
+        return self.client.post('/v1/feasibility/advice',
+                                {'user_data': user_data, 'feasibility': feasibility})['advice']
+
+    def generate_workout_plan(self, user_data, sport_range=""):
+        return self.client.post('/v1/workout', {'user_data': user_data, 'sport_range': sport_range or None})
+
+    def adjust_workout_plan(self, plan, adjust_intensity, adjust_exercises, user_data, sport_range=""):
+        return self.client.post('/v1/workout/adjust', {
+            'user_data': user_data,
+            'plan': plan,
+            'adjust_intensity': adjust_intensity,
+            'adjust_exercises': list(adjust_exercises or []),
+            'sport_range': sport_range or None,
+        })
+
+    def generate_plans(self, user_data, health_coach=None, sport_range=""):
+        # The server uses its own health coach
+        return self.client.post('/v1/plans', {'user_data': user_data, 'sport_range': sport_range or None})
+
+    def generate_program(self, base_plan, user_data, weeks=None):
+        return self.client.post('/v1/program', {'user_data': user_data, 'base_plan': base_plan, 'weeks': weeks})
+
+
+class RemoteHealthCoach:
+    """AIHealthCoach over HTTP."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def generate_meal_plan(self, user_data, plan):
+        return self.client.post('/v1/meal', {'user_data': user_data, 'workout_plan': plan})
+
+    def update_meal_plan(self, user_data, meal_plan, plan):
+        return self.client.post('/v1/meal/update',
+                                {'user_data': user_data, 'meal_plan': meal_plan, 'workout_plan': plan})
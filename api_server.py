@@ -0,0 +1,234 @@
+"""
+Stateless HTTP API around the coaches, so the compute tier can scale
+independently of Streamlit sessions and serve other clients.
+
+    uvicorn api_server:app --host 0.0.0.0 --port 8000 --workers 4
+    python api_server.py                      # same, workers from COVERFITNESS_API_WORKERS
+
+Every request carries everything it needs (user data, plans); nothing is
+kept between requests. An optional `X-Request-Timeout` header (seconds)
+sets the deadline for the call, and a client that disconnects cancels its
+in-flight LLM work.
+"""
+import asyncio
+import os
+from typing import Any, Dict, List, Literal, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, ConfigDict, Field
+from starlette.concurrency import run_in_threadpool
+
+from deadline import CancelToken, Cancelled, DeadlineExceeded, cancellation_stats, deadline
+from PromptEngineer import AIFitnessCoach, AIHealthCoach, model_routes, prompts
+from rate_limit import RateLimitExceeded, rate_limiter
+from tracing import span, tracer
+
+DEFAULT_TIMEOUT = float(os.environ.get('COVERFITNESS_API_TIMEOUT', 180))
+
+
+class UserData(BaseModel):
+    # Same fields and ranges as step 1 of the Streamlit planner; unknown keys are kept
+    model_config = ConfigDict(extra='allow')
+
+    age: int = Field(ge=18, le=100)
+    gender: str
+    height: float = Field(ge=100, le=250)
+    weight: float = Field(ge=30, le=300)
+    dietary_preferences: List[str] = []
+    dietary_notes: str = ''
+    fitness_level: Literal['Beginner', 'Intermediate', 'Advanced'] = 'Beginner'
+    goal_type: Literal['Lose weight', 'Gain muscle', 'Improve fitness', 'Rehabilitation']
+    target_weight: Optional[float] = Field(default=None, ge=30, le=300)
+    target_months: int = Field(default=3, ge=1, le=24)
+    focus_areas: List[str] = []
+    constraints: List[str] = []
+    workout_days: List[str] = Field(min_length=1)
+    workout_duration: int = Field(ge=15, le=120)
+    workout_preferences: List[str] = []
+
+    def as_dict(self):
+        data = self.model_dump()
+        if data['target_weight'] is None:
+            data['target_weight'] = data['weight']
+        return data
+
+
+class UserRequest(BaseModel):
+    user_data: UserData
+
+
+class RecommendationsRequest(BaseModel):
+    user_data: UserData
+    assessment: Optional[Dict[str, Any]] = None
+
+
+class AdviceRequest(BaseModel):
+    user_data: UserData
+    feasibility: Optional[Dict[str, Any]] = None
+
+
+class WorkoutRequest(BaseModel):
+    user_data: UserData
+    sport_range: Optional[Dict[str, float]] = None
+
+
+class AdjustRequest(BaseModel):
+    user_data: UserData
+    plan: Dict[str, Any]
+    adjust_intensity: str
+    adjust_exercises: List[str] = []
+    sport_range: Optional[Dict[str, float]] = None
+
+
+class MealRequest(BaseModel):
+    user_data: UserData
+    workout_plan: Dict[str, Any]
+
+
+class PlansRequest(BaseModel):
+    user_data: UserData
+    sport_range: Optional[Dict[str, float]] = None
+
+
+class MealUpdateRequest(BaseModel):
+    user_data: UserData
+    meal_plan: Dict[str, Any]
+    workout_plan: Dict[str, Any]
+
+
+class ProgramRequest(BaseModel):
+    user_data: UserData
+    base_plan: Dict[str, Any]
+    weeks: Optional[int] = Field(default=None, ge=1, le=52)
+
+
+app = FastAPI(title="AI Fitness Assistant API", version="1")
+fitness_coach = AIFitnessCoach()
+health_coach = AIHealthCoach()
+
+
+async def _call(request, fn, *args):
+    """
+    Run a blocking coach method in the thread pool under the request's deadline.
+    If the client goes away first, the call is cancelled.
+    """
+    try:
+        timeout = float(request.headers.get('x-request-timeout', DEFAULT_TIMEOUT))
+    except ValueError:
+        raise HTTPException(400, "X-Request-Timeout must be a number of seconds")
+    token = CancelToken()
+
+    def run():
+        with deadline(timeout, token), span(f"api {request.url.path}", cat='api', timeout=timeout):
+            return fn(*args)
+
+    task = asyncio.ensure_future(run_in_threadpool(run))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=0.5)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                token.cancel('client disconnected')
+                raise HTTPException(499, "Client closed request")
+    except DeadlineExceeded as e:
+        raise HTTPException(504, str(e))
+    except Cancelled as e:
+        raise HTTPException(499, str(e))
+    except RateLimitExceeded as e:
+        raise HTTPException(429, str(e))
+    except (ValueError, KeyError) as e:
+        # The model returned something we could not use
+        raise HTTPException(502, f"Upstream response could not be used: {e}")
+
+
+@app.get('/healthz')
+async def healthz():
+    return {'status': 'ok'}
+
+
+@app.get('/v1/stats')
+async def stats():
+    return {
+        'routes': model_routes.stats(),
+        'prompts': prompts.stats(),
+        'rate_limiter': rate_limiter.stats,
+        'cancellations': cancellation_stats.snapshot(),
+    }
+
+
+@app.get('/v1/trace')
+async def trace():
+    # Chrome trace-event JSON of recent spans (empty unless COVERFITNESS_TRACE is set)
+    return tracer.chrome_trace()
+
+
+@app.post('/v1/health-risk')
+async def health_risk(body: UserRequest, request: Request):
+    return await _call(request, fitness_coach.health_risk_assessment, body.user_data.as_dict())
+
+
+@app.post('/v1/health-risk/recommendations')
+async def health_recommendations(body: RecommendationsRequest, request: Request):
+    user_data = body.user_data.as_dict()
+    assessment = body.assessment or fitness_coach.health_risk_assessment(user_data)
+    recommendations = await _call(request, fitness_coach.health_recommendations, user_data, assessment)
+    return {'recommendations': recommendations}
+
+
+@app.post('/v1/feasibility')
+async def feasibility(body: UserRequest, request: Request):
+    return await _call(request, fitness_coach.enhanced_goal_feasibility, body.user_data.as_dict())
+
+
+@app.post('/v1/feasibility/advice')
+async def feasibility_advice(body: AdviceRequest, request: Request):
+    user_data = body.user_data.as_dict()
+    verdict = body.feasibility or fitness_coach.enhanced_goal_feasibility(user_data)
+    return {'advice': await _call(request, fitness_coach.goal_advice, user_data, verdict)}
+
+
+@app.post('/v1/workout')
+async def workout(body: WorkoutRequest, request: Request):
+    return await _call(request, fitness_coach.generate_workout_plan, body.user_data.as_dict(),
+                       body.sport_range or "")
+
+
+@app.post('/v1/workout/adjust')
+async def adjust_workout(body: AdjustRequest, request: Request):
+    return await _call(request, fitness_coach.adjust_workout_plan, body.plan, body.adjust_intensity,
+                       body.adjust_exercises, body.user_data.as_dict(), body.sport_range or "")
+
+
+@app.post('/v1/meal')
+async def meal(body: MealRequest, request: Request):
+    return await _call(request, health_coach.generate_meal_plan, body.user_data.as_dict(), body.workout_plan)
+
+
+@app.post('/v1/plans')
+async def plans(body: PlansRequest, request: Request):
+    # Workout and meal plan from one LLM request
+    return await _call(request, fitness_coach.generate_plans, body.user_data.as_dict(), health_coach,
+                       body.sport_range or "")
+
+
+@app.post('/v1/meal/update')
+async def update_meal(body: MealUpdateRequest, request: Request):
+    # Only the days whose workouts changed get new meals
+    return await _call(request, health_coach.update_meal_plan, body.user_data.as_dict(), body.meal_plan,
+                       body.workout_plan)
+
+
+@app.post('/v1/program')
+async def program(body: ProgramRequest, request: Request):
+    return await _call(request, fitness_coach.generate_program, body.base_plan, body.user_data.as_dict(),
+                       body.weeks)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run('api_server:app',
+                host=os.environ.get('COVERFITNESS_API_HOST', '0.0.0.0'),
+                port=int(os.environ.get('COVERFITNESS_API_PORT', 8000)),
+                workers=int(os.environ.get('COVERFITNESS_API_WORKERS', 4)))
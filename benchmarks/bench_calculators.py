@@ -0,0 +1,43 @@
+"""Scalar calculators the app calls on every rerun or plan build."""
+from benchmarks import fixtures
+from benchmarks.harness import benchmark
+from PromptEngineer import AIFitnessCoach, AIHealthCoach
+from risk_model import assess
+
+
+@benchmark('calculators')
+def tdee():
+    coach, user = AIHealthCoach(), fixtures.user_data()
+    return lambda: coach.calculate_tdee_and_calorie_goal(user)
+
+
+@benchmark('calculators')
+def search_sport_range():
+    coach, user = AIFitnessCoach(), fixtures.user_data()
+    return lambda: coach.search_sport_range(user)
+
+
+@benchmark('calculators')
+def realistic_months():
+    coach = AIFitnessCoach()
+    return lambda: coach._calculate_realistic_months('Lose weight', 74.0, 66.0)
+
+
+@benchmark('calculators')
+def goal_feasibility():
+    coach, user = AIFitnessCoach(), fixtures.user_data()
+    return lambda: coach.enhanced_goal_feasibility(user)
+
+
+@benchmark('calculators')
+def health_risk():
+    user = fixtures.user_data()
+    return lambda: assess(user, user['bmi'])
+
+
+@benchmark('calculators')
+def program_24_weeks():
+    coach, user = AIFitnessCoach(), fixtures.user_data()
+    plan = fixtures.workout_plan()
+    coach.recompute_plan_totals(plan, user, fixtures.SPORT_RANGE)
+    return lambda: coach.generate_program(plan, user, weeks=24)
@@ -0,0 +1,112 @@
+"""
+Coach calls end to end and full headless page renders, against the fake LLM
+(benchmarks/fake_llm.py) so only our own code is measured.
+"""
+import copy
+import os
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+from benchmarks import fixtures
+from benchmarks.fake_llm import install
+from benchmarks.harness import benchmark
+from food_db import get_food_db
+from meal_macros import fill_macros_from_ingredients, validate_meal_plan
+from PromptEngineer import AIFitnessCoach, AIHealthCoach
+from session_memory import PlanHistory
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fitness_version.py')
+
+# Page renders vary more between runs than pure functions
+PAGE_THRESHOLD = 0.35
+
+
+@benchmark('coach')
+def generate_workout_plan():
+    install()
+    coach, user = AIFitnessCoach(), fixtures.user_data()
+    return lambda: coach.generate_workout_plan(user, fixtures.SPORT_RANGE)
+
+
+@benchmark('coach')
+def generate_meal_plan():
+    install()
+    coach, user = AIHealthCoach(), fixtures.user_data()
+    plan = fixtures.workout_plan()
+    return lambda: coach.generate_meal_plan(user, plan)
+
+
+def _app(state):
+    app = AppTest.from_file(APP, default_timeout=60)
+    for key, value in state.items():
+        app.session_state[key] = value
+    app.run()
+    if app.exception:
+        raise RuntimeError(f"{APP} raised: {app.exception[0].message}")
+    return app
+
+
+def dashboard_state(spill_dir):
+    fitness, health = AIFitnessCoach(), AIHealthCoach()
+    user = fixtures.user_data()
+
+    plan = fixtures.workout_plan()
+    fitness.recompute_plan_totals(plan, user, fixtures.SPORT_RANGE)
+    meal_plan = fixtures.meal_plan()
+    fill_macros_from_ingredients(meal_plan, get_food_db())
+    validate_meal_plan(meal_plan, health.calculate_tdee_and_calorie_goal(user)['calorie_goal'])
+    assessment = fitness.health_risk_assessment(user)
+    assessment['recommendations'] = ["Eat more vegetables.", "Train four times a week."]
+
+    storages = {}
+    for kind, value in (('workout', plan), ('meal', meal_plan),
+                        ('program', fitness.generate_program(copy.deepcopy(plan), user))):
+        storages[kind] = PlanHistory(os.path.join(spill_dir, kind))
+        storages[kind]['plan_1'] = value
+    storages['health'] = PlanHistory(os.path.join(spill_dir, 'health'), 1)
+    storages['health']['latest'] = assessment
+
+    return {
+        'page': 'fitness_planner',
+        'has_fitness_plan': True,
+        'has_meal_plan': True,
+        'user_data': user,
+        'health_storage': storages['health'],
+        'fitness_plan_storage': storages['workout'],
+        'meal_plan_storage': storages['meal'],
+        'program_storage': storages['program'],
+    }
+
+
+@benchmark('pages', threshold=PAGE_THRESHOLD, repeat=5, min_time=0)
+def fitness_dashboard():
+    install()
+    spill_dir = tempfile.TemporaryDirectory(prefix='bench-spill-')
+    app = _app(dashboard_state(spill_dir.name))
+
+    def rerun():
+        app.run()
+    # Removed with the callable once the harness is done with it (or at exit)
+    rerun.spill_dir = spill_dir
+    return rerun
+
+
+@benchmark('pages', threshold=PAGE_THRESHOLD, repeat=5, min_time=0)
+def step3_goal_feasibility():
+    install()
+    app = _app({'page': 'fitness_planner', 'fitness_plan_step': 3, 'user_data': fixtures.user_data()})
+    # Let the deferred advice arrive, so the timed reruns render the finished page
+    deadline = time.monotonic() + 30
+    while app.session_state['advice_jobs']['goal_advice']['job_id'] and time.monotonic() < deadline:
+        time.sleep(0.05)
+        app.run()
+    return app.run
+
+
+@benchmark('pages', threshold=PAGE_THRESHOLD, repeat=5, min_time=0)
+def home():
+    install()
+    app = _app({'page': 'home'})
+    return app.run
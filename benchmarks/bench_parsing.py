@@ -0,0 +1,100 @@
+"""Prompt rendering and plan parsing / post-processing at realistic sizes."""
+import copy
+
+from benchmarks import fixtures
+from benchmarks.harness import benchmark
+from food_db import get_food_db
+from llm_gateway import parse_json, render, request_key
+from meal_macros import fill_macros_from_ingredients, validate_meal_plan
+from PromptEngineer import AIFitnessCoach, AIHealthCoach, model_routes, prompts
+
+
+def _workout_variables(user, plan=None):
+    variables = {
+        'goal_type': user['goal_type'],
+        'fitness_level': user['fitness_level'],
+        'workout_days': ', '.join(user['workout_days']),
+        'workout_duration': user['workout_duration'],
+        'selected_sport_context': ', '.join(f"{s} ({m} kcal/min)" for s, m in fixtures.SPORT_RANGE.items()),
+        'target_consuming_cal': 1850.0,
+        'focus_areas': user['focus_areas'],
+    }
+    if plan is not None:
+        variables.update(orginal_plan=plan, adjust_intensity='Increase', adjust_exercises=['Rowing'])
+    return variables
+
+
+@benchmark('prompts')
+def render_workout_prompt():
+    template = prompts.get('generate_workout_plan').template
+    variables = _workout_variables(fixtures.user_data())
+    return lambda: render(template, variables)
+
+
+@benchmark('prompts')
+def render_adjust_prompt():
+    template = prompts.get('adjust_workout_plan').template
+    variables = _workout_variables(fixtures.user_data(), fixtures.workout_plan())
+    return lambda: render(template, variables)
+
+
+@benchmark('prompts')
+def render_meal_prompt():
+    # The largest prompt: embeds the workout plan and the whole food list
+    template = prompts.get('generate_meal_plan').template
+    user = fixtures.user_data()
+    variables = {
+        'goal_type': user['goal_type'],
+        'dietary_preferences': ', '.join(user['dietary_preferences']),
+        'dietary_notes': user['dietary_notes'],
+        'workout_plan': fixtures.workout_plan(),
+        'daily_consuming_cal': 2250.0,
+        'food_list': ', '.join(get_food_db().names),
+    }
+    return lambda: render(template, variables)
+
+
+@benchmark('prompts')
+def request_key_meal_prompt():
+    rendered = fixtures.meal_json() * 2  # about the size of a rendered meal prompt
+    llm = model_routes.llm('gpt-4o-mini')
+    return lambda: request_key(rendered, llm)
+
+
+@benchmark('parsing')
+def parse_workout_plan():
+    response = fixtures.workout_json()
+    return lambda: parse_json(model_routes, response)
+
+
+@benchmark('parsing')
+def parse_meal_plan():
+    response = fixtures.meal_json()
+    return lambda: parse_json(model_routes, response)
+
+
+@benchmark('parsing')
+def recompute_workout_totals():
+    coach, user = AIFitnessCoach(), fixtures.user_data()
+    plan = fixtures.workout_plan()
+    return lambda: coach.recompute_plan_totals(copy.deepcopy(plan), user, fixtures.SPORT_RANGE, 1850.0)
+
+
+@benchmark('parsing')
+def meal_macros_from_ingredients():
+    food_db = get_food_db()
+    goal = AIHealthCoach().calculate_tdee_and_calorie_goal(fixtures.user_data())['calorie_goal']
+    plan = fixtures.meal_plan()
+
+    def run():
+        meal_plan = copy.deepcopy(plan)
+        fill_macros_from_ingredients(meal_plan, food_db)
+        validate_meal_plan(meal_plan, goal)
+    return run
+
+
+@benchmark('parsing')
+def deepcopy_meal_plan():
+    # Baseline for the two benchmarks above, which copy their input every call
+    plan = fixtures.meal_plan()
+    return lambda: copy.deepcopy(plan)
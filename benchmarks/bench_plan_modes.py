@@ -0,0 +1,69 @@
+"""
+Sequential (workout request, then the meal request built on it) vs fused
+(one request for both, COVERFITNESS_PLAN_MODE=fused) plan generation.
+
+Timings use a fake model with a fixed first-token latency and token rate,
+scaled down from hosted models together so their ratio is kept. Every
+benchmark also reports, over TRIALS instant runs with answers cut off at
+TRUNCATE_PER_1K_TOKENS, the output tokens and requests per generation, how
+often a retry was needed and how often a plan was still missing after it.
+"""
+from collections import Counter
+
+from benchmarks import fixtures
+from benchmarks.fake_llm import install
+from benchmarks.harness import benchmark
+from PromptEngineer import AIFitnessCoach, AIHealthCoach
+
+# ~0.5 s to first token and ~60 tokens/s, both sped up 60x
+FIRST_TOKEN_LATENCY = 0.5 / 60
+TOKENS_PER_SECOND = 60 * 60
+TRUNCATE_PER_1K_TOKENS = 0.03
+TRIALS = 200
+
+
+def sequential(fitness, health, user):
+    workout_plan = fitness.generate_workout_plan(user, fixtures.SPORT_RANGE)
+    return {'workout': workout_plan, 'meal': health.generate_meal_plan(user, workout_plan)}
+
+
+def fused(fitness, health, user):
+    return fitness.generate_plans(user, health, fixtures.SPORT_RANGE)
+
+
+def reliability(pipeline):
+    """Per-generation usage and failure figures of `pipeline` over TRIALS runs."""
+    usage = Counter()
+    fitness, health, user = AIFitnessCoach(), AIHealthCoach(), fixtures.user_data()
+    retried = failed = 0
+    for seed in range(TRIALS):
+        install(truncate_rate=TRUNCATE_PER_1K_TOKENS, seed=seed, usage=usage)
+        truncated = usage['truncated']
+        plans = pipeline(fitness, health, user)
+        retried += usage['truncated'] > truncated
+        failed += not (plans['workout'].get('weekly_plan') and plans['meal'])
+    return {
+        'requests_per_plan': round(usage['requests'] / TRIALS, 2),
+        'output_tokens_per_plan': round(usage['output_tokens'] / TRIALS),
+        'retry_rate': round(retried / TRIALS, 3),
+        'failure_rate': round(failed / TRIALS, 3),
+    }
+
+
+def _timed(pipeline):
+    metrics = reliability(pipeline)
+    install(latency=FIRST_TOKEN_LATENCY, tokens_per_second=TOKENS_PER_SECOND)
+    fitness, health, user = AIFitnessCoach(), AIHealthCoach(), fixtures.user_data()
+    run = lambda: pipeline(fitness, health, user)
+    run.metrics = metrics
+    return run
+
+
+@benchmark('plan_modes', repeat=5, min_time=0)
+def generate_sequential():
+    return _timed(sequential)
+
+
+@benchmark('plan_modes', repeat=5, min_time=0)
+def generate_fused():
+    return _timed(fused)
@@ -0,0 +1,33 @@
+"""
+Parsing over recorded traffic: every JSON completion in the cassette at
+COVERFITNESS_CASSETTE (see cassette.py). Registered only when that cassette
+exists.
+"""
+import json
+import os
+
+from benchmarks.harness import benchmark
+from cassette import load_entries
+from llm_gateway import parse_json
+from PromptEngineer import model_routes
+
+CASSETTE = os.environ.get('COVERFITNESS_CASSETTE')
+
+
+def _recorded_json():
+    texts = [''.join(entry['chunks']) for entry in load_entries(CASSETTE)]
+    return [text for text in texts if text.lstrip()[:1] in ('{', '[')]
+
+
+if CASSETTE and os.path.exists(CASSETTE):
+    @benchmark('replay', threshold=0.25)
+    def parse_recorded_completions():
+        texts = _recorded_json()
+
+        def run():
+            for text in texts:
+                try:
+                    parse_json(model_routes, text)
+                except json.JSONDecodeError:
+                    pass  # counted by the route's parse stats, as in production
+        return run
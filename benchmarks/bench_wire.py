@@ -0,0 +1,91 @@
+"""
+Verbose vs compact wire format (wire_schema.py): output size of the plan
+completions, the cost of expanding them locally, and coach calls against a
+fake model that generates at a fixed token rate, so fewer output tokens show
+up as wall time the way they do with a real provider.
+"""
+import contextlib
+
+from benchmarks import fixtures
+from benchmarks.fake_llm import install
+from benchmarks.harness import benchmark
+from llm_gateway import parse_json
+from PromptEngineer import AIFitnessCoach, AIHealthCoach, model_routes, prompts
+from rate_limit import estimate_tokens
+from wire_schema import expand_meal_plan, expand_workout_plan
+
+# Scaled up from the ~50-100 tokens/s of hosted models to keep the suite short
+TOKENS_PER_SECOND = 4000
+PLAN_PROMPTS = ('generate_workout_plan', 'adjust_workout_plan', 'generate_meal_plan')
+
+
+def _output_tokens(verbose, compact):
+    v, c = estimate_tokens(verbose), estimate_tokens(compact)
+    return {'output_tokens_verbose': v, 'output_tokens_compact': c,
+            'output_tokens_saved': round(1 - c / v, 3)}
+
+
+@contextlib.contextmanager
+def _variant(variant):
+    """Serve only `variant` of the plan prompts, restoring the configured weights afterwards."""
+    saved = {name: {v: p.weight for v, p in prompts.variants(name).items()} for name in PLAN_PROMPTS}
+    for name in PLAN_PROMPTS:
+        prompts.set_weights(name, {v: 1.0 if v == variant else 0.0 for v in saved[name]})
+    try:
+        yield
+    finally:
+        for name, weights in saved.items():
+            prompts.set_weights(name, weights)
+
+
+def _with_variant(variant, fn):
+    def run():
+        with _variant(variant):
+            return fn()
+    return run
+
+
+@benchmark('wire')
+def expand_workout():
+    response = fixtures.workout_json(compact=True)
+    run = lambda: expand_workout_plan(parse_json(model_routes, response))
+    run.metrics = _output_tokens(fixtures.workout_json(), response)
+    return run
+
+
+@benchmark('wire')
+def expand_meal():
+    response = fixtures.meal_json(compact=True)
+    run = lambda: expand_meal_plan(parse_json(model_routes, response))
+    run.metrics = _output_tokens(fixtures.meal_json(), response)
+    return run
+
+
+@benchmark('wire', repeat=3, min_time=0)
+def workout_plan_verbose():
+    install(tokens_per_second=TOKENS_PER_SECOND)
+    coach, user = AIFitnessCoach(), fixtures.user_data()
+    return _with_variant('default', lambda: coach.generate_workout_plan(user, fixtures.SPORT_RANGE))
+
+
+@benchmark('wire', repeat=3, min_time=0)
+def workout_plan_compact():
+    install(tokens_per_second=TOKENS_PER_SECOND)
+    coach, user = AIFitnessCoach(), fixtures.user_data()
+    return _with_variant('compact', lambda: coach.generate_workout_plan(user, fixtures.SPORT_RANGE))
+
+
+@benchmark('wire', repeat=3, min_time=0)
+def meal_plan_verbose():
+    install(tokens_per_second=TOKENS_PER_SECOND)
+    coach, user = AIHealthCoach(), fixtures.user_data()
+    plan = fixtures.workout_plan()
+    return _with_variant('default', lambda: coach.generate_meal_plan(user, plan))
+
+
+@benchmark('wire', repeat=3, min_time=0)
+def meal_plan_compact():
+    install(tokens_per_second=TOKENS_PER_SECOND)
+    coach, user = AIHealthCoach(), fixtures.user_data()
+    plan = fixtures.workout_plan()
+    return _with_variant('compact', lambda: coach.generate_meal_plan(user, plan))
@@ -0,0 +1,106 @@
+"""
+In-process stand-in for ChatOpenAI so benchmarks measure our code, not the
+network. The answer is picked from the prompt (which coach method asked) and
+can be delayed and streamed in chunks like the real API, and cut off at
+random (`truncate_rate`) the way long completions sometimes are.
+
+    from benchmarks.fake_llm import install
+    install(latency=0.0)   # every routed coach call now hits FakeCoachLLM
+"""
+import json
+import random
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from benchmarks import fixtures
+from rate_limit import estimate_tokens
+
+RECOMMENDATIONS = json.dumps([
+    "Swap refined snacks for vegetables and legumes to trim about 300 kcal a day without losing protein.",
+    "Do low-impact cardio such as swimming or cycling four times a week to spare the knees.",
+])
+ADVICE = ("Losing 8 kg in six months is about 0.3 kg per week, well inside the 0.5-1.0 kg/week range that "
+          "preserves muscle. Your BMR is roughly 1630 kcal, so a moderate deficit with regular training keeps "
+          "the pace sustainable.")
+
+
+def answer_for(prompt):
+    """Canned answer for the coach prompt that produced `prompt`."""
+    compact = 'Output compact JSON' in prompt
+    if 'JSON list of the 2 sentences' in prompt:
+        return RECOMMENDATIONS
+    if 'Return only the advice text' in prompt:
+        return ADVICE
+    if 'one JSON object with both plans' in prompt:
+        return fixtures.plans_json()
+    if '7-day meal plan' in prompt:  # before the workout check: the meal prompt embeds the workout plan
+        return fixtures.meal_json(compact=compact)
+    if 'workout plan' in prompt:
+        return fixtures.workout_json(compact=compact)
+    return '{}'
+
+
+class FakeCoachLLM(BaseChatModel):
+    model_name: str = 'fake-coach'
+    temperature: float = 0
+    latency: float = 0.0           # seconds before the first token
+    tokens_per_second: float = 0   # generation speed; 0 = instant
+    chunk_chars: int = 64
+    truncate_rate: float = 0.0     # chance per 1000 output tokens that the answer is cut off
+    rng: Any = None
+    usage: Any = None              # dict counting requests, output tokens and truncated answers
+
+    @property
+    def _llm_type(self):
+        return 'fake-coach'
+
+    def _text(self, messages):
+        time.sleep(self.latency)
+        text = answer_for('\n'.join(str(m.content) for m in messages))
+        truncated = False
+        if self.truncate_rate and self.rng.random() < 1 - (1 - self.truncate_rate) ** (estimate_tokens(text) / 1000):
+            text = text[:self.rng.randrange(1, len(text))]
+            truncated = True
+        if self.usage is not None:
+            self.usage['requests'] += 1
+            self.usage['output_tokens'] += estimate_tokens(text)
+            self.usage['truncated'] += truncated
+        return text
+
+    def _generation_time(self, text):
+        return estimate_tokens(text) / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        text = self._text(messages)
+        time.sleep(self._generation_time(text))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        text = self._text(messages)
+        for i in range(0, len(text), self.chunk_chars):
+            chunk = text[i:i + self.chunk_chars]
+            time.sleep(self._generation_time(chunk))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+
+def install(latency=0.0, routes=None, tokens_per_second=0, truncate_rate=0.0, seed=0, usage=None):
+    """Point the coaches' route table (PromptEngineer.model_routes) at FakeCoachLLM."""
+    if routes is None:
+        from PromptEngineer import model_routes as routes
+    rng = random.Random(seed)
+
+    def factory(temperature=0, model='fake-coach', timeout=None, **options):
+        return FakeCoachLLM(model_name=model, temperature=temperature, latency=latency,
+                            tokens_per_second=tokens_per_second, truncate_rate=truncate_rate, rng=rng,
+                            usage=usage)
+
+    with routes._lock:
+        routes.llm_factory = factory
+        routes._clients.clear()
+    return routes
@@ -0,0 +1,109 @@
+"""
+Deterministic inputs at realistic sizes: a user from step 1 of the planner,
+a workout plan and a 7-day meal plan built from the local exercise and food
+tables, shaped like the LLM's answers.
+"""
+import copy
+import json
+import random
+
+from exercise_catalog import get_exercise_catalog
+from food_db import get_food_db
+from wire_schema import compact_meal_plan, compact_workout_plan
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+MEALS = ['Breakfast', 'Snack', 'Lunch', 'Dinner']
+
+USER_DATA = {
+    'age': 34,
+    'gender': 'Female',
+    'height': 168.0,
+    'weight': 74.0,
+    'dietary_preferences': ['Vegetarian'],
+    'dietary_notes': 'No peanuts',
+    'fitness_level': 'Intermediate',
+    'goal_type': 'Lose weight',
+    'target_weight': 66.0,
+    'target_months': 6,
+    'focus_areas': ['Core', 'Legs'],
+    'constraints': ['Joint injury'],
+    'workout_days': ['Monday', 'Tuesday', 'Thursday', 'Friday', 'Saturday'],
+    'workout_duration': 60,
+    'workout_preferences': ['Weight training', 'Cardio', 'Yoga', 'Swimming', 'Tennis', 'Rowing'],
+    'bmi': 26.2,
+}
+
+SPORT_RANGE = {'Weight training': 4.8, 'Cardio': 8.2, 'Yoga': 3.4, 'Swimming': 8.2}
+
+
+def user_data():
+    return dict(USER_DATA)
+
+
+def workout_plan(days=5, exercises_per_day=5, sessions=3, seed=7):
+    """`days` training days cycling through `sessions` distinct sessions, as plans usually do."""
+    rng = random.Random(seed)
+    catalog = get_exercise_catalog()
+    templates = []
+    for _ in range(sessions):
+        exercises = []
+        for i in rng.sample(range(len(catalog.names)), exercises_per_day):
+            duration = rng.choice([8, 10, 12, 15])
+            exercises.append({
+                'name': catalog.names[i],
+                'duration_min': duration,
+                'calories_burned': duration * rng.randint(4, 10),
+                'target_muscle': rng.choice(['Legs', 'Core', 'Chest', 'Back', 'Full body']),
+            })
+        templates.append(exercises)
+    plan = []
+    for n, day in enumerate(DAYS[:days]):
+        exercises = [dict(ex) for ex in templates[n % sessions]]
+        plan.append({
+            'day': day,
+            'exercises': exercises,
+            'total_duration': sum(ex['duration_min'] for ex in exercises),
+            'total_calories': sum(ex['calories_burned'] for ex in exercises),
+        })
+    return {'weekly_plan': plan}
+
+
+def meal_plan(days=7, ingredients_per_meal=4, breakfasts=3, seed=11):
+    """Distinct lunches, dinners and snacks; breakfast rotates through `breakfasts` options."""
+    rng = random.Random(seed)
+    foods = get_food_db().names
+
+    def meal():
+        items = [{'food': food, 'grams': rng.choice([30, 50, 80, 100, 150, 200])}
+                 for food in rng.sample(foods, ingredients_per_meal)]
+        return {'Menu': ' with '.join(item['food'] for item in items[:2]).capitalize(), 'Ingredients': items}
+
+    breakfast_options = [meal() for _ in range(breakfasts)]
+    plan = {}
+    for n, day in enumerate(DAYS[:days]):
+        meals = {name: copy.deepcopy(breakfast_options[n % breakfasts]) if name == 'Breakfast' else meal()
+                 for name in MEALS}
+        plan[day] = {'Exercise': 'Swimming (30 min) + Yoga (20 min)', 'Meals': meals,
+                     'Hydration': 'Minimum 2.5 liters of water, +500ml during workout'}
+    return plan
+
+
+# Completions as the model writes them: pretty-printed in the verbose format, minified in the
+# compact wire format (wire_schema.py), whose prompts ask for "compact JSON only"
+def _completion(value, compact):
+    return json.dumps(value, separators=(',', ':')) if compact else json.dumps(value, indent=2)
+
+
+def workout_json(compact=False, **kwargs):
+    plan = workout_plan(**kwargs)
+    return _completion(compact_workout_plan(plan) if compact else plan, compact)
+
+
+def meal_json(compact=False, **kwargs):
+    plan = meal_plan(**kwargs)
+    return _completion(compact_meal_plan(plan) if compact else plan, compact)
+
+
+def plans_json():
+    # Fused mode answer (PLANS_FUSED_PROMPT): both plans in the compact format
+    return _completion({'w': compact_workout_plan(workout_plan()), 'm': compact_meal_plan(meal_plan())}, True)
@@ -0,0 +1,153 @@
+"""
+Minimal benchmark harness.
+
+A benchmark is a function registered with @benchmark that does its setup and
+returns the callable to time (optionally carrying a `metrics` dict of extra
+figures, e.g. token counts, stored next to the timings):
+
+    @benchmark('calculators')
+    def tdee():
+        coach, user = AIHealthCoach(), fixtures.user_data()
+        return lambda: coach.calculate_tdee_and_calorie_goal(user)
+
+The callable is run in batches sized so one batch takes at least `min_time`
+seconds; `repeat` batches give the per-call samples. Results are compared
+with a baseline on the median, and a benchmark counts as regressed when it is
+more than `threshold` (a fraction, per benchmark) slower.
+"""
+from datetime import datetime, timezone
+import fnmatch
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+DEFAULT_THRESHOLD = 0.2
+
+REGISTRY = {}
+
+
+class Benchmark:
+    def __init__(self, name, group, setup, threshold, repeat, min_time):
+        self.name = name
+        self.group = group
+        self.setup = setup
+        self.threshold = threshold
+        self.repeat = repeat
+        self.min_time = min_time
+
+
+def benchmark(group, name=None, threshold=DEFAULT_THRESHOLD, repeat=7, min_time=0.05):
+    def decorator(setup):
+        full_name = f"{group}.{name or setup.__name__}"
+        REGISTRY[full_name] = Benchmark(full_name, group, setup, threshold, repeat, min_time)
+        return setup
+    return decorator
+
+
+def measure(fn, repeat=7, min_time=0.05):
+    """Per-call timings (seconds) of `fn`, like timeit's autorange + repeat."""
+    fn()  # warm caches (catalogs, compiled prompts, imports)
+
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        # Aim a bit past min_time, but never more than 10x per step
+        number = min(number * 10, max(number + 1, int(number * min_time * 1.2 / max(elapsed, 1e-9))))
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - started) / number)
+
+    return {
+        'number': number,
+        'repeat': repeat,
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'stdev': statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        'max': max(samples),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(patterns=None, log=print):
+    """Run the registered benchmarks whose name matches any of `patterns` (fnmatch, substring)."""
+    results = {}
+    for name, bench in sorted(REGISTRY.items()):
+        if patterns and not any(p in name or fnmatch.fnmatch(name, p) for p in patterns):
+            continue
+        fn = bench.setup()
+        stats = measure(fn, bench.repeat, bench.min_time)
+        stats.update(group=bench.group, threshold=bench.threshold)
+        stats.update(getattr(fn, 'metrics', {}))  # non-timing figures a benchmark attaches to its callable
+        results[name] = stats
+        log(f"{name:<45} {_fmt(stats['median']):>10}  (±{_fmt(stats['stdev'])}, {stats['number']} loops)")
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=None):
+    """
+    [(name, baseline_median, median, ratio, status)] with status one of
+    'regressed', 'improved', 'ok', 'new'. `threshold` overrides the
+    per-benchmark thresholds.
+    """
+    rows = []
+    base_results = baseline.get('results', {})
+    for name, stats in sorted(current['results'].items()):
+        base = base_results.get(name)
+        if base is None:
+            rows.append((name, None, stats['median'], None, 'new'))
+            continue
+        limit = threshold if threshold is not None else stats.get('threshold', DEFAULT_THRESHOLD)
+        ratio = stats['median'] / base['median'] if base['median'] else float('inf')
+        if ratio > 1 + limit:
+            status = 'regressed'
+        elif ratio < 1 / (1 + limit):
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append((name, base['median'], stats['median'], ratio, status))
+    return rows
+
+
+def _fmt(seconds):
+    if seconds is None:
+        return '-'
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def format_comparison(rows):
+    lines = [f"{'benchmark':<45} {'baseline':>10} {'current':>10} {'change':>8}  status"]
+    for name, base, median, ratio, status in rows:
+        change = f"{(ratio - 1) * 100:+.1f}%" if ratio is not None else '-'
+        lines.append(f"{name:<45} {_fmt(base):>10} {_fmt(median):>10} {change:>8}  {status}")
+    return '\n'.join(lines)
@@ -0,0 +1,75 @@
+"""
+Run the benchmark suite and compare it with a baseline.
+
+    python -m benchmarks.run                       # everything; compare with benchmarks/baseline.json if present
+    python -m benchmarks.run -k calculators -k parsing
+    python -m benchmarks.run --save-baseline       # make this run the new baseline
+    python -m benchmarks.run --threshold 0.1       # stricter than the per-benchmark thresholds
+
+Results are written as JSON (--out). The exit status is 1 when any
+benchmark regressed past its threshold. Baselines are machine-specific:
+record one on the machine that runs the comparison.
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+
+# The suite calls the coaches thousands of times; the client-side OpenAI
+# budget must not throttle the fake LLM
+os.environ.setdefault('OPENAI_RPM', '100000000')
+os.environ.setdefault('OPENAI_TPM', '100000000000')
+
+from benchmarks.harness import REGISTRY, compare, format_comparison, run  # noqa: E402
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODULES = ['benchmarks.bench_calculators', 'benchmarks.bench_parsing', 'benchmarks.bench_pages',
+           'benchmarks.bench_plan_modes', 'benchmarks.bench_replay', 'benchmarks.bench_wire']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='patterns', action='append', help="only benchmarks whose name contains this")
+    parser.add_argument('--out', default=os.path.join(HERE, 'results', 'latest.json'))
+    parser.add_argument('--baseline', default=os.path.join(HERE, 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="write this run to --baseline")
+    parser.add_argument('--threshold', type=float, help="override the per-benchmark regression thresholds")
+    parser.add_argument('--list', action='store_true', help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    for module in MODULES:
+        importlib.import_module(module)
+    if args.list:
+        print('\n'.join(sorted(REGISTRY)))
+        return 0
+
+    current = run(args.patterns)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump(current, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    rows = compare(current, baseline, args.threshold)
+    print(f"\nCompared with {args.baseline} (commit {baseline.get('meta', {}).get('commit')}):")
+    print(format_comparison(rows))
+    regressed = [row[0] for row in rows if row[4] == 'regressed']
+    if regressed:
+        print(f"\n{len(regressed)} regression(s): {', '.join(regressed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+"""
+Record / replay of LLM interactions ("cassettes").
+
+With COVERFITNESS_CASSETTE_MODE=record every chat model call made by the
+coaches is passed through and captured, including the time of each streamed
+chunk, as one gzip'd JSON line keyed by the prompt hash (model, temperature
+and messages):
+
+    <COVERFITNESS_CASSETTE>/cassette-<date>-<pid>.jsonl.gz
+
+With `replay` the calls are served from those files with the original
+first-token and chunk timing, with `replay-fast` without any delay. Nothing
+goes to the network when replaying; a request that was never recorded
+raises CassetteMiss. Identical prompts recorded several times are replayed
+in recorded order.
+
+    COVERFITNESS_CASSETTE_MODE=record COVERFITNESS_CASSETTE=cassettes uvicorn api_server:app
+    COVERFITNESS_CASSETTE_MODE=replay COVERFITNESS_CASSETTE=cassettes uvicorn api_server:app
+
+    python cassette.py summary cassettes/            # requests, models, latency percentiles
+    python cassette.py diff old/ new/                # same prompts: changed outputs, latency change
+"""
+import atexit
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import glob
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+CASSETTE_PATH = os.environ.get('COVERFITNESS_CASSETTE', 'cassettes')
+CASSETTE_MODE = os.environ.get('COVERFITNESS_CASSETTE_MODE', 'off')
+MODES = ('off', 'record', 'replay', 'replay-fast')
+
+
+class CassetteMiss(Exception):
+    pass
+
+
+def prompt_hash(model, temperature, messages):
+    payload = json.dumps({'model': model, 'temperature': temperature,
+                          'messages': [[m.type, str(m.content)] for m in messages]}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+
+def load_entries(path):
+    """Every entry of a cassette file, or of all *.jsonl.gz files in a directory, oldest file first."""
+    paths = sorted(glob.glob(os.path.join(path, '*.jsonl.gz'))) if os.path.isdir(path) else [path]
+    entries = []
+    for file_path in paths:
+        try:
+            with gzip.open(file_path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        entries.append(json.loads(line))
+        except EOFError:
+            # The recording process died before closing the file; keep what was flushed
+            print(f"Cassette {file_path} is truncated; using the complete entries only")
+    return entries
+
+
+class Cassette:
+    """
+    One recording session (record mode) or a loaded set of recordings
+    (replay modes). Thread-safe; shared by every model the coaches build.
+    """
+
+    def __init__(self, path=CASSETTE_PATH, mode=CASSETTE_MODE, flush_every=20):
+        if mode not in MODES:
+            raise ValueError(f"COVERFITNESS_CASSETTE_MODE must be one of {', '.join(MODES)}, not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._file = None
+        self._unflushed = 0
+        self._entries = defaultdict(list)  # key -> recordings, in recorded order
+        self._served = defaultdict(int)
+        self.stats = {'recorded': 0, 'hits': 0, 'misses': 0}
+
+        if mode == 'record':
+            os.makedirs(path, exist_ok=True)
+            name = f"cassette-{datetime.now(timezone.utc):%Y%m%d}-{os.getpid()}.jsonl.gz"
+            self._file = gzip.open(os.path.join(path, name), 'at', encoding='utf-8')
+            atexit.register(self.close)
+        elif mode in ('replay', 'replay-fast'):
+            for entry in load_entries(path):
+                self._entries[entry['key']].append(entry)
+
+    @property
+    def replaying(self):
+        return self.mode in ('replay', 'replay-fast')
+
+    # ---------------- record ----------------
+    def record(self, key, model, chunks, started, streamed, prompt_chars):
+        """`chunks` are (monotonic time, text) pairs of one finished response."""
+        entry = {
+            'key': key,
+            'model': model,
+            'recorded_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'streamed': streamed,
+            'prompt_chars': prompt_chars,
+            # Seconds since the previous chunk (since the request for the first one)
+            'delays': [round(t - previous, 4) for (t, _), previous in zip(chunks, [started] + [t for t, _ in chunks])],
+            'chunks': [text for _, text in chunks],
+            'latency': round(chunks[-1][0] - started, 4) if chunks else round(time.monotonic() - started, 4),
+        }
+        with self._lock:
+            self._file.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            self.stats['recorded'] += 1
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self._file.flush()
+                self._unflushed = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # ---------------- replay ----------------
+    def lookup(self, key):
+        with self._lock:
+            recordings = self._entries.get(key)
+            if not recordings:
+                self.stats['misses'] += 1
+                raise CassetteMiss(f"no recording for prompt {key[:12]} in {self.path}")
+            entry = recordings[self._served[key] % len(recordings)]
+            self._served[key] += 1
+            self.stats['hits'] += 1
+            return entry
+
+    def replay(self, entry):
+        """Yield the recorded chunks, sleeping the recorded delays unless in replay-fast mode."""
+        for delay, text in zip(entry['delays'], entry['chunks']):
+            if self.mode == 'replay' and delay > 0:
+                time.sleep(delay)
+            yield text
+
+    def wrap(self, llm):
+        """The chat model to use: `llm` itself when cassettes are off."""
+        if self.mode == 'off':
+            return llm
+        return CassetteLLM(inner=llm, cassette=self,
+                           model_name=getattr(llm, 'model_name', None) or getattr(llm, 'model', 'unknown'),
+                           temperature=getattr(llm, 'temperature', 0) or 0,
+                           request_timeout=getattr(llm, 'request_timeout', None))
+
+
+class CassetteLLM(BaseChatModel):
+    """Chat model wrapper that records calls of `inner` or replays them from `cassette`."""
+
+    inner: Any
+    cassette: Any
+    model_name: str
+    temperature: float = 0
+    request_timeout: Any = None
+
+    @property
+    def _llm_type(self):
+        return 'cassette'
+
+    def _key(self, messages):
+        return prompt_hash(self.model_name, self.temperature, messages)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        key = self._key(messages)
+        if self.cassette.replaying:
+            text = ''.join(self.cassette.replay(self.cassette.lookup(key)))
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+        started = time.monotonic()
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        text = result.generations[0].message.content
+        self.cassette.record(key, self.model_name, [(time.monotonic(), text)], started, False,
+                             sum(len(str(m.content)) for m in messages))
+        return result
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        key = self._key(messages)
+        if self.cassette.replaying:
+            for text in self.cassette.replay(self.cassette.lookup(key)):
+                yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            return
+
+        started = time.monotonic()
+        chunks = []
+        for chunk in self.inner._stream(messages, stop=stop, **kwargs):
+            chunks.append((time.monotonic(), chunk.message.content))
+            yield chunk
+        # Only complete responses are recorded; an abandoned stream never reaches this line
+        self.cassette.record(key, self.model_name, chunks, started, True,
+                             sum(len(str(m.content)) for m in messages))
+
+
+# ---------------- offline analysis ----------------
+def summarize(entries):
+    latencies = [e['latency'] for e in entries]
+    ttfts = [e['delays'][0] for e in entries if e['streamed'] and e['delays']]
+    return {
+        'requests': len(entries),
+        'distinct_prompts': len({e['key'] for e in entries}),
+        'models': dict(Counter(e['model'] for e in entries).most_common()),
+        'latency_p50': _percentile(latencies, 0.5),
+        'latency_p99': _percentile(latencies, 0.99),
+        'ttft_p50': _percentile(ttfts, 0.5),
+        'output_chars': sum(len(''.join(e['chunks'])) for e in entries),
+    }
+
+
+def diff(old_entries, new_entries):
+    """Compare the first recording of every prompt present in both sets."""
+    old = {}
+    for e in old_entries:
+        old.setdefault(e['key'], e)
+    new = {}
+    for e in new_entries:
+        new.setdefault(e['key'], e)
+    common = sorted(set(old) & set(new))
+    changed = [k for k in common if ''.join(old[k]['chunks']) != ''.join(new[k]['chunks'])]
+    return {
+        'common_prompts': len(common),
+        'only_old': len(set(old) - set(new)),
+        'only_new': len(set(new) - set(old)),
+        'changed_outputs': len(changed),
+        'changed_keys': [k[:12] for k in changed[:20]],
+        'latency_p50': [_percentile([old[k]['latency'] for k in common], 0.5),
+                        _percentile([new[k]['latency'] for k in common], 0.5)],
+        'latency_p99': [_percentile([old[k]['latency'] for k in common], 0.99),
+                        _percentile([new[k]['latency'] for k in common], 0.99)],
+    }
+
+
+# Shared by every model built in this process (see PromptEngineer.get_openai_llm)
+cassette = Cassette()
+
+
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) >= 3 and sys.argv[1] == 'summary':
+        print(json.dumps(summarize(load_entries(sys.argv[2])), indent=2))
+    elif len(sys.argv) >= 4 and sys.argv[1] == 'diff':
+        print(json.dumps(diff(load_entries(sys.argv[2]), load_entries(sys.argv[3])), indent=2))
+    else:
+        print("usage: python cassette.py summary <cassette> | diff <old> <new>")
+        sys.exit(2)
@@ -0,0 +1,148 @@
+from contextlib import contextmanager
+import contextvars
+import threading
+import time
+
+
+class Cancelled(Exception):
+    pass
+
+
+class DeadlineExceeded(Cancelled):
+    pass
+
+
+class CancelToken:
+    """Cancellation flag shared by everything started from one UI action."""
+
+    def __init__(self, parent=None):
+        self._event = threading.Event()
+        self._reason = None
+        self.parent = parent
+
+    def cancel(self, reason='cancelled'):
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    @property
+    def reason(self):
+        if self._reason is None and self.parent is not None:
+            return self.parent.reason
+        return self._reason
+
+    @property
+    def cancelled(self):
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    def wait(self, timeout=None):
+        """Block until this token or a parent is cancelled, or `timeout` passes; True if cancelled."""
+        if self.parent is None:
+            return self._event.wait(timeout)
+        # A parent's cancel doesn't set our event, so poll it
+        end = None if timeout is None else time.monotonic() + timeout
+        while not self.cancelled:
+            remaining = None if end is None else end - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._event.wait(0.05 if remaining is None else min(0.05, remaining))
+        return True
+
+
+class Deadline:
+    """An absolute expiry time (monotonic clock) plus a cancel token."""
+
+    def __init__(self, expires_at=None, token=None):
+        self.expires_at = expires_at
+        self.token = token or CancelToken()
+
+    def remaining(self):
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def check(self):
+        if self.token.cancelled:
+            raise Cancelled(self.token.reason or 'cancelled')
+        if self.expired():
+            raise DeadlineExceeded('deadline exceeded')
+
+    def timeout(self, limit=None):
+        """Seconds a blocking call may take: the smaller of `limit` and what is left."""
+        left = self.remaining()
+        if left is None:
+            return limit
+        return left if limit is None else min(limit, left)
+
+
+_current = contextvars.ContextVar('coverfitness_deadline', default=None)
+
+
+def current():
+    return _current.get()
+
+
+def check():
+    """Raise Cancelled / DeadlineExceeded if the current context has been abandoned."""
+    ctx = _current.get()
+    if ctx is not None:
+        ctx.check()
+
+
+@contextmanager
+def deadline(seconds=None, token=None):
+    """
+    Run the block under a deadline `seconds` from now and/or a cancel token.
+
+    Nested blocks can only shorten the deadline, and cancelling the outer
+    token cancels the inner one. The context is a contextvar, so it follows
+    the call into coach methods and into JobQueue workers (which run jobs
+    in the submitter's context).
+    """
+    outer = _current.get()
+    expires_at = None if seconds is None else time.monotonic() + seconds
+    if outer is not None and outer.expires_at is not None:
+        expires_at = outer.expires_at if expires_at is None else min(expires_at, outer.expires_at)
+    if token is None:
+        token = CancelToken(parent=outer.token if outer else None)
+    elif outer is not None and token is not outer.token and token.parent is None:
+        token.parent = outer.token
+    reset = _current.set(Deadline(expires_at, token))
+    try:
+        yield _current.get()
+    finally:
+        _current.reset(reset)
+
+
+class CancellationStats:
+    """Counts of LLM work that was abandoned, and what it cost."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {'cancelled': 0, 'deadline_exceeded': 0, 'skipped_jobs': 0,
+                       'wasted_seconds': 0.0, 'abandoned_tokens': 0}
+        self.by_method = {}
+
+    def record(self, method, error, elapsed=0.0, estimated_tokens=0):
+        kind = 'deadline_exceeded' if isinstance(error, DeadlineExceeded) else 'cancelled'
+        with self._lock:
+            self.totals[kind] += 1
+            self.totals['wasted_seconds'] += elapsed
+            self.totals['abandoned_tokens'] += estimated_tokens
+            counts = self.by_method.setdefault(method or 'unknown', {'cancelled': 0, 'deadline_exceeded': 0})
+            counts[kind] += 1
+
+    def record_skipped_job(self):
+        with self._lock:
+            self.totals['skipped_jobs'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.totals, 'by_method': {m: dict(c) for m, c in self.by_method.items()}}
+
+
+# Shared by every coach in this process
+cancellation_stats = CancellationStats()
@@ -0,0 +1,257 @@
+from array import array
+from functools import lru_cache
+import csv
+import difflib
+import os
+
+EXERCISES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'exercises.csv')
+
+
+# Words that say nothing about which activity is meant
+_STOPWORDS = {'exercise', 'workout', 'session', 'and', 'with', 'the', 'of'}
+
+
+def normalize(name):
+    return ' '.join(str(name).lower().replace('-', ' ').replace('_', ' ').replace("'", '').split())
+
+
+def _stem(word):
+    """Crude stemmer: 'squats' -> 'squat', 'swimming' -> 'swim', 'lunges' -> 'lung'."""
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        word = word[:-1]
+    if len(word) > 5 and word.endswith('ing'):
+        word = word[:-3]
+    if len(word) > 3 and word.endswith('e'):
+        word = word[:-1]
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'aeiouls':
+        word = word[:-1]
+    return word
+
+
+def _plain(word):
+    """Plural only: 'squats' -> 'squat', 'lunges' -> 'lunge'; 'rowing' stays 'rowing'."""
+    if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+# Generic names -> the entry that stands for the whole activity
+GENERIC = {
+    'walking': 'Walking 3.0 mph',
+    'walk': 'Walking 3.0 mph',
+    'rowing': 'Rowing machine moderate',
+    'indoor rowing': 'Rowing machine moderate',
+    'rowing machine': 'Rowing machine moderate',
+    'running': 'Running 6 mph',
+    'run': 'Running 6 mph',
+    'cycling': 'Cycling 12-13.9 mph',
+    'biking': 'Cycling 12-13.9 mph',
+    'indoor cycling': 'Stationary bike moderate',
+    'stationary bike': 'Stationary bike moderate',
+    'swimming': 'Swimming laps general',
+    'swim': 'Swimming laps general',
+    'squat': 'Bodyweight squat',
+    'lunge': 'Bodyweight lunge',
+    'weight training': 'General weight lifting',
+    'weight lifting': 'General weight lifting',
+    'weightlifting': 'General weight lifting',
+    'strength training': 'General weight lifting',
+    'calisthenics': 'Calisthenics moderate',
+    'bodyweight': 'Calisthenics moderate',
+    'hiit': 'HIIT circuit',
+    'yoga': 'Hatha yoga',
+    'pilates': 'Mat Pilates',
+    'elliptical': 'Elliptical trainer moderate',
+    'jump rope': 'Jump rope moderate',
+    'aerobics': 'Low-impact aerobics',
+    'stretching': 'Static stretching',
+    'mobility': 'Mobility flow',
+}
+
+# Words that name no category on their own ("Interval training" is not "Weight training")
+CATEGORY_FILLER = {'training', 'workout', 'exercise', 'class', 'session'}
+
+# Word-overlap matches below this share of the (query + name) words are guesses
+MIN_CONFIDENCE = 0.5
+
+
+class ExerciseCatalog:
+    """
+    Compendium of activities with MET values, muscle groups and equipment.
+
+    Stored as parallel arrays indexed by activity id:
+        met        array('f')
+        category   array('B')  -> self.categories
+        equipment  array('H')  -> self.equipment
+        muscles    array('L')  bitmask over self.muscles
+    with lookup indexes by category, muscle group, normalized name, name word and name word stem.
+    """
+
+    def __init__(self, path=EXERCISES_PATH):
+        self.names = []
+        self.met = array('f')
+        self.category = array('B')
+        self.equipment_id = array('H')
+        self.muscle_mask = array('L')
+        self.categories = []
+        self.equipment = []
+        self.muscles = []
+
+        category_ids, equipment_ids, muscle_bits = {}, {}, {}
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                self.names.append(row['name'])
+                self.met.append(float(row['met']))
+                self.category.append(category_ids.setdefault(row['category'], len(category_ids)))
+                self.equipment_id.append(equipment_ids.setdefault(row['equipment'], len(equipment_ids)))
+                mask = 0
+                for muscle in row['muscles'].split(';'):
+                    mask |= 1 << muscle_bits.setdefault(muscle.strip(), len(muscle_bits))
+                self.muscle_mask.append(mask)
+        self.categories = list(category_ids)
+        self.equipment = list(equipment_ids)
+        self.muscles = list(muscle_bits)
+        self._muscle_bits = muscle_bits
+
+        # Indexes
+        self._by_name = {}
+        self._by_word = {}
+        self._by_stem = {}
+        self._by_category = {}
+        self._by_muscle = {m: array('H') for m in self.muscles}
+        for i, name in enumerate(self.names):
+            key = normalize(name)
+            self._by_name[key] = i
+            for word in {_plain(w) for w in key.split()}:
+                self._by_word.setdefault(word, array('H')).append(i)
+            for stem in {_stem(w) for w in key.split()}:
+                self._by_stem.setdefault(stem, array('H')).append(i)
+            self._by_category.setdefault(normalize(self.categories[self.category[i]]), array('H')).append(i)
+            for muscle, bit in muscle_bits.items():
+                if self.muscle_mask[i] >> bit & 1:
+                    self._by_muscle[muscle].append(i)
+        self._category_keys = {normalize(c): c for c in self.categories}
+        self._category_stems = [{_stem(w) for w in normalize(c).split() if _plain(w) not in CATEGORY_FILLER}
+                                for c in self.categories]
+        self._category_cores = {' '.join(sorted(stems)): c for stems, c in zip(self._category_stems, self.categories)}
+        self._category_words = [{_plain(w) for w in normalize(c).split()} for c in self.categories]
+        self._generic = {' '.join(_plain(w) for w in normalize(k).split()): self._by_name[normalize(v)]
+                         for k, v in GENERIC.items()}
+
+    def __len__(self):
+        return len(self.names)
+
+    # ---------------- single activity ----------------
+    def lookup(self, name, cutoff=0.8):
+        """
+        Activity id for `name`, or None when nothing matches confidently (callers
+        then fall back to their per-category METs):
+
+        1. exact name, or the generic entry for a generic name ("Rowing" -> "Rowing machine moderate")
+        2. whole-word overlap ("Dumbbell lunges" -> "Dumbbell walking lunge")
+        3. stemmed word overlap, for queries of two or more words ("Freestyle swim")
+        4. difflib, when every word is a near miss of the matched name's ("Conventional deadlfit")
+        """
+        key = normalize(name)
+        if not key:
+            return None
+        if key in self._by_name:
+            return self._by_name[key]
+        words = [_plain(w) for w in key.split() if w not in _STOPWORDS]
+        if ' '.join(words) in self._generic:
+            return self._generic[' '.join(words)]
+        if not words:
+            return None
+
+        i = self._best_overlap(words, self._by_word, _plain, self._category_words)
+        if i is None and len(set(words)) > 1:
+            i = self._best_overlap([_stem(w) for w in words], self._by_stem, _stem, self._category_stems)
+        if i is not None:
+            return i
+
+        close = difflib.get_close_matches(key, list(self._by_name), n=1, cutoff=cutoff)
+        if close and len(close[0].split()) == len(key.split()) and all(
+                difflib.SequenceMatcher(None, a, b).ratio() >= cutoff for a, b in zip(key.split(), close[0].split())):
+            return self._by_name[close[0]]
+        return None
+
+    def _best_overlap(self, words, index, word_form, category_words):
+        """
+        Entry whose words contain the query's, or are contained in it, sharing the
+        most words with the fewest extra ones; None below MIN_CONFIDENCE or when the
+        best candidates are spread over several categories ("Row": upright, inverted...).
+        """
+        wanted = set(words)
+        ranked = []
+        for i in {i for w in wanted for i in index.get(w, ())}:
+            entry = {word_form(w) for w in normalize(self.names[i]).split()}
+            if not (entry <= wanted or wanted <= entry):
+                continue
+            shared = len(entry & wanted)
+            if shared / len(entry | wanted) < MIN_CONFIDENCE:
+                continue
+            in_category = bool(category_words[self.category[i]] & wanted)
+            # Most shared words, named category first, fewest extra words, file order
+            ranked.append(((shared, in_category, -len(entry ^ wanted)), -i))
+        if not ranked:
+            return None
+        best = max(ranked)
+        tied = {self.category[-i] for rank, i in ranked if rank == best[0]}
+        return -best[1] if len(tied) == 1 else None
+
+    def info(self, i):
+        return {
+            'name': self.names[i],
+            'category': self.categories[self.category[i]],
+            'met': round(float(self.met[i]), 2),
+            'muscles': [m for m, bit in self._muscle_bits.items() if self.muscle_mask[i] >> bit & 1],
+            'equipment': self.equipment[self.equipment_id[i]],
+        }
+
+    def met_for(self, name):
+        i = self.lookup(name)
+        return None if i is None else float(self.met[i])
+
+    # ---------------- groups ----------------
+    def match_category(self, name):
+        """Map a free-form preference ("weights", "swim") to a catalog category, or None."""
+        key = normalize(name)
+        if key in self._category_keys:
+            return self._category_keys[key]
+        # Filler words ("training", "workout") never decide the category
+        stems = {_stem(w) for w in key.split() if _plain(w) not in CATEGORY_FILLER}
+        if not stems:
+            return None
+        for category, category_stems in zip(self.categories, self._category_stems):
+            if stems & category_stems:
+                return category
+        close = difflib.get_close_matches(' '.join(sorted(stems)), list(self._category_cores), n=1, cutoff=0.6)
+        return self._category_cores[close[0]] if close else None
+
+    def by_category(self, category):
+        return list(self._by_category.get(normalize(category), ()))
+
+    def by_muscle(self, muscle):
+        key = normalize(muscle)
+        ids = set()
+        for m, members in self._by_muscle.items():
+            # "Ankles and feet" -> "ankles", "Lower back" -> "lower back"
+            if m == key or m in key or key in m:
+                ids.update(members)
+        return sorted(ids)
+
+    def search(self, category=None, muscle=None, equipment=None, limit=None):
+        ids = self.by_category(category) if category else range(len(self))
+        if muscle:
+            wanted = set(self.by_muscle(muscle))
+            ids = [i for i in ids if i in wanted]
+        if equipment:
+            ids = [i for i in ids if self.equipment[self.equipment_id[i]] == equipment]
+        ids = list(ids)
+        return ids[:limit] if limit else ids
+
+
+@lru_cache(maxsize=1)
+def get_exercise_catalog():
+    """Shared instance, loaded once per process."""
+    return ExerciseCatalog()
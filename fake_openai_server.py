@@ -0,0 +1,162 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Enforces a requests-per-minute limit (answering 429 with Retry-After like the
+real API) and adds a configurable latency, so the client-side rate limiter can
+be exercised without spending quota. `--slow-fraction` makes a share of
+requests much slower to first token, to exercise request hedging. Streaming
+("stream": true) is answered as server-sent events:
+
+    python fake_openai_server.py --rpm 30 --latency 1.5 --slow-fraction 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 streamlit run fitness_version.py
+"""
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import random
+import threading
+import time
+
+
+class FakeOpenAIState:
+    def __init__(self, rpm, latency, content, slow_fraction=0.0, slow_latency=10.0):
+        self.rpm = rpm
+        self.latency = latency
+        self.content = content
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.stats = {'requests': 0, 'ok': 0, 'rate_limited': 0}
+
+    def admit(self):
+        """Sliding one-minute window; returns seconds to wait, or 0 if admitted."""
+        now = time.monotonic()
+        with self.lock:
+            self.stats['requests'] += 1
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if self.rpm and len(self.recent) >= self.rpm:
+                self.stats['rate_limited'] += 1
+                return 60 - (now - self.recent[0])
+            self.recent.append(now)
+            self.stats['ok'] += 1
+            return 0
+
+    def first_token_delay(self):
+        if self.slow_fraction and random.random() < self.slow_fraction:
+            return self.slow_latency
+        return self.latency
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, model, chunk_chars=16, usage=None):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            created = int(time.time())
+            pieces = [state.content[i:i + chunk_chars] for i in range(0, len(state.content), chunk_chars)]
+            try:
+                for i, piece in enumerate(pieces + [None]):
+                    choice = {'index': 0, 'delta': {} if piece is None else {'content': piece},
+                              'finish_reason': 'stop' if piece is None else None}
+                    if i == 0:
+                        choice['delta']['role'] = 'assistant'
+                    event = {'id': f"chatcmpl-fake-{created}", 'object': 'chat.completion.chunk',
+                             'created': created, 'model': model, 'choices': [choice]}
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                    self.wfile.flush()
+                if usage is not None:
+                    # stream_options.include_usage: a last chunk without choices carries the usage
+                    event = {'id': f"chatcmpl-fake-{created}", 'object': 'chat.completion.chunk',
+                             'created': created, 'model': model, 'choices': [], 'usage': usage}
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client cancelled (e.g. a hedge loser)
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/stats'):
+                self._send(200, state.stats)
+            else:
+                self._send(404, {'error': {'message': 'not found'}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send(404, {'error': {'message': 'not found'}})
+                return
+
+            wait = state.admit()
+            if wait:
+                self._send(429, {'error': {'message': 'Rate limit reached for requests',
+                                           'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                           {'Retry-After': f"{max(wait, 0.1):.2f}"})
+                return
+
+            time.sleep(state.first_token_delay())
+            prompt_chars = sum(len(str(m.get('content', ''))) for m in request.get('messages', []))
+            usage = {'prompt_tokens': prompt_chars // 4,
+                     'completion_tokens': len(state.content) // 4,
+                     'total_tokens': (prompt_chars + len(state.content)) // 4}
+            if request.get('stream'):
+                include_usage = (request.get('stream_options') or {}).get('include_usage')
+                self._stream(request.get('model', 'fake'), usage=usage if include_usage else None)
+                return
+            self._send(200, {
+                'id': f"chatcmpl-fake-{int(time.time() * 1000)}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': state.content}}],
+                'usage': usage,
+            })
+
+    return Handler
+
+
+def serve(host='127.0.0.1', port=8089, rpm=60, latency=0.5, content='{}', slow_fraction=0.0, slow_latency=10.0):
+    state = FakeOpenAIState(rpm, latency, content, slow_fraction, slow_latency)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.state = state
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--rpm', type=int, default=60, help='requests per minute before answering 429 (0 = unlimited)')
+    parser.add_argument('--latency', type=float, default=0.5, help='seconds per completion')
+    parser.add_argument('--slow-fraction', type=float, default=0.0, help='share of requests delayed by --slow-latency')
+    parser.add_argument('--slow-latency', type=float, default=10.0, help='first-token delay of slow requests')
+    parser.add_argument('--response-file', help='file whose contents are returned as the completion')
+    args = parser.parse_args()
+
+    content = '{}'
+    if args.response_file:
+        with open(args.response_file, 'r') as f:
+            content = f.read()
+
+    server = serve(args.host, args.port, args.rpm, args.latency, content, args.slow_fraction, args.slow_latency)
+    print(f"Fake OpenAI endpoint on http://{args.host}:{args.port}/v1 (rpm={args.rpm}, latency={args.latency}s)")
+    server.serve_forever()
@@ -1,12 +1,29 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+import copy
 import json
+import os
 import time
-from PromptEngineer import AIFitnessCoach, AIHealthCoach
+import uuid
+from deadline import CancelToken, Cancelled, DeadlineExceeded, check, deadline
+from job_queue import CANCELLED, DONE, FAILED, JobQueue, JobQueueFull
+from plan_archive import PlanArchive
+from plan_digest import stale_days
+from session_memory import SessionRegistry
+from tracing import span, traced, tracer
+
+# With COVERFITNESS_API_URL set the app is a thin client of api_server.py;
+# otherwise the coaches run in this process
+API_URL = os.environ.get('COVERFITNESS_API_URL')
+if API_URL:
+    from api_client import CoachAPIClient, RemoteFitnessCoach, RemoteHealthCoach
+else:
+    from PromptEngineer import AIFitnessCoach, AIHealthCoach
 
 # Set page configuration
 st.set_page_config(
@@ -74,26 +91,269 @@ if 'page' not in st.session_state:
 if 'user_data' not in st.session_state:
     st.session_state.user_data = {}
 
+@st.cache_resource
+def get_coaches():
+    # The coaches keep no per-user state, so every session shares one pair (and their LLM clients)
+    if API_URL:
+        client = CoachAPIClient(API_URL)
+        return RemoteFitnessCoach(client), RemoteHealthCoach(client)
+    return AIFitnessCoach(), AIHealthCoach()
+
+
+@st.cache_resource
+def get_session_registry():
+    return SessionRegistry()
+
+
+def session_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else 'local'
+
+
 if 'fitness_coach' not in st.session_state:
-    st.session_state.fitness_coach = AIFitnessCoach()
+    st.session_state.fitness_coach = get_coaches()[0]
 if 'fitness_plan_step' not in st.session_state:
     st.session_state.fitness_plan_step = 1
 if 'has_fitness_plan' not in st.session_state:
     st.session_state.has_fitness_plan = False
 if 'fitness_plan_storage' not in st.session_state:
-    st.session_state.fitness_plan_storage = {}  # key: plan_id or tag, value: plan_data
+    # key: plan_id, value: plan_data; only the newest versions stay in memory, older ones go to disk
+    st.session_state.fitness_plan_storage = get_session_registry().history(session_id(), 'workout')
 
 if 'nutritiest' not in st.session_state:
-    st.session_state.nutritiest = AIHealthCoach()
+    st.session_state.nutritiest = get_coaches()[1]
 if 'has_meal_plan' not in st.session_state:
     st.session_state.has_meal_plan = False
 if 'meal_plan_storage' not in st.session_state:
-    st.session_state.meal_plan_storage = {}  # key: plan_id or tag, value: plan_data
+    st.session_state.meal_plan_storage = get_session_registry().history(session_id(), 'meal')
+if 'program_storage' not in st.session_state:
+    st.session_state.program_storage = get_session_registry().history(session_id(), 'program', max_in_memory=1)
+
+if 'progress_store' not in st.session_state:
+    # daily weight / intake / workouts; spilled to disk with the plans when the session is idle
+    st.session_state.progress_store = get_session_registry().progress_store(session_id())
+if 'health_storage' not in st.session_state:
+    # The latest health assessment, under 'latest'; spilled like the plans
+    st.session_state.health_storage = get_session_registry().history(session_id(), 'health', max_in_memory=1)
+if 'user_id' not in st.session_state:
+    st.session_state.user_id = 'local_user'
+
+
+# Time budgets (seconds) for work started from the UI
+UI_CALL_DEADLINE = float(os.environ.get('COVERFITNESS_UI_DEADLINE', 30))
+PLAN_JOB_DEADLINE = float(os.environ.get('COVERFITNESS_PLAN_DEADLINE', 180))
+
+# 'sequential': workout plan, then the meal plan built on it (two requests);
+# 'fused': both from one request (AIFitnessCoach.generate_plans)
+PLAN_MODE = os.environ.get('COVERFITNESS_PLAN_MODE', 'sequential')
+
+
+def page_token():
+    # Cancel token for the LLM work started from the current page; replaced on navigation
+    if 'cancel_token' not in st.session_state:
+        st.session_state.cancel_token = CancelToken()
+    return st.session_state.cancel_token
 
 
+# Background plan generation (shared by all sessions of this server)
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+
+@st.cache_resource
+def get_plan_archive():
+    # Append-only Parquet archive of every generated plan (COVERFITNESS_ARCHIVE)
+    return PlanArchive()
+
+
+def run_plan_generation(fitness_coach, nutritiest, user_data):
+    if PLAN_MODE == 'fused':
+        plans = fitness_coach.generate_plans(user_data, nutritiest)
+        cur_workout_plan, meal_plan = plans['workout'], plans['meal']
+    else:
+        cur_workout_plan = fitness_coach.generate_workout_plan(user_data)
+        check()  # don't start the meal plan for an abandoned page
+        meal_plan = nutritiest.generate_meal_plan(user_data, cur_workout_plan)
+    program = fitness_coach.generate_program(cur_workout_plan, user_data)
+    return {'kind': 'generate', 'workout': cur_workout_plan, 'meal': meal_plan, 'program': program}
+
+
+def run_plan_update(fitness_coach, nutritiest, old_plan, meal_plan, adjust_intensity, preferred_additions,
+                    user_data):
+    updates_plan = fitness_coach.adjust_workout_plan(old_plan, adjust_intensity, preferred_additions,
+                                                     user_data, sport_range="")
+    program = fitness_coach.generate_program(updates_plan, user_data)
+    result = {'kind': 'update', 'workout': updates_plan, 'program': program}
+    # New meals only for the days whose workouts changed (plan_digest.py)
+    changed_days = stale_days(meal_plan, updates_plan) if updates_plan.get('weekly_plan') else []
+    if changed_days:
+        check()
+        result['meal'] = nutritiest.update_meal_plan(user_data, meal_plan, updates_plan)
+        result['meal_days'] = changed_days
+    return result
+
+
+def submit_plan_job(fn, *args):
+    # One plan job per session; repeated clicks while it runs are ignored
+    if st.session_state.get('plan_job_id'):
+        st.info("Your plans are already being generated.")
+        return
+    st.session_state.pop('last_plan_job', None)
+    try:
+        # The job runs in this context: the page's cancel token and the plan deadline go with it
+        with deadline(PLAN_JOB_DEADLINE, page_token()):
+            st.session_state.plan_job_id = get_job_queue().submit(fn, *args)
+    except JobQueueFull as e:
+        st.error(f"{e}. Please try again in a moment.")
+
+
+def collect_plan_job():
+    # Move a finished job's result into the plan store (runs at the start of every rerun)
+    job_id = st.session_state.get('plan_job_id')
+    if not job_id:
+        return
+    job_queue = get_job_queue()
+    status = job_queue.status(job_id)
+    if status not in (DONE, FAILED, CANCELLED, None):
+        return
+
+    del st.session_state.plan_job_id
+    if status is None:
+        return
+    try:
+        result = job_queue.result(job_id)
+    except DeadlineExceeded:
+        st.session_state.plan_job_error = "it took too long. Please try again"
+        return
+    except Cancelled:
+        return  # the user navigated away
+    except Exception as e:
+        st.session_state.plan_job_error = str(e)
+        return
+    finally:
+        job_queue.forget(job_id)
+
+    plan_id = store_fitness_plan(result['workout'])
+    meal_plan_id = store_meal_plan(result['meal']) if 'meal' in result else None
+    if result.get('program'):
+        st.session_state.program_storage[plan_id] = result['program']
+    st.session_state.last_plan_job = result
+
+    # Archiving is best-effort and never blocks storing the plan
+    try:
+        archive = get_plan_archive()
+        archive.add_workout_plan(result['workout'], plan_id, st.session_state.user_id)
+        if meal_plan_id is not None:
+            archive.add_meal_plan(result['meal'], meal_plan_id, st.session_state.user_id)
+        if result.get('program'):
+            archive.add_program(result['program'], plan_id, st.session_state.user_id)
+    except Exception as e:
+        print("Plan archive failed:", e)
+
+
+@st.fragment(run_every=2)
+@traced(cat='render')
+def display_plan_job_status():
+    # Polls without blocking the page; triggers a full rerun once the job has finished
+    job_id = st.session_state.get('plan_job_id')
+    if not job_id:
+        return
+    status = get_job_queue().status(job_id)
+    if status in (DONE, FAILED, CANCELLED, None):
+        st.rerun()
+    st.info(f"⏳ Creating your personalized plans... ({status})")
+
+
+@traced(cat='render')
+def display_plan_job_error():
+    error = st.session_state.pop('plan_job_error', None)
+    if error:
+        st.error(f"Plan generation failed: {error}")
+
+
+def cached_assessment(kind, fn, user_data):
+    # Health risk / feasibility numbers, computed once per distinct user_data rather than
+    # on every rerun (with COVERFITNESS_API_URL each one is an HTTP call)
+    cache = st.session_state.setdefault('assessments', {})
+    key = json.dumps({k: v for k, v in user_data.items() if k != 'bmi'}, sort_keys=True, default=str)
+    entry = cache.get(kind)
+    if entry is None or entry['key'] != key:
+        entry = {'key': key, 'result': fn(user_data)}
+        cache[kind] = entry
+    return copy.deepcopy(entry['result'])
+
+
+# Deferred LLM text (recommendations, advice): the page renders from local numbers
+# and the prose is filled in by a background job when it arrives
+def submit_advice_job(kind, inputs, fn, *args):
+    jobs = st.session_state.setdefault('advice_jobs', {})
+    key = json.dumps(inputs, sort_keys=True, default=str)
+    entry = jobs.get(kind)
+    if entry and entry['key'] == key:
+        return  # already requested for these inputs
+    if entry and entry['job_id']:
+        get_job_queue().forget(entry['job_id'])
+
+    entry = {'key': key, 'job_id': None, 'result': None, 'error': None}
+    try:
+        with deadline(UI_CALL_DEADLINE, page_token()):
+            entry['job_id'] = get_job_queue().submit(fn, *args)
+    except JobQueueFull as e:
+        entry['error'] = str(e)
+    jobs[kind] = entry
+
+
+def collect_advice_job(kind):
+    entry = st.session_state.get('advice_jobs', {}).get(kind)
+    if not entry or not entry['job_id']:
+        return entry
+    job_queue = get_job_queue()
+    status = job_queue.status(entry['job_id'])
+    if status not in (DONE, FAILED, CANCELLED, None):
+        return entry
+
+    try:
+        entry['result'] = job_queue.result(entry['job_id'])
+    except DeadlineExceeded:
+        entry['error'] = "it took too long"
+    except Cancelled:
+        # Abandoned when the user left the page; ask again next time
+        del st.session_state.advice_jobs[kind]
+        return None
+    except Exception as e:
+        entry['error'] = str(e)
+    finally:
+        job_queue.forget(entry['job_id'])
+    entry['job_id'] = None
+    return entry
+
+
+@st.fragment(run_every=1)
+def poll_advice_job(kind, render, placeholder_text):
+    entry = collect_advice_job(kind)
+    if entry and entry['job_id']:
+        st.caption(placeholder_text)
+    else:
+        render(entry)
+
+
+@traced(cat='render')
+def display_advice(kind, render, placeholder_text="⏳ Writing advice..."):
+    # Render right away when the text is ready; otherwise only this fragment polls for it
+    entry = collect_advice_job(kind)
+    if entry and entry['job_id']:
+        poll_advice_job(kind, render, placeholder_text)
+    else:
+        render(entry)
+
 
 # Navigation functions
 def set_page(page_name):
+    if st.session_state.get('page') != page_name:
+        # Leaving a page abandons the LLM work it started (queued or in flight)
+        page_token().cancel(f"left the {st.session_state.get('page')} page")
+        st.session_state.cancel_token = CancelToken()
     st.session_state.page = page_name
 
 
@@ -109,14 +369,20 @@ def reset_steps():
     st.session_state.fitness_plan_step = 1
 
 
+def new_plan_id():
+    # Unique even for two plans stored within the same second
+    return f"plan_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+
 def store_fitness_plan(new_plan):
     # Storage the plan
-    plan_id = f"plan_{int(time.time())}"
+    plan_id = new_plan_id()
 
     # save to session_state
     st.session_state.fitness_plan_storage[plan_id] = new_plan
     st.session_state.has_fitness_plan = True
     st.session_state.current_plan_id = plan_id  # This is correctly tracking the ID
+    return plan_id
 
 def get_current_plan():
     # Use the current plan ID to get the latest plan directly
@@ -124,24 +390,47 @@ def get_current_plan():
         return st.session_state.fitness_plan_storage[st.session_state.current_plan_id]
     elif st.session_state.fitness_plan_storage:
         # Fallback to the last added plan if ID is missing
-        latest_plan_id, latest_plan = list(st.session_state.fitness_plan_storage.items())[-1]
+        latest_plan_id, latest_plan = st.session_state.fitness_plan_storage.latest()
         st.session_state.current_plan_id = latest_plan_id  # Update the ID
         return latest_plan
     return None  # Return None if no plans exist
 
 def store_meal_plan(new_plan):
     # Storage the plan
-    plan_id = f"plan_{int(time.time())}"
+    plan_id = new_plan_id()
     # save to session_state
     st.session_state.meal_plan_storage[plan_id] = new_plan
     st.session_state.has_meal_plan = True
     st.session_state.current_meal_plan_id = plan_id
+    return plan_id
+
+def get_health_data():
+    latest_id, health_data = st.session_state.health_storage.latest()
+    return health_data
+
 
 def get_current_meal_plan():
-    latest_plan_id, latest_plan = list(st.session_state.meal_plan_storage.items())[-1]
+    latest_plan_id, latest_plan = st.session_state.meal_plan_storage.latest()
     return latest_plan
 
+def last_weekday(day_name, today=None):
+    # Date of the most recent `day_name` ('Monday', ...), today included
+    today = today or datetime.now().date()
+    weekday = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'].index(day_name)
+    return today - timedelta(days=(today.weekday() - weekday) % 7)
+
+def log_progress(day, **values):
+    # Record a measurement in the user's time series (earlier days are overwritten);
+    # returns False if a value isn't a number
+    try:
+        st.session_state.progress_store.log(st.session_state.user_id, day, **values)
+        return True
+    except ValueError as e:
+        st.error(str(e))
+        return False
+
 # Sidebar navigation
+@traced(cat='render')
 def display_sidebar():
     with st.sidebar:
         st.title("💪 AI Fitness Assistant")
@@ -164,10 +453,31 @@ def display_sidebar():
             st.header("Your Plan")
             st.info("Plan created on: 2025-04")
 
+        display_memory_usage()
+        if tracer.enabled:
+            display_trace()
+
+
+
+
+def track_session_memory():
+    # Measured every few seconds per session; shared objects (coaches) are not counted
+    state = {key: st.session_state[key] for key in st.session_state}
+    return get_session_registry().touch(session_id(), state, shared=get_coaches())
 
 
+@traced(cat='render')
+def display_memory_usage():
+    report = get_session_registry().report()
+    with st.expander("Memory"):
+        st.caption(f"This session: {report['per_session'].get(session_id(), 0) / 1024:.0f} KB")
+        st.caption(f"Server: {report['active_sessions']} active / {report['sessions']} sessions, "
+                   f"{report['bytes_total'] / 2 ** 20:.1f} MB in memory, "
+                   f"{report['spilled_bytes'] / 2 ** 20:.1f} MB spilled to disk")
+
 
 # Home page
+@traced(cat='render')
 def display_home():
     st.title("Welcome to Cover-Fitness Assistant! 🏆")
 
@@ -206,6 +516,7 @@ def display_home():
 
 
 # Fitness Planner pages
+@traced(cat='render')
 def display_fitness_planner():
     st.title("🏋️‍♀️ Personal Fitness Planner")
 
@@ -216,6 +527,7 @@ def display_fitness_planner():
         # Otherwise show the multi-step form
         display_fitness_planner_steps()
 
+@traced(cat='render')
 def display_fitness_dashboard():
     st.subheader("Your Fitness Dashboard")
 
@@ -223,9 +535,8 @@ def display_fitness_dashboard():
     st.markdown("<div class='card'><div class='card-header'>Health Assessment</div>", unsafe_allow_html=True)
 
     #
-    if 'health_data' in st.session_state:
-        health_data = st.session_state.health_data
-    else:
+    health_data = get_health_data()
+    if health_data is None:
         st.warning("Health data not found. Please complete the health assessment.")
         return
 
@@ -238,27 +549,28 @@ def display_fitness_dashboard():
         st.metric("Goal Feasibility", "High")
 
     # Radar chart for risks
-    fig = go.Figure()
-    categories = list(health_data['risks'].keys())
-    values = list(health_data['risks'].values())
-
-    fig.add_trace(go.Scatterpolar(
-        r=values,
-        theta=categories,
-        fill='toself',
-        name='Risk Factors'
-    ))
-
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 100]
-            )),
-        showlegend=False
-    )
+    with span('plotly.risk_radar', cat='plotly'):
+        fig = go.Figure()
+        categories = list(health_data['risks'].keys())
+        values = list(health_data['risks'].values())
+
+        fig.add_trace(go.Scatterpolar(
+            r=values,
+            theta=categories,
+            fill='toself',
+            name='Risk Factors'
+        ))
+
+        fig.update_layout(
+            polar=dict(
+                radialaxis=dict(
+                    visible=True,
+                    range=[0, 100]
+                )),
+            showlegend=False
+        )
 
-    st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True)
 
     for rec in health_data['recommendations']:
         st.info(rec)
@@ -298,8 +610,19 @@ def display_fitness_dashboard():
                     f"<b>Total Time:</b> {total_duration} min &nbsp;&nbsp;&nbsp; <b>Total Calories:</b> {round(total_calories)} kcal",
                     unsafe_allow_html=True)
 
+    # Weekly burn vs the exercise calorie budget (recomputed locally from METs)
+    budget = workout_plan.get('calorie_budget')
+    if budget and budget.get('weekly_target'):
+        st.metric("Weekly Burn vs Target",
+                  f"{round(budget['weekly_total'])} / {round(budget['weekly_target'])} kcal",
+                  f"{budget['deviation_pct']:+.1f}%")
+
     st.markdown("</div>", unsafe_allow_html=True)
 
+    program_id, program = st.session_state.program_storage.latest()
+    if program:
+        display_program(program)
+
     # Meal plan section
     st.markdown("<div class='card'><div class='card-header'>Your Meal Plan</div>", unsafe_allow_html=True)
 
@@ -338,9 +661,14 @@ def display_fitness_dashboard():
                 with st.expander(f"{meal_name}: {meal_data.get('Menu', '')}"):
                     st.markdown(f"**Macros:** {meal_data.get('Macros', 'Not specified')}")
 
+                    ingredients = meal_data.get('Ingredients') or []
+                    if ingredients:
+                        st.markdown("**Ingredients:** " + ", ".join(
+                            f"{item.get('grams', '?')} g {item.get('food', '')}" for item in ingredients))
+
                     # Display any additional meal details if present
                     for key, value in meal_data.items():
-                        if key not in ["Menu", "Macros"]:
+                        if key not in ["Menu", "Macros", "Ingredients"]:
                             st.markdown(f"**{key.replace('_', ' ').title()}:** {value}")
 
     st.markdown("</div>", unsafe_allow_html=True)
@@ -352,6 +680,49 @@ def display_fitness_dashboard():
         st.session_state.has_fitness_plan = False
         st.rerun()
 
+@traced(cat='render')
+def display_program(program):
+    # Whole-horizon program derived locally from the base week
+    summary = program['summary']
+    weeks = program['weeks']
+    st.markdown("<div class='card'><div class='card-header'>Your Program</div>", unsafe_allow_html=True)
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Program Length", f"{summary['weeks']} weeks")
+    with col2:
+        st.metric("Projected End Weight", f"{summary['projected_end_weight']} kg",
+                  f"{summary['projected_end_weight'] - summary['start_weight']:+.1f} kg")
+    with col3:
+        st.metric("Deload Weeks", ", ".join(str(w) for w in summary['deload_weeks']) or "None")
+
+    with span('plotly.program', cat='plotly', weeks=len(weeks)):
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=[w['week'] for w in weeks], y=[w['weekly_total'] for w in weeks],
+                             marker_color=['#9E9E9E' if w['phase'] == 'deload' else '#4CAF50' for w in weeks],
+                             name='Exercise kcal / week'))
+        fig.add_trace(go.Scatter(x=[w['week'] for w in weeks], y=[w['projected_weight'] for w in weeks],
+                                 mode='lines+markers', name='Projected weight (kg)', yaxis='y2'))
+        fig.update_layout(xaxis_title='Week', yaxis=dict(title='kcal'),
+                          yaxis2=dict(title='kg', overlaying='y', side='right'),
+                          legend=dict(orientation='h'))
+        st.plotly_chart(fig, use_container_width=True)
+
+    week_no = st.selectbox("Show week", [w['week'] for w in weeks],
+                           format_func=lambda n: f"Week {n} ({weeks[n - 1]['phase']})")
+    week = weeks[week_no - 1]
+    st.write(f"Daily calorie goal: **{round(week['calorie_goal'])} kcal** · "
+             f"Intensity: **{week['intensity']:.0%}** · Volume: **{week['volume']:.0%}**")
+    st.dataframe(pd.DataFrame([
+        {'Day': day['day'], 'Minutes': day['total_duration'], 'kcal': round(day['total_calories']),
+         'Exercises': ", ".join(f"{ex['name']} ({ex['duration_min']} min)" for ex in day['exercises'])}
+        for day in week['weekly_plan']
+    ]), use_container_width=True, hide_index=True)
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+
+@traced(cat='render')
 def display_fitness_planner_steps():
     # Progress bar
     total_steps = 4
@@ -393,6 +764,7 @@ def display_fitness_planner_steps():
                 st.rerun()
 
 
+@traced(cat='render')
 def display_step1_user_data():
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.subheader("1. Tell Us About Yourself")
@@ -433,6 +805,7 @@ def display_step1_user_data():
         ["Lose weight", "Gain muscle", "Improve fitness", "Rehabilitation"]
     )
 
+    target_number, target_months = 0, 3  # goals without a weight target keep the current weight
     if goal_type == "Lose weight" or goal_type == "Gain muscle":
         col1, col2 = st.columns(2)
         with col1:
@@ -490,6 +863,11 @@ def display_step1_user_data():
 
     # Save data to session state
     if st.button("Save Information", use_container_width=True):
+        if not workout_days:
+            # Plans are built around these days (the API rejects an empty list too)
+            st.error("Please pick at least one workout day.")
+            st.markdown("</div>", unsafe_allow_html=True)
+            return
         st.session_state.user_data = {
             'age': age,
             'gender': gender,
@@ -513,6 +891,7 @@ def display_step1_user_data():
 
 
 
+@traced(cat='render')
 def display_step2_health_risk():
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.subheader("2. Health Risk Assessment")
@@ -522,9 +901,16 @@ def display_step2_health_risk():
         st.warning("Please complete the previous step first.")
         return
 
-    # Mock up a health assessment
-    health_data = st.session_state.fitness_coach.health_risk_assessment(st.session_state.user_data)
-    st.session_state.health_data = health_data
+    # Scores are computed locally; only the two recommendations come from the LLM, in the background
+    user_data = st.session_state.user_data
+    health_data = cached_assessment('health_risk', st.session_state.fitness_coach.health_risk_assessment, user_data)
+    user_data['bmi'] = health_data['bmi']  # the coach sets it only when it actually runs
+    previous = get_health_data() or {}
+    if previous.get('risks') == health_data['risks']:
+        health_data['recommendations'] = previous.get('recommendations', [])
+    st.session_state.health_storage['latest'] = health_data
+    submit_advice_job('health_recommendations', user_data, st.session_state.fitness_coach.health_recommendations,
+                      copy.deepcopy(user_data), copy.deepcopy(health_data))
 
     # Display BMI
     col1, col2 = st.columns(2)
@@ -548,37 +934,50 @@ def display_step2_health_risk():
     # Radar chart for risk visualization
     st.write("#### Risk Factors Analysis")
 
-    fig = go.Figure()
-    categories = list(health_data['risks'].keys())
-    values = list(health_data['risks'].values())
-
-    fig.add_trace(go.Scatterpolar(
-        r=values,
-        theta=categories,
-        fill='toself',
-        name='Risk Factors'
-    ))
-
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 100]
-            )),
-        showlegend=False
-    )
+    with span('plotly.risk_radar', cat='plotly'):
+        fig = go.Figure()
+        categories = list(health_data['risks'].keys())
+        values = list(health_data['risks'].values())
+
+        fig.add_trace(go.Scatterpolar(
+            r=values,
+            theta=categories,
+            fill='toself',
+            name='Risk Factors'
+        ))
+
+        fig.update_layout(
+            polar=dict(
+                radialaxis=dict(
+                    visible=True,
+                    range=[0, 100]
+                )),
+            showlegend=False
+        )
 
-    st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True)
 
     # Recommendations
     st.write("#### Recommendations")
-    for rec in health_data['recommendations']:
-        st.info(rec)
+    display_advice('health_recommendations', render_health_recommendations, "⏳ Writing your recommendations...")
 
     st.markdown("</div>", unsafe_allow_html=True)
 
 
+@traced(cat='render')
+def render_health_recommendations(entry):
+    if entry and entry['error']:
+        st.warning(f"Recommendations are unavailable right now ({entry['error']}).")
+        return
+    if entry and entry['result'] is not None:
+        # Keep them with the assessment so the dashboard shows them too
+        get_health_data()['recommendations'] = entry['result']
+    for rec in get_health_data()['recommendations']:
+        st.info(rec)
+
+
 
+@traced(cat='render')
 def display_step3_goal_feasibility():
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.subheader("3. Goal Feasibility Assessment")
@@ -588,8 +987,12 @@ def display_step3_goal_feasibility():
         st.warning("Please complete the previous steps first.")
         return
 
-    # Get goal feasibility data - would normally be calculated from AIFitnessCoach
-    feasibility = st.session_state.fitness_coach.enhanced_goal_feasibility(st.session_state.user_data)
+    # Verdict and timeline are local; the advice paragraph is written in the background
+    user_data = st.session_state.user_data
+    feasibility = cached_assessment('feasibility', st.session_state.fitness_coach.enhanced_goal_feasibility,
+                                    user_data)
+    submit_advice_job('goal_advice', [user_data, feasibility], st.session_state.fitness_coach.goal_advice,
+                      copy.deepcopy(user_data), copy.deepcopy(feasibility))
 
     # Display goal feasibility
     if feasibility['is_feasible']:
@@ -598,28 +1001,28 @@ def display_step3_goal_feasibility():
         st.warning(
             f"⚠️ Your goal timeline may be too aggressive. We suggest {feasibility['suggested_timeframe']} months instead of {st.session_state.user_data.get('target_months', 3)} months.")
 
-    st.write(feasibility['advice'])
+    display_advice('goal_advice', render_goal_advice, "⏳ Writing personalized advice...")
 
     # Visual comparison chart
     st.write("#### Goal Timeline Comparison")
 
     # Create a progress timeline chart
     # Fill in the gaps for a smooth line
-    target_months = st.session_state.user_data['target_months']
+    target_months = max(1, st.session_state.user_data.get('target_months', 3))
     realistic_months = feasibility['suggested_timeframe']
     timeline =  (target_months if target_months >= realistic_months else realistic_months)+1
 
     current_weight = st.session_state.user_data['weight']
-    target_weight = st.session_state.user_data['target_weight']
+    target_weight = st.session_state.user_data.get('target_weight', current_weight)
 
     df = pd.DataFrame({
         'Month': [i for i in range(timeline)],
         'Target Plan': [st.session_state.user_data['weight']] +
                        [None] * (timeline - 2) +
-                       [st.session_state.user_data['target_weight']],
+                       [target_weight],
         'Realistic Plan': [st.session_state.user_data['weight']] +
                        [None] * (timeline - 2) +
-                       [st.session_state.user_data['target_weight']]
+                       [target_weight]
     })
 
     # Target plan line - straight line to goal
@@ -640,11 +1043,12 @@ def display_step3_goal_feasibility():
         df.loc[df['Month'] == i, 'Realistic Plan'] = current_weight - (current_weight - target_weight) * progress_pct
     df.loc[realistic_months + 1:, 'Realistic Plan'] = np.nan
 
-    fig = px.line(df, x='Month', y=['Target Plan', 'Realistic Plan'],
-                  title='Weight Change Over Time',
-                  labels={'value': 'Weight (kg)', 'variable': 'Plan Type'})
+    with span('plotly.goal_timeline', cat='plotly'):
+        fig = px.line(df, x='Month', y=['Target Plan', 'Realistic Plan'],
+                      title='Weight Change Over Time',
+                      labels={'value': 'Weight (kg)', 'variable': 'Plan Type'})
 
-    st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True)
 
     # Adjust goal if necessary
     st.write("#### Adjust Your Goal")
@@ -664,7 +1068,7 @@ def display_step3_goal_feasibility():
             "Target Timeframe (months)",
             min_value=1,
             max_value=24,
-            value=feasibility['suggested_timeframe']
+            value=min(24, feasibility['suggested_timeframe'])
         )
 
     if st.button("Update Goal", use_container_width=True):
@@ -675,6 +1079,15 @@ def display_step3_goal_feasibility():
     st.markdown("</div>", unsafe_allow_html=True)
 
 
+@traced(cat='render')
+def render_goal_advice(entry):
+    if entry and entry['error']:
+        st.caption(f"Personalized advice is unavailable right now ({entry['error']}).")
+    elif entry and entry['result']:
+        st.write(entry['result'])
+
+
+@traced(cat='render')
 def display_step4_generate_plan():
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.subheader("4. Generate Your Personalized Plans")
@@ -707,29 +1120,20 @@ def display_step4_generate_plan():
     st.write("Click the button below to generate your personalized workout and meal plans.")
 
     if st.button("Generate My Plans!", type="primary", use_container_width=True):
-        with st.spinner("Creating your personalized plans..."):
-            # This would normally use st.session_state.fitness_coach to generate plans
-            # Mock progress bar to simulate AI processing
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.01)
-                progress_bar.progress(i + 1)
-
-            ## workout
-            cur_workout_plan = st.session_state.fitness_coach.generate_workout_plan(st.session_state.user_data)
-            store_fitness_plan(cur_workout_plan)
-
-            ## meal
-            meal_plan = st.session_state.nutritiest.generate_meal_plan(st.session_state.user_data, cur_workout_plan)
-            store_meal_plan(meal_plan)
+        submit_plan_job(run_plan_generation, st.session_state.fitness_coach, st.session_state.nutritiest,
+                        copy.deepcopy(st.session_state.user_data))
 
-            st.success("Your personalized plans have been generated!")
+    display_plan_job_status()
+    display_plan_job_error()
+    if st.session_state.get('last_plan_job', {}).get('kind') == 'generate':
+        st.success("Your personalized plans have been generated!")
 
 
     st.markdown("</div>", unsafe_allow_html=True)
 
 
 # Progress Tracker pages
+@traced(cat='render')
 def display_progress_tracker():
     st.title("📊 Progress Tracker")
 
@@ -751,6 +1155,7 @@ def display_progress_tracker():
         display_plan_update()
 
 
+@traced(cat='render')
 def display_workout_feedback():
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.subheader("Workout Feedback")
@@ -772,6 +1177,7 @@ def display_workout_feedback():
 
         exercises = day_plan['exercises']
 
+        completed = 0
         for exercise in exercises:
             col1, col2 = st.columns([3, 1])
 
@@ -785,7 +1191,13 @@ def display_workout_feedback():
 
             with col2:
                 # 勾选是否完成（带 day 区分 key）
-                st.checkbox("Completed", key=f"completed_{exercise['name']}_{selected_day}", value=False)
+                if st.checkbox("Completed", key=f"completed_{exercise['name']}_{selected_day}", value=False):
+                    completed += 1
+
+        if st.button("Log Completed Workouts", use_container_width=True):
+            workout_date = last_weekday(selected_day)
+            if log_progress(workout_date, workouts=completed):
+                st.success(f"Logged {completed} completed exercise(s) for {selected_day}, {workout_date:%b %d}.")
 
     else:
         st.warning(f"No workout found for {selected_day}")
@@ -793,28 +1205,39 @@ def display_workout_feedback():
     # Progress chart
     st.write("#### Your Weight Progress")
 
-    # Mock progress data
-    progress_dates = [(datetime.now() - timedelta(days=x * 7)).strftime('%Y-%m-%d') for x in range(4, -1, -1)]
-    progress_weights = [71.5, 70.8, 70.3, 69.6, 69.0]  # Most recent last
-
-    progress_df = pd.DataFrame({
-            'Date': progress_dates,
-            'Weight': progress_weights
-        })
-
-    fig = px.line(progress_df, x='Date', y='Weight',
-                      title='Weight Progress Over Time',
-                      markers=True)
-
-    # Add target line
-    fig.add_hline(y=65, line_dash="dash", line_color="green", annotation_text="Target")
-
-    st.plotly_chart(fig, use_container_width=True)
+    # Downsampled to a bounded number of points, so years of logs render as fast as a week
+    chart = st.session_state.progress_store.chart_data(st.session_state.user_id, 'weight')
+    if not chart['Date']:
+        st.info("No weight logged yet. Add a measurement in the 'Adjust Plan' tab.")
+        chart = {'Date': [datetime.now().strftime('%Y-%m-%d')],
+                 'Min': [st.session_state.user_data['weight']],
+                 'Max': [st.session_state.user_data['weight']],
+                 'Rolling': [st.session_state.user_data['weight']]}
+
+    progress_df = pd.DataFrame(chart)
+
+    with span('plotly.weight_progress', cat='plotly', points=len(progress_df)):
+        fig = px.line(progress_df, x='Date', y='Rolling',
+                          title='Weight Progress Over Time (7-day average)',
+                          labels={'Rolling': 'Weight'},
+                          markers=True)
+        # Daily min/max band for each plotted point
+        fig.add_trace(go.Scatter(x=progress_df['Date'], y=progress_df['Max'], mode='lines',
+                                 line=dict(width=0), showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=progress_df['Date'], y=progress_df['Min'], mode='lines',
+                                 line=dict(width=0), fill='tonexty', fillcolor='rgba(76,175,80,0.15)',
+                                 showlegend=False, hoverinfo='skip'))
+
+        # Add target line
+        fig.add_hline(y=st.session_state.user_data['target_weight'], line_dash="dash", line_color="green", annotation_text="Target")
+
+        st.plotly_chart(fig, use_container_width=True)
 
     st.markdown("</div>", unsafe_allow_html=True)
 
 
 
+@traced(cat='render')
 def display_plan_update():
     st.markdown("<div class='card'>", unsafe_allow_html=True)
     st.subheader("Update Your Fitness Plan")
@@ -841,6 +1264,10 @@ def display_plan_update():
             value=datetime.now()
         )
 
+    if st.button("Save Measurement", use_container_width=True):
+        if log_progress(measurement_date, weight=current_weight):
+            st.success("Measurement saved!")
+
     st.write("## 📝 Update Your Fitness Plan")
 
     # 当前训练感受（单选）
@@ -863,64 +1290,91 @@ def display_plan_update():
     st.markdown(f"**Wants more of:** {', '.join(preferred_additions) if preferred_additions else 'Nothing specific'}")
 
     if st.button("Update My Plans", type="primary", use_container_width=True):
-        with st.spinner("Updating your personalized plans..."):
-            # This would normally use st.session_state.fitness_coach to update plans
-            # Mock progress bar to simulate AI processing
-            progress_bar = st.progress(0)
-            for i in range(100):
-                time.sleep(0.01)
-                progress_bar.progress(i + 1)
-
-            # Get mock updated plan
-            old_plan = get_current_plan()
-            updates_plan = st.session_state.fitness_coach.adjust_workout_plan(old_plan, adjust_intensity, preferred_additions,
-                                                                              st.session_state.user_data, sport_range="")
-            ## push new plan in to ku
-            store_fitness_plan(updates_plan)
-            st.success("Your plans have been updated based on your feedback!")
-
-            # Show summary of changes
-            st.subheader("Changes Made")
-            st.markdown("### Updated Workout Plan:")
-
-            for day_plan in updates_plan["weekly_plan"]:
-                st.markdown(f"**{day_plan['day']}**")
-
-                for exercise in day_plan['exercises']:
-                    st.markdown(
-                        f"- **{exercise['name']}**: {exercise['duration_min']} min, {exercise['calories_burned']} kcal, Target Muscle: {exercise['target_muscle']}")
+        meal_plan = get_current_meal_plan() if st.session_state.get('has_meal_plan') else None
+        submit_plan_job(run_plan_update, st.session_state.fitness_coach, st.session_state.nutritiest,
+                        copy.deepcopy(get_current_plan()), copy.deepcopy(meal_plan), adjust_intensity,
+                        preferred_additions, copy.deepcopy(st.session_state.user_data))
 
-                st.markdown(
-                    f"**Total Duration**: {day_plan['total_duration']} min, **Total Calories**: {round(day_plan['total_calories'], 2)} kcal")
+    display_plan_job_status()
+    display_plan_job_error()
+
+    last_job = st.session_state.get('last_plan_job', {})
+    if last_job.get('kind') == 'update':
+        updates_plan = last_job['workout']
+        st.success("Your plans have been updated based on your feedback!")
 
-                # 加入分隔线，强调每一天的结束
-                st.markdown("---")
+        # Show summary of changes
+        st.subheader("Changes Made")
+        st.markdown("### Updated Workout Plan:")
+
+        for day_plan in updates_plan["weekly_plan"]:
+            st.markdown(f"**{day_plan['day']}**")
+
+            for exercise in day_plan['exercises']:
+                st.markdown(
+                    f"- **{exercise['name']}**: {exercise['duration_min']} min, {exercise['calories_burned']} kcal, Target Muscle: {exercise['target_muscle']}")
 
-            # 突显更新
             st.markdown(
-                "<br><div style='background-color: #dff0d8; padding: 10px; border-radius: 5px;'><strong>Plan updated successfully!</strong></div>",
-                unsafe_allow_html=True)
+                f"**Total Duration**: {day_plan['total_duration']} min, **Total Calories**: {round(day_plan['total_calories'], 2)} kcal")
+
+            # 加入分隔线，强调每一天的结束
+            st.markdown("---")
+
+        if last_job.get('meal_days'):
+            st.info(f"🍽️ New meals for the days whose workouts changed: {', '.join(last_job['meal_days'])}")
+
+        # 突显更新
+        st.markdown(
+            "<br><div style='background-color: #dff0d8; padding: 10px; border-radius: 5px;'><strong>Plan updated successfully!</strong></div>",
+            unsafe_allow_html=True)
 
-            # 可以再加一个总结：
-            total_weekly_calories = sum(day['total_calories'] for day in updates_plan['weekly_plan'])
-            st.success(f"🔥 Total Estimated Weekly Burn: {round(total_weekly_calories)} kcal")
+        # 可以再加一个总结：
+        total_weekly_calories = sum(day['total_calories'] for day in updates_plan['weekly_plan'])
+        st.success(f"🔥 Total Estimated Weekly Burn: {round(total_weekly_calories)} kcal")
 
 
 
     st.markdown("</div>", unsafe_allow_html=True)
 
 
+def trace_attributes():
+    # Where the user is and which plan versions they are looking at, for the rerun span
+    workout_ids = list(st.session_state.fitness_plan_storage)
+    meal_ids = list(st.session_state.meal_plan_storage)
+    return {
+        'session': session_id(),
+        'page': st.session_state.page,
+        'step': st.session_state.fitness_plan_step,
+        'plan_id': workout_ids[-1] if workout_ids else None,
+        'meal_plan_id': meal_ids[-1] if meal_ids else None,
+    }
+
+
+@traced(cat='render')
+def display_trace():
+    # Only shown with COVERFITNESS_TRACE set
+    with st.expander("Trace"):
+        summary = tracer.summary()
+        if summary:
+            st.dataframe(pd.DataFrame.from_dict(summary, orient='index'), use_container_width=True)
+        st.download_button("Download Chrome trace", json.dumps(tracer.chrome_trace()),
+                           file_name=f"trace-{datetime.now():%Y%m%d-%H%M%S}.json", mime='application/json')
+
+
 # Main app logic
 def main():
-    display_sidebar()
-
-    # Display the appropriate page based on session state
-    if st.session_state.page == 'home':
-        display_home()
-    elif st.session_state.page == 'fitness_planner':
-        display_fitness_planner()
-    elif st.session_state.page == 'progress_tracker':
-        display_progress_tracker()
+    with span('streamlit.rerun', cat='streamlit', **(trace_attributes() if tracer.enabled else {})):
+        track_session_memory()
+        collect_plan_job()
+        display_sidebar()
+
+        # Display the appropriate page based on session state
+        if st.session_state.page == 'home':
+            display_home()
+        elif st.session_state.page == 'fitness_planner':
+            display_fitness_planner()
+        elif st.session_state.page == 'progress_tracker':
+            display_progress_tracker()
 
 
 if __name__ == "__main__":
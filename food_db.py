@@ -0,0 +1,166 @@
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+import csv
+import difflib
+import os
+
+FOODS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'foods.csv')
+
+NUTRIENTS = ('kcal', 'protein', 'carbs', 'fat')
+
+
+def _normalize(name):
+    return ' '.join(str(name).lower().replace('-', ' ').replace(',', ' ').split())
+
+
+def _singular(word):
+    """Drop one plural suffix: "berries" -> "berry", "tomatoes" -> "tomato", "eggs" -> "egg"."""
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('oes', 'ches', 'shes', 'xes', 'sses')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _words(key):
+    return tuple(_singular(w) for w in key.split())
+
+
+# Generic names -> the entry they most often mean
+ALIASES = {
+    'milk': 'whole milk',
+    'bread': 'white bread',
+    'yogurt': 'plain yogurt',
+    'yoghurt': 'plain yogurt',
+    'cheese': 'cheddar cheese',
+    'rice': 'white rice cooked',
+    'bean': 'black beans cooked',
+    'chicken': 'chicken breast',
+}
+
+# Preparation words a query can leave out: "lentils" -> "lentils cooked"
+QUALIFIERS = {'cooked', 'unsweetened'}
+
+# Word matches explaining less of the query, or at most this share of the
+# food's own words ("oil" -> "olive oil"), are guesses
+MIN_CONFIDENCE = 0.5
+
+
+class FoodDatabase:
+    """
+    Offline food-composition table stored column-wise.
+
+    Each nutrient is an `array('f')` of values per gram, indexed by food id.
+    Names are kept in a sorted list for prefix search (bisect) plus a
+    (singular) word -> ids index, a few aliases for generic names and
+    difflib for fuzzy matching.
+    """
+
+    def __init__(self, path=FOODS_PATH):
+        self.names = []
+        self.categories = []
+        self.columns = {n: array('f') for n in NUTRIENTS}
+
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                self.names.append(row['name'])
+                self.categories.append(row['category'])
+                for n in NUTRIENTS:
+                    self.columns[n].append(float(row[n]) / 100.0)  # dataset is per 100 g
+
+        # Indexes
+        self._by_name = {}
+        self._by_words = {}
+        self._words = {}
+        for i, name in enumerate(self.names):
+            key = _normalize(name)
+            self._by_name[key] = i
+            words = _words(key)
+            self._by_words.setdefault(frozenset(words), i)
+            for word in words:
+                self._words.setdefault(word, set()).add(i)
+        self._sorted = sorted(self._by_name)
+        self._aliases = {_words(k): self._by_name[v] for k, v in ALIASES.items()}
+        self._preferred = set(self._aliases.values())
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, prefix, limit=10):
+        """Foods whose name starts with `prefix`, alphabetically."""
+        prefix = _normalize(prefix)
+        start = bisect_left(self._sorted, prefix)
+        out = []
+        for key in self._sorted[start:]:
+            if not key.startswith(prefix) or len(out) >= limit:
+                break
+            out.append(self.names[self._by_name[key]])
+        return out
+
+    def lookup(self, name):
+        """Return the food id best matching `name`, or None."""
+        key = _normalize(name)
+        if key in self._by_name:
+            return self._by_name[key]
+
+        # Singular/plural variations ("eggs", "blueberry") and generic names ("milk", "cooked rice")
+        words = _words(key)
+        if not words:
+            return None
+        generic = tuple(w for w in words if w not in QUALIFIERS) or words
+        if generic in self._aliases:
+            return self._aliases[generic]
+        if frozenset(words) in self._by_words:
+            return self._by_words[frozenset(words)]
+
+        # Whole-word match, either way round, sharing the most words and then
+        # having the fewest extra ones: "grilled chicken breast" -> "chicken breast",
+        # "brown rice" -> "brown rice cooked", "almond milk" -> "almond milk unsweetened";
+        # None below MIN_CONFIDENCE ("water" is not "canned tuna in water")
+        query = set(words)
+        candidates = set.union(*(self._words.get(w, set()) for w in query))
+        best = None
+        for i in candidates:
+            food = set(_words(_normalize(self.names[i])))
+            if not (food <= query or query <= food):
+                continue
+            core = food - QUALIFIERS or food
+            shared = len(core & query)
+            if shared / len(query) < MIN_CONFIDENCE or shared / len(core) <= MIN_CONFIDENCE:
+                continue
+            rank = (-len(food & query), len(food ^ query), i not in self._preferred, i)
+            if best is None or rank < best:
+                best = rank
+        if best is not None:
+            return best[3]
+
+        # A prefix only counts when a single food has it ("bage" -> "bagel", but not "ric")
+        # and isn't already a whole word ("water" is not "watermelon")
+        hits = self.search(key, limit=2) if words[-1] not in self._words else []
+        if len(hits) == 1:
+            return self._by_name[_normalize(hits[0])]
+
+        close = difflib.get_close_matches(key, self._sorted, n=1, cutoff=0.8)
+        return self._by_name[close[0]] if close else None
+
+    def per_gram(self, name):
+        """{'kcal': ..., 'protein': ..., 'carbs': ..., 'fat': ...} per gram, or None if unknown."""
+        i = self.lookup(name)
+        if i is None:
+            return None
+        return {n: self.columns[n][i] for n in NUTRIENTS}
+
+    def nutrients(self, name, grams):
+        values = self.per_gram(name)
+        if values is None:
+            return None
+        return {n: v * float(grams) for n, v in values.items()}
+
+
+@lru_cache(maxsize=1)
+def get_food_db():
+    """Shared instance, loaded once per process."""
+    return FoodDatabase()
@@ -0,0 +1,251 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import contextvars
+import os
+import threading
+import time
+
+from deadline import check
+from rate_limit import report_usage
+
+
+class HedgeCancelled(Exception):
+    pass
+
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgeBudget:
+    """Allow at most `percent`% of requests to be hedged (counted over the process lifetime)."""
+
+    def __init__(self, percent):
+        self.percent = float(percent)
+        self.requests = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def try_spend(self):
+        with self._lock:
+            if (self.hedges + 1) * 100.0 > self.percent * self.requests:
+                return False
+            self.hedges += 1
+            return True
+
+
+class MethodHedgeStats:
+    def __init__(self, window=500):
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.extra_tokens = 0
+        self.ttft = deque(maxlen=window)          # primary time-to-first-token
+        self.generation = deque(maxlen=window)    # first token -> last token, for unhedged primaries
+        self.latency = deque(maxlen=window)       # end-to-end latency seen by callers
+        # Estimated latency without hedging. Equal to `latency` unless the hedge
+        # won; then it is the cancelled primary's progress plus the median
+        # generation time.
+        self.unhedged_latency = deque(maxlen=window)
+
+    def report(self):
+        p99 = _percentile(self.latency, 0.99)
+        p99_unhedged = _percentile(self.unhedged_latency, 0.99)
+        return {
+            'requests': self.requests,
+            'hedged': self.hedged,
+            'hedge_rate': round(self.hedged / self.requests, 3) if self.requests else 0.0,
+            'hedge_wins': self.hedge_wins,
+            'extra_tokens': self.extra_tokens,
+            'ttft_p90': _percentile(self.ttft, 0.9),
+            'p50': _percentile(self.latency, 0.5),
+            'p99': p99,
+            'p99_without_hedging_est': p99_unhedged,
+            'p99_saved_est': round(p99_unhedged - p99, 3) if p99 is not None and p99_unhedged is not None else None,
+        }
+
+
+class _Attempt:
+    """One streamed request: when it was submitted and sent, first-token time, cancellation flag and its future."""
+
+    def __init__(self, submitted):
+        self.submitted = submitted
+        self.started = None            # sent: past the worker pool and the rate limiter
+        self.running = threading.Event()
+        self.first_token_at = None
+        self.first_token = threading.Event()
+        self.cancel = threading.Event()
+        self.future = None
+
+    def ttft(self):
+        return None if self.first_token_at is None else self.first_token_at - self.started
+
+class Hedger:
+    """
+    Tail-latency hedging for streamed completions.
+
+    The primary request is streamed in a worker thread. If it hasn't produced
+    its first token by the method's observed TTFT p90 (once `min_samples`
+    have been seen), and the budget allows, an identical second request is
+    started. Whichever finishes first is returned; the other is cancelled
+    and its stream closed at its next chunk.
+
+    TTFT is timed from when the request is sent, i.e. once it has a worker
+    and the rate limiter has admitted it, so queueing doesn't trigger hedges.
+    An attempt cancelled while it was queued never sends.
+    """
+
+    def __init__(self, budget_percent=5.0, min_samples=20, quantile=0.9, max_workers=16):
+        self.budget = HedgeBudget(budget_percent)
+        self.min_samples = min_samples
+        self.quantile = quantile
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _method(self, method):
+        with self._lock:
+            if method not in self._stats:
+                self._stats[method] = MethodHedgeStats()
+            return self._stats[method]
+
+    def threshold(self, method):
+        stats = self._method(method)
+        with self._lock:
+            if len(stats.ttft) < self.min_samples:
+                return None
+            return _percentile(stats.ttft, self.quantile)
+
+    @staticmethod
+    def _stream(stream_fn, attempt):
+        # Runs once the rate limiter has admitted the attempt
+        attempt.started = time.monotonic()
+        attempt.running.set()
+        if attempt.cancel.is_set():
+            report_usage(0)  # the other attempt already won: don't send, and give back the token budget
+            raise HedgeCancelled()
+        parts = []
+        stream = stream_fn()
+        try:
+            for chunk in stream:
+                if attempt.cancel.is_set():
+                    raise HedgeCancelled()
+                check()
+                if attempt.first_token_at is None:
+                    attempt.first_token_at = time.monotonic()
+                    attempt.first_token.set()
+                parts.append(chunk)
+        finally:
+            close = getattr(stream, 'close', None)
+            if close:
+                close()  # releases the HTTP response / socket
+        return ''.join(parts)
+
+    def _start(self, stream_fn, run):
+        attempt = _Attempt(time.monotonic())
+        # Run in the caller's context so its deadline / cancel token still apply
+        context = contextvars.copy_context()
+        attempt.future = self._executor.submit(context.run, run, lambda: self._stream(stream_fn, attempt))
+        # An attempt that fails before it is sent (e.g. deadline in the rate limiter) stops the wait too
+        attempt.future.add_done_callback(lambda _: attempt.running.set())
+        return attempt
+
+    def call(self, method, stream_fn, estimated_tokens=0, run=None):
+        """
+        `stream_fn()` starts one streamed request and yields text chunks.
+        Each attempt is executed as `run(attempt_fn)` (e.g. through the rate
+        limiter). Returns the complete text of the first request to finish.
+        """
+        run = run or (lambda fn: fn())
+        stats = self._method(method)
+        self.budget.count_request()
+        with self._lock:
+            stats.requests += 1
+        threshold = self.threshold(method)
+
+        primary = self._start(stream_fn, run)
+        if threshold is not None:
+            primary.running.wait()
+            if primary.started is not None:
+                primary.first_token.wait(max(0.0, threshold - (time.monotonic() - primary.started)))
+        if threshold is None or primary.first_token.is_set() or primary.future.done() \
+                or not self.budget.try_spend():
+            text = primary.future.result()
+            self._record_primary(stats, primary)
+            return text
+
+        # Hedge: same request again, first one to finish wins
+        hedge = self._start(stream_fn, run)
+        with self._lock:
+            stats.hedged += 1
+            stats.extra_tokens += estimated_tokens
+
+        pending = {primary.future, hedge.future}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    text = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                if future is primary.future:
+                    hedge.cancel.set()
+                    hedge.future.cancel()  # still waiting for a worker
+                    self._record_primary(stats, primary)
+                else:
+                    primary.cancel.set()
+                    self._record_hedge_win(stats, primary)
+                return text
+        raise error
+
+    def _record_primary(self, stats, primary):
+        now = time.monotonic()
+        elapsed = now - primary.submitted
+        ttft = primary.ttft()
+        with self._lock:
+            if ttft is not None:
+                stats.ttft.append(ttft)
+                stats.generation.append(now - primary.first_token_at)
+            stats.latency.append(elapsed)
+            stats.unhedged_latency.append(elapsed)
+
+    def _record_hedge_win(self, stats, primary):
+        now = time.monotonic()
+        elapsed = now - primary.submitted
+        ttft = primary.ttft()
+        with self._lock:
+            generation = _percentile(stats.generation, 0.5) or 0.0
+            # The primary's first token is at least this late (censored sample)
+            if ttft is not None:
+                stats.ttft.append(ttft)
+            elif primary.started is not None:
+                stats.ttft.append(now - primary.started)
+            stats.hedge_wins += 1
+            stats.latency.append(elapsed)
+            if ttft is not None:
+                stats.unhedged_latency.append(max(elapsed, primary.first_token_at - primary.submitted + generation))
+            else:
+                stats.unhedged_latency.append(elapsed + generation)
+
+    def report(self):
+        with self._lock:
+            methods = {m: s.report() for m, s in self._stats.items()}
+        return {
+            'budget_percent': self.budget.percent,
+            'requests': self.budget.requests,
+            'hedges': self.budget.hedges,
+            'methods': methods,
+        }
+
+
+# Shared by every coach in this process
+hedger = Hedger(budget_percent=float(os.environ.get('COVERFITNESS_HEDGE_BUDGET', 5.0)))
@@ -0,0 +1,148 @@
+import contextvars
+import itertools
+import os
+import queue
+import threading
+import time
+
+from deadline import Cancelled, cancellation_stats, check
+from tracing import span
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id, fn, args, kwargs):
+        self.id = job_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.context = contextvars.copy_context()  # carries the submitter's deadline / cancel token
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+
+class JobQueue:
+    """
+    Fixed pool of worker threads fed from a bounded queue.
+
+    submit() returns immediately with a job id; callers poll status() and
+    collect result() when it is done, so no UI thread waits on the network.
+    Jobs run in the submitter's context, so a deadline or cancel token set
+    around submit() applies to the job; a job cancelled while still queued
+    is skipped. Finished jobs are kept for `keep_seconds` so a later rerun can still pick
+    up the result.
+
+    Sizing (defaults overridable by environment variables):
+        COVERFITNESS_WORKERS       worker threads    (4)
+        COVERFITNESS_QUEUE_DEPTH   max queued jobs   (32)
+    """
+
+    def __init__(self, workers=None, max_queue=None, keep_seconds=3600):
+        self.workers = workers or int(os.environ.get('COVERFITNESS_WORKERS', 4))
+        self.max_queue = max_queue or int(os.environ.get('COVERFITNESS_QUEUE_DEPTH', 32))
+        self.keep_seconds = keep_seconds
+
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._threads = []
+        for i in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"plan-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, fn, *args, **kwargs):
+        job = Job(f"job_{next(self._ids)}_{int(time.time())}", fn, args, kwargs)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise JobQueueFull(f"Plan generation queue is full ({self.max_queue} jobs waiting)")
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        return job.status if job else None
+
+    def result(self, job_id):
+        """Return the job's result, re-raising its exception if it failed."""
+        job = self.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        if job.status in (FAILED, CANCELLED):
+            raise job.error
+        if job.status != DONE:
+            raise RuntimeError(f"Job {job_id} is still {job.status}")
+        return job.result
+
+    def forget(self, job_id):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.started_at = time.time()
+            try:
+                job.context.run(check)
+            except Cancelled as e:
+                cancellation_stats.record_skipped_job()
+                job.error = e
+                job.status = CANCELLED
+                job.finished_at = time.time()
+                self._queue.task_done()
+                continue
+
+            job.status = RUNNING
+            try:
+                job.result = job.context.run(self._run, job)
+                job.status = DONE
+            except Cancelled as e:
+                print(f"Job {job.id} cancelled:", e)
+                job.error = e
+                job.status = CANCELLED
+            except Exception as e:
+                print(f"Job {job.id} failed:", e)
+                job.error = e
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    @staticmethod
+    def _run(job):
+        # Runs inside the submitter's context, so the span nests under the one that submitted it
+        with span(f"job.{getattr(job.fn, '__name__', 'job')}", cat='job', job_id=job.id,
+                  queued_ms=round((job.started_at - job.submitted_at) * 1000, 1)):
+            return job.fn(*job.args, **job.kwargs)
+
+    def _prune(self):
+        # Drop finished jobs nobody came back for
+        cutoff = time.time() - self.keep_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
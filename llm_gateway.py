@@ -0,0 +1,254 @@
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import hashlib
+import json
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.output_parsers import StrOutputParser
+
+from deadline import Cancelled, DeadlineExceeded, cancellation_stats, current
+from hedging import hedger
+from rate_limit import estimate_tokens, rate_limiter, report_usage
+from tracing import span
+
+
+class _LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls.
+
+    The first caller for a key runs the function; anyone arriving with the
+    same key while it is in flight waits on the same future and gets the same
+    result (or exception). The key is forgotten as soon as the call finishes,
+    so this is de-duplication, not caching. A follower waits no longer than
+    its own deadline, and if the leader was cancelled the follower retries
+    the call itself rather than inheriting someone else's cancellation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key, fn):
+        while True:
+            try:
+                return self._do(key, fn)
+            except _LeaderCancelled:
+                continue
+
+    def _do(self, key, fn):
+        with self._lock:
+            self.stats['calls'] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            ctx = current()
+            try:
+                return future.result(timeout=ctx and ctx.timeout())
+            except FutureTimeout:
+                raise DeadlineExceeded('deadline exceeded waiting for a coalesced request') from None
+            except Cancelled:
+                if ctx is not None:
+                    ctx.check()
+                raise _LeaderCancelled()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+
+class _UsageReporter(BaseCallbackHandler):
+    """Passes the token usage a response reports on to the rate limiter (rate_limit.report_usage)."""
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get('token_usage') or {}
+        total = usage.get('total_tokens')
+        if total is None:
+            # Streamed responses carry it on the message (ChatOpenAI(stream_usage=True))
+            counts = [getattr(g, 'message', None) and getattr(g.message, 'usage_metadata', None)
+                      for gens in response.generations for g in gens]
+            counts = [c['total_tokens'] for c in counts if c and c.get('total_tokens') is not None]
+            total = sum(counts) if counts else None
+        report_usage(total)
+
+
+# Every chain call reports its usage; the reporter is stateless, so one config serves all threads
+_CALL_CONFIG = {'callbacks': [_UsageReporter()]}
+
+
+def render(prompt, variables):
+    return prompt.format_prompt(**variables).to_string()
+
+
+def request_key(rendered, llm):
+    """Canonical hash of a request: rendered prompt + model settings."""
+    settings = {
+        'model': getattr(llm, 'model_name', None) or getattr(llm, 'model', None),
+        'temperature': getattr(llm, 'temperature', None),
+    }
+    payload = json.dumps(settings, sort_keys=True, default=str) + '\n' + rendered
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Shared by every coach (and therefore every Streamlit session) in this process
+single_flight = SingleFlight()
+
+
+def _bounded_chain(prompt, llm, ctx):
+    # The HTTP timeout is whatever is left of the deadline when the request starts
+    if ctx is not None and ctx.remaining() is not None:
+        llm = llm.bind(timeout=ctx.timeout(getattr(llm, 'request_timeout', None)))
+        return getattr(prompt, 'template', prompt) | llm | StrOutputParser()
+    if hasattr(prompt, 'chain'):
+        return prompt.chain(llm)  # prebuilt by the prompt registry
+    return prompt | llm | StrOutputParser()
+
+
+def _collect(stream, ctx):
+    """Join a streamed completion, aborting between chunks once the context is cancelled."""
+    parts = []
+    try:
+        for chunk in stream:
+            ctx.check()
+            parts.append(chunk)
+    finally:
+        stream.close()  # closes the HTTP response so the socket goes back to the pool
+    return ''.join(parts)
+
+
+def invoke_chain(prompt, llm, variables, expected_output_tokens=500, method=None, hedge=False, rendered=None):
+    """
+    Run `prompt | llm | StrOutputParser()`. `prompt` is a ChatPromptTemplate
+    or a prompt_registry.PromptVersion, whose chain is built only once.
+
+    Identical in-flight requests share one call, and the call itself goes
+    through the process-wide rate limiter (budgeted as prompt tokens +
+    expected_output_tokens). With `hedge`, the completion is streamed and a
+    slow first token triggers a hedged duplicate (see hedging.Hedger); each
+    attempt is rate limited on its own.
+
+    Under a deadline (deadline.deadline), the HTTP timeout is capped by the
+    time left and the completion is streamed so that a cancelled request is
+    dropped at its next chunk. Abandoned calls raise Cancelled /
+    DeadlineExceeded and are counted in deadline.cancellation_stats.
+    """
+    ctx = current()
+    if rendered is None:
+        rendered = render(getattr(prompt, 'template', prompt), variables)
+    estimated = estimate_tokens(rendered) + expected_output_tokens
+
+    def attempt():
+        chain = _bounded_chain(prompt, llm, ctx)
+        if ctx is None:
+            return chain.invoke(variables, config=_CALL_CONFIG)
+        return _collect(chain.stream(variables, config=_CALL_CONFIG), ctx)
+
+    def run():
+        if hedge:
+            return hedger.call(method,
+                               lambda: _bounded_chain(prompt, llm, ctx).stream(variables, config=_CALL_CONFIG),
+                               expected_output_tokens,
+                               run=lambda fn: rate_limiter.call(fn, estimated))
+        return rate_limiter.call(attempt, estimated)
+
+    started = time.monotonic()
+    try:
+        if ctx is not None:
+            ctx.check()
+        return single_flight.do(request_key(rendered, llm), run)
+    except Cancelled as e:
+        cancellation_stats.record(method, e, time.monotonic() - started, estimated)
+        raise
+    except Exception as e:
+        if ctx is None or not ctx.expired():
+            raise
+        # The HTTP timeout we derived from the deadline fired
+        error = DeadlineExceeded(f"deadline exceeded: {e}")
+        cancellation_stats.record(method, error, time.monotonic() - started, estimated)
+        raise error from e
+
+
+class Completion(str):
+    """Completion text that remembers which route and model produced it."""
+
+    def __new__(cls, text, method=None, model=None, prompt_version=None):
+        obj = super().__new__(cls, text)
+        obj.method = method
+        obj.model = model
+        obj.prompt_version = prompt_version
+        return obj
+
+
+def invoke_routed(routes, method, prompt, variables, expected_output_tokens=500):
+    """
+    Invoke `prompt` for a coach method using its route: the primary model
+    within the route's timeout, then the fallback model if that fails.
+    Latency and errors are recorded per (method, model), and per prompt
+    version when `prompt` comes from the prompt registry. Cancelled or
+    expired calls are not retried on the fallback.
+    """
+    stats = getattr(prompt, 'stats', None)
+    rendered = render(getattr(prompt, 'template', prompt), variables)
+    route = routes.get(method)
+    # A duplicate request to a local CPU model only queues behind the first one
+    hedge = route.options.get('hedge', False) and route.backend != 'local'
+    models = route.models()
+    for attempt, model in enumerate(models):
+        llm = routes.llm(model, route.timeout, route.temperature, **route.client_options())
+        started = time.monotonic()
+        try:
+            with span('llm.request', cat='llm', method=method, model=model, prompt=getattr(prompt, 'key', None),
+                      fallback=attempt > 0, hedge=hedge) as request_span:
+                text = invoke_chain(prompt, llm, variables, expected_output_tokens, method=f"{method}:{model}",
+                                    hedge=hedge, rendered=rendered)
+                request_span.set(output_chars=len(text))
+        except Cancelled:
+            routes.record_call(method, model, time.monotonic() - started, ok=False, fallback=attempt > 0)
+            raise
+        except Exception as e:
+            routes.record_call(method, model, time.monotonic() - started, ok=False, fallback=attempt > 0)
+            if stats is not None:
+                stats.record(time.monotonic() - started, ok=False)
+            if attempt == len(models) - 1:
+                raise
+            print(f"{method}: {model} failed ({e}); falling back to {models[attempt + 1]}")
+            continue
+        latency = time.monotonic() - started
+        routes.record_call(method, model, latency, ok=True, fallback=attempt > 0)
+        if stats is not None:
+            stats.record(latency, estimate_tokens(rendered), estimate_tokens(text))
+        return Completion(text, method, model, getattr(prompt, 'key', None))
+
+
+def parse_json(routes, response):
+    """json.loads that also feeds the route's quality counters."""
+    try:
+        with span('json.parse', cat='parse', method=getattr(response, 'method', None), chars=len(response)):
+            parsed = json.loads(response)
+    except Exception:
+        routes.record_parse(getattr(response, 'method', None), getattr(response, 'model', None), False)
+        raise
+    routes.record_parse(getattr(response, 'method', None), getattr(response, 'model', None), True)
+    return parsed
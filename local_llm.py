@@ -0,0 +1,186 @@
+"""
+CPU-only local chat model backend.
+
+With COVERFITNESS_LLM_BACKEND=local (or "backend": "local" on a route in
+model_routes.json) the coaches run on a small quantized instruction-tuned
+model instead of the hosted API, either in-process through llama-cpp-python
+or on a local OpenAI-compatible server (llama.cpp `llama-server`):
+
+    pip install llama-cpp-python
+    COVERFITNESS_LLM_BACKEND=local COVERFITNESS_LOCAL_MODEL=models/qwen2.5-3b-instruct-q4_k_m.gguf \
+        streamlit run fitness_version.py
+
+    llama-server -m models/qwen2.5-3b-instruct-q4_k_m.gguf --threads 8 --port 8080
+    COVERFITNESS_LLM_BACKEND=local COVERFITNESS_LOCAL_LLM_URL=http://127.0.0.1:8080/v1 \
+        streamlit run fitness_version.py
+
+Routes with a "json_schema" (wire_schema.JSON_SCHEMAS) get their output
+constrained to that schema by a grammar, so small models can't return
+malformed plans. The in-process model is loaded once and runs one request at
+a time on COVERFITNESS_LOCAL_THREADS threads, which keeps the cost of a
+request predictable; concurrent requests queue, but give up when their
+deadline (deadline.py) passes or they are cancelled. A route's timeout
+bounds queueing plus generation, as it bounds the HTTP call of the hosted API.
+
+    COVERFITNESS_LOCAL_MODEL        GGUF model file for the in-process backend   (unset)
+    COVERFITNESS_LOCAL_LLM_URL      use this local server instead                (unset)
+    COVERFITNESS_LOCAL_THREADS      CPU threads for generation                   (all cores)
+    COVERFITNESS_LOCAL_CTX          context window in tokens                     (8192)
+    COVERFITNESS_LOCAL_MAX_TOKENS   output tokens per request                    (3072)
+"""
+import json
+import os
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from deadline import current
+from wire_schema import JSON_SCHEMAS
+
+LOCAL_MODEL = os.environ.get('COVERFITNESS_LOCAL_MODEL')
+LOCAL_URL = os.environ.get('COVERFITNESS_LOCAL_LLM_URL')
+LOCAL_THREADS = int(os.environ.get('COVERFITNESS_LOCAL_THREADS') or os.cpu_count() or 1)
+LOCAL_CTX = int(os.environ.get('COVERFITNESS_LOCAL_CTX', 8192))
+LOCAL_MAX_TOKENS = int(os.environ.get('COVERFITNESS_LOCAL_MAX_TOKENS', 3072))
+
+ROLES = {'human': 'user', 'ai': 'assistant', 'system': 'system'}
+
+_model = None
+_grammars = {}
+_load_lock = threading.Lock()
+# One generation at a time: it already uses every thread it is given
+_inference_lock = threading.Lock()
+# How often a queued request re-checks its deadline / cancel token
+_POLL_SECONDS = 0.1
+
+
+class LocalTimeout(TimeoutError):
+    pass
+
+
+def get_local_model():
+    """The in-process llama.cpp model, loaded on first use."""
+    global _model
+    with _load_lock:
+        if _model is None:
+            if not LOCAL_MODEL:
+                raise RuntimeError("COVERFITNESS_LOCAL_MODEL must point to a GGUF model file "
+                                   "(or set COVERFITNESS_LOCAL_LLM_URL to use a local server)")
+            from llama_cpp import Llama
+
+            print(f"Loading local model {LOCAL_MODEL} ({LOCAL_THREADS} threads)")
+            _model = Llama(model_path=LOCAL_MODEL, n_ctx=LOCAL_CTX, n_threads=LOCAL_THREADS,
+                           n_threads_batch=LOCAL_THREADS, verbose=False)
+        return _model
+
+
+def grammar_for(schema_name):
+    """llama.cpp grammar for one of wire_schema.JSON_SCHEMAS, built once."""
+    with _load_lock:
+        if schema_name not in _grammars:
+            from llama_cpp import LlamaGrammar
+
+            _grammars[schema_name] = LlamaGrammar.from_json_schema(json.dumps(JSON_SCHEMAS[schema_name]),
+                                                                   verbose=False)
+        return _grammars[schema_name]
+
+
+class LocalChatModel(BaseChatModel):
+    """Chat model on the in-process llama.cpp model; same chain interface as ChatOpenAI."""
+
+    model_name: str = 'local'
+    temperature: float = 0
+    request_timeout: Any = None  # seconds for queueing + generation, like the hosted client's HTTP timeout
+    json_schema: Optional[str] = None
+    max_tokens: int = LOCAL_MAX_TOKENS
+
+    @property
+    def _llm_type(self):
+        return 'llama-cpp'
+
+    def _request(self, messages, stream):
+        request = {
+            'messages': [{'role': ROLES.get(m.type, 'user'), 'content': str(m.content)} for m in messages],
+            'temperature': self.temperature,
+            'max_tokens': self.max_tokens,
+            'stream': stream,
+        }
+        if self.json_schema:
+            request['grammar'] = grammar_for(self.json_schema)
+        return request
+
+    def _expires_at(self, kwargs):
+        # The gateway binds a shorter `timeout` when a deadline is running
+        timeout = kwargs.pop('timeout', None) or self.request_timeout
+        return None if timeout is None else time.monotonic() + float(timeout)
+
+    @staticmethod
+    def _check(expires_at):
+        ctx = current()
+        if ctx is not None:
+            ctx.check()  # Cancelled / DeadlineExceeded
+        if expires_at is not None and time.monotonic() >= expires_at:
+            raise LocalTimeout('local model request timed out')
+
+    def _acquire(self, expires_at):
+        """Wait for the model, but no longer than the timeout / deadline, and not once cancelled."""
+        while True:
+            self._check(expires_at)
+            wait = _POLL_SECONDS
+            if expires_at is not None:
+                wait = max(0.0, min(wait, expires_at - time.monotonic()))
+            if _inference_lock.acquire(timeout=wait):
+                return
+
+    def _chunks(self, messages, stop, kwargs):
+        # Generation is streamed even for invoke(), so it stops between tokens on timeout or cancellation
+        expires_at = self._expires_at(kwargs)
+        model = get_local_model()
+        self._acquire(expires_at)
+        stream = None
+        try:
+            stream = model.create_chat_completion(stop=stop, **self._request(messages, True))
+            for chunk in stream:
+                self._check(expires_at)
+                text = chunk['choices'][0]['delta'].get('content')
+                if text:
+                    yield text
+        finally:
+            if stream is not None:
+                stream.close()
+            _inference_lock.release()
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                  **kwargs: Any) -> ChatResult:
+        text = ''.join(self._chunks(messages, stop, kwargs))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        # Closing the stream (cancellation) releases the model for the next request
+        for text in self._chunks(messages, stop, kwargs):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+
+def local_chat_model(model, temperature=0, timeout=None, json_schema=None):
+    """
+    The local backend's client for a route: LocalChatModel in-process, or a
+    ChatOpenAI pointed at COVERFITNESS_LOCAL_LLM_URL. `model` (the route's
+    hosted model name) is not used: the local model is always the configured one.
+    """
+    name = os.path.basename(LOCAL_MODEL) if LOCAL_MODEL else 'local'
+    if LOCAL_URL:
+        from langchain_openai import ChatOpenAI
+
+        model_kwargs = {}
+        if json_schema:
+            # llama.cpp's server turns a schema in response_format into a grammar
+            model_kwargs['response_format'] = {'type': 'json_object', 'schema': JSON_SCHEMAS[json_schema]}
+        return ChatOpenAI(model=name, base_url=LOCAL_URL, api_key='local', temperature=temperature,
+                          timeout=timeout, max_retries=0, max_tokens=LOCAL_MAX_TOKENS, model_kwargs=model_kwargs)
+    return LocalChatModel(model_name=name, temperature=temperature, request_timeout=timeout,
+                          json_schema=json_schema)
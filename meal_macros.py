@@ -0,0 +1,226 @@
+from array import array
+import re
+
+# kcal per gram
+KCAL_PER_G = {'carbs': 4.0, 'protein': 4.0, 'fat': 9.0}
+
+# "1,200 calories": thousands separators are part of the number
+_KCAL_RE = re.compile(r'(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)\s*(?:kcal|calories|cal)\b', re.I)
+_GRAM_RE = re.compile(r'(\d+(?:\.\d+)?)\s*g(?:rams?)?\s*(?:of\s+)?(carb(?:ohydrate)?s?|proteins?|fats?)\b', re.I)
+_NUM_RE = re.compile(r'\d+(?:\.\d+)?')
+
+# Relative tolerances before a number counts as inconsistent
+MEAL_TOLERANCE = 0.15   # stated meal kcal vs 4/4/9 macro kcal
+DAY_TOLERANCE = 0.10    # sum of meals vs Total_Calories
+GOAL_TOLERANCE = 0.20   # Total_Calories vs calorie goal (training / rest days legitimately differ)
+
+
+def parse_macros(text):
+    """
+    "300 calories, 25g carbs, 30g protein, 12g fat" -> (300.0, 25.0, 30.0, 12.0)
+    Missing values are NaN; a missing kcal is derived from the macros.
+    """
+    kcal = carbs = protein = fat = float('nan')
+    text = str(text or '')
+
+    m = _KCAL_RE.search(text)
+    if m:
+        kcal = float(m.group(1).replace(',', ''))
+    for value, name in _GRAM_RE.findall(text):
+        name = name.lower()
+        if name.startswith('carb'):
+            carbs = float(value)
+        elif name.startswith('protein'):
+            protein = float(value)
+        else:
+            fat = float(value)
+
+    if kcal != kcal and carbs == carbs and protein == protein and fat == fat:
+        kcal = macro_kcal(carbs, protein, fat)
+    return kcal, carbs, protein, fat
+
+
+def macro_kcal(carbs, protein, fat):
+    return carbs * KCAL_PER_G['carbs'] + protein * KCAL_PER_G['protein'] + fat * KCAL_PER_G['fat']
+
+
+def format_macros(kcal, carbs, protein, fat):
+    return f"{round(kcal)} calories, {round(carbs)}g carbs, {round(protein)}g protein, {round(fat)}g fat"
+
+
+def format_distribution(carbs, protein, fat):
+    kcal = macro_kcal(carbs, protein, fat)
+    if kcal <= 0:
+        return 'N/A'
+    shares = [round(grams * KCAL_PER_G[name] / kcal * 100)
+              for grams, name in ((carbs, 'carbs'), (protein, 'protein'), (fat, 'fat'))]
+    return f"{shares[0]}% carbs, {shares[1]}% protein, {shares[2]}% fat"
+
+
+def to_number(value, missing=float('nan')):
+    """First number in an LLM value: 30 -> 30.0, "30 min" -> 30.0, "1,200 kcal" -> 1200.0; `missing` if none."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value) if value == value else missing
+    m = _NUM_RE.search(str(value or '').replace(',', ''))
+    return float(m.group()) if m else missing
+
+
+class DayMacros:
+    """Numeric view of one meal plan day: one array slot per meal."""
+
+    def __init__(self, day, day_data):
+        self.day = day
+        self.meal_names = []
+        self.kcal = array('d')
+        self.carbs = array('d')
+        self.protein = array('d')
+        self.fat = array('d')
+        for name, meal in (day_data.get('Meals') or {}).items():
+            kcal, carbs, protein, fat = parse_macros(meal.get('Macros', '') if isinstance(meal, dict) else '')
+            self.meal_names.append(name)
+            self.kcal.append(kcal)
+            self.carbs.append(carbs)
+            self.protein.append(protein)
+            self.fat.append(fat)
+        self.stated_total = to_number(day_data.get('Total_Calories'))
+
+    def total_kcal(self):
+        return sum(k for k in self.kcal if k == k)
+
+    def totals(self):
+        return {
+            'kcal': self.total_kcal(),
+            'carbs': sum(v for v in self.carbs if v == v),
+            'protein': sum(v for v in self.protein if v == v),
+            'fat': sum(v for v in self.fat if v == v),
+        }
+
+
+def check_day(day_macros, calorie_goal=None):
+    """Return a list of human readable issues for one day (empty if consistent)."""
+    issues = []
+    for i, name in enumerate(day_macros.meal_names):
+        kcal = day_macros.kcal[i]
+        if kcal != kcal:
+            issues.append(f"{name}: calories missing")
+            continue
+        carbs, protein, fat = day_macros.carbs[i], day_macros.protein[i], day_macros.fat[i]
+        if carbs == carbs and protein == protein and fat == fat:
+            from_macros = macro_kcal(carbs, protein, fat)
+            if kcal and abs(from_macros - kcal) / kcal > MEAL_TOLERANCE:
+                issues.append(f"{name}: {kcal:.0f} kcal stated but macros give {from_macros:.0f} kcal")
+
+    meal_total = day_macros.total_kcal()
+    stated = day_macros.stated_total
+    if stated == stated and stated and abs(meal_total - stated) / stated > DAY_TOLERANCE:
+        issues.append(f"meals add up to {meal_total:.0f} kcal but Total_Calories is {stated:.0f}")
+    if calorie_goal and stated == stated and abs(stated - calorie_goal) / calorie_goal > GOAL_TOLERANCE:
+        issues.append(f"Total_Calories {stated:.0f} is far from the calorie goal {calorie_goal:.0f}")
+    return issues
+
+
+def _day_target(day_macros, calorie_goal):
+    # Trust the stated day total unless it is itself off-goal, then pull it back into range
+    stated = day_macros.stated_total
+    target = stated if stated == stated and stated > 0 else day_macros.total_kcal()
+    if calorie_goal:
+        low, high = calorie_goal * (1 - GOAL_TOLERANCE), calorie_goal * (1 + GOAL_TOLERANCE)
+        target = min(max(target, low), high)
+    return target
+
+
+def rescale_day(day_data, day_macros, target_kcal):
+    """Scale every meal proportionally so the day sums to target_kcal; rewrites the strings in place."""
+    meals = day_data.get('Meals') or {}
+    # Gram amounts win over a stated kcal figure that contradicts them
+    for i in range(len(day_macros.meal_names)):
+        carbs, protein, fat = day_macros.carbs[i], day_macros.protein[i], day_macros.fat[i]
+        if carbs == carbs and protein == protein and fat == fat:
+            day_macros.kcal[i] = macro_kcal(carbs, protein, fat)
+    current = day_macros.total_kcal()
+    if current <= 0:
+        return
+    factor = target_kcal / current
+    for i, name in enumerate(day_macros.meal_names):
+        kcal = day_macros.kcal[i]
+        if kcal != kcal:
+            continue
+        carbs, protein, fat = (v * factor if v == v else 0.0 for v in
+                               (day_macros.carbs[i], day_macros.protein[i], day_macros.fat[i]))
+        day_macros.kcal[i] = kcal * factor
+        day_macros.carbs[i], day_macros.protein[i], day_macros.fat[i] = carbs, protein, fat
+        meals[name]['Macros'] = format_macros(kcal * factor, carbs, protein, fat)
+        # Portions scale with the numbers so ingredient lists stay consistent
+        for item in meals[name].get('Ingredients') or []:
+            if isinstance(item, dict) and isinstance(item.get('grams'), (int, float)):
+                item['grams'] = round(item['grams'] * factor)
+    day_data['Total_Calories'] = round(target_kcal)
+    day_macros.stated_total = float(round(target_kcal))
+
+
+def validate_meal_plan(meal_plan, calorie_goal=None, fix=True):
+    """
+    Check every day of a meal plan and, if `fix`, rescale inconsistent days locally.
+
+    Returns {day: {'issues': [...], 'fixed': bool, 'totals': {...}}}.
+    """
+    report = {}
+    for day, day_data in (meal_plan or {}).items():
+        if not isinstance(day_data, dict):
+            continue
+        day_macros = DayMacros(day, day_data)
+        issues = check_day(day_macros, calorie_goal)
+        fixed = False
+        if issues and fix and day_macros.meal_names:
+            rescale_day(day_data, day_macros, _day_target(day_macros, calorie_goal))
+            fixed = True
+        report[day] = {'issues': issues, 'fixed': fixed, 'totals': day_macros.totals()}
+    return report
+
+
+def fill_macros_from_ingredients(meal_plan, food_db):
+    """
+    Compute each meal's Macros and each day's Total_Calories / Macro_Distribution
+    from its Ingredients ([{"food": ..., "grams": ...}]) using the local food table.
+
+    Meals containing a food the table doesn't know, or an ingredient without a
+    usable quantity, keep whatever Macros the model gave.
+    Returns (unknown food names, "food: grams" of ingredients with a bad quantity).
+    """
+    unknown = []
+    bad_quantity = []
+    for day_data in (meal_plan or {}).values():
+        if not isinstance(day_data, dict):
+            continue
+        for meal in (day_data.get('Meals') or {}).values():
+            ingredients = meal.get('Ingredients') if isinstance(meal, dict) else None
+            if not ingredients:
+                continue
+            meal_total = {'kcal': 0.0, 'protein': 0.0, 'carbs': 0.0, 'fat': 0.0}
+            complete = True
+            for item in ingredients:
+                food = item.get('food', '')
+                per_gram = food_db.per_gram(food)
+                if per_gram is None:
+                    unknown.append(food)
+                    complete = False
+                    continue
+                grams = to_number(item.get('grams'))
+                if grams != grams or grams < 0:
+                    bad_quantity.append(f"{food}: {item.get('grams')!r}")
+                    complete = False
+                    continue
+                values = {k: v * grams for k, v in per_gram.items()}
+                for k in meal_total:
+                    meal_total[k] += values[k]
+            if complete:
+                meal['Macros'] = format_macros(meal_total['kcal'], meal_total['carbs'],
+                                               meal_total['protein'], meal_total['fat'])
+
+        day_macros = DayMacros(None, day_data)
+        totals = day_macros.totals()
+        if totals['kcal'] > 0:
+            day_data['Total_Calories'] = round(totals['kcal'])
+            day_data['Macro_Distribution'] = format_distribution(totals['carbs'], totals['protein'], totals['fat'])
+    return unknown, bad_quantity
+
@@ -0,0 +1,149 @@
+from collections import deque
+import json
+import os
+import threading
+
+ROUTES_PATH = os.environ.get(
+    'COVERFITNESS_ROUTES',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'model_routes.json'))
+
+# 'openai' (hosted) or 'local' (local_llm.py); a route's "backend" overrides it
+DEFAULT_BACKEND = os.environ.get('COVERFITNESS_LLM_BACKEND', 'openai')
+
+
+class Route:
+    def __init__(self, method, model, timeout=None, fallback=None, temperature=0, **options):
+        self.method = method
+        self.model = model
+        self.timeout = timeout
+        self.fallback = fallback
+        self.temperature = temperature
+        self.options = options  # extra per-route settings for other layers
+
+    def models(self):
+        # Every model name runs on the same local model, so a local "fallback" would only repeat the attempt
+        if self.backend == 'local' or not self.fallback or self.fallback == self.model:
+            return [self.model]
+        return [self.model, self.fallback]
+
+    @property
+    def backend(self):
+        return self.options.get('backend', DEFAULT_BACKEND)
+
+    def client_options(self):
+        # Route settings the client itself needs: its backend and the JSON schema
+        # a grammar-constrained backend should hold the output to
+        options = {'backend': self.backend}
+        if self.options.get('json_schema'):
+            options['json_schema'] = self.options['json_schema']
+        return options
+
+
+class RouteStats:
+    """Latency and quality counters for one (method, model) pair."""
+
+    def __init__(self, window=200):
+        self.calls = 0
+        self.errors = 0
+        self.fallbacks = 0
+        self.parse_ok = 0
+        self.parse_failed = 0
+        self.latencies = deque(maxlen=window)
+
+    def percentile(self, q):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'fallbacks': self.fallbacks,
+            'parse_ok': self.parse_ok,
+            'parse_failed': self.parse_failed,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+        }
+
+
+class RouteTable:
+    """
+    Maps each coach method to a primary model, a timeout budget and a fallback model.
+
+    Routes are read from model_routes.json (or $COVERFITNESS_ROUTES) and
+    re-read whenever the file changes, so they can be tuned per method
+    without code changes or restarts. Clients are built once per
+    (model, timeout, temperature, client options) through `llm_factory`.
+    """
+
+    def __init__(self, llm_factory, path=ROUTES_PATH):
+        self.llm_factory = llm_factory
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._routes = {}
+        self._clients = {}
+        self._stats = {}
+
+    def _load(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime and self._routes:
+            return
+        routes = {'default': {'model': 'gpt-3.5-turbo'}}
+        if mtime is not None:
+            with open(self.path, 'r') as f:
+                routes.update(json.load(f))
+        self._routes = routes
+        self._mtime = mtime
+
+    def get(self, method):
+        with self._lock:
+            self._load()
+            config = dict(self._routes['default'])
+            config.update(self._routes.get(method, {}))
+        return Route(method, **config)
+
+    def llm(self, model, timeout=None, temperature=0, **options):
+        key = (model, timeout, temperature, tuple(sorted(options.items())))
+        with self._lock:
+            if key not in self._clients:
+                self._clients[key] = self.llm_factory(temperature=temperature, model=model, timeout=timeout,
+                                                      **options)
+            return self._clients[key]
+
+    # ---------------- counters ----------------
+    def _stat(self, method, model):
+        key = (method, model)
+        if key not in self._stats:
+            self._stats[key] = RouteStats()
+        return self._stats[key]
+
+    def record_call(self, method, model, latency, ok=True, fallback=False):
+        with self._lock:
+            stats = self._stat(method, model)
+            stats.calls += 1
+            stats.latencies.append(latency)
+            if not ok:
+                stats.errors += 1
+            if fallback:
+                stats.fallbacks += 1
+
+    def record_parse(self, method, model, ok):
+        with self._lock:
+            stats = self._stat(method, model)
+            if ok:
+                stats.parse_ok += 1
+            else:
+                stats.parse_failed += 1
+
+    def stats(self, method=None, model=None):
+        with self._lock:
+            if method is not None and model is not None:
+                return self._stat(method, model)
+            return {f"{m}:{mdl}": s.snapshot() for (m, mdl), s in self._stats.items()}
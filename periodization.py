@@ -0,0 +1,143 @@
+"""
+Deterministic multi-week programs built from one LLM-generated base week.
+
+Weeks are grouped into blocks of loading weeks followed by a deload week.
+Within a block, session time (up to the user's available time) and intensity
+rise each week; a deload cuts both; each new block starts one step above the
+previous one. Calorie targets are recalculated every week from the projected
+body weight, and exercise calories scale with that weight too.
+"""
+import copy
+import math
+
+from meal_macros import to_number
+
+MIN_WEEKS = 12
+MAX_WEEKS = 24
+KCAL_PER_KG = 7700
+
+# Per fitness level: loading weeks per block and weekly progression steps
+PROGRESSION = {
+    'Beginner': {'loading_weeks': 3, 'volume_step': 0.05, 'intensity_step': 0.03},
+    'Intermediate': {'loading_weeks': 3, 'volume_step': 0.04, 'intensity_step': 0.04},
+    'Advanced': {'loading_weeks': 4, 'volume_step': 0.03, 'intensity_step': 0.05},
+}
+DELOAD_VOLUME = 0.7
+DELOAD_INTENSITY = 0.9
+MAX_SESSION_STRETCH = 1.15  # sessions may grow to 115% of the stated workout_duration
+
+
+def program_length(target_months):
+    """Weeks covering the goal horizon, within MIN_WEEKS..MAX_WEEKS."""
+    weeks = math.ceil(max(1, target_months or 0) * 52 / 12)
+    return min(MAX_WEEKS, max(MIN_WEEKS, weeks))
+
+
+def week_phases(weeks, fitness_level='Beginner'):
+    """[(block, phase, step)] per week; step counts loading weeks since the program start."""
+    loading = PROGRESSION.get(fitness_level, PROGRESSION['Beginner'])['loading_weeks']
+    phases = []
+    block, in_block, step = 1, 0, 0
+    for week in range(weeks):
+        is_last = week == weeks - 1
+        if in_block == loading and not is_last:
+            phases.append((block, 'deload', step - 1))  # deload from the block's peak load
+            block, in_block = block + 1, 0
+            step -= loading - 1  # next block starts one step above the previous block's start
+            continue
+        phases.append((block, 'build', step))
+        in_block += 1
+        step += 1
+    return phases
+
+
+def _scale_week(base_plan, volume, intensity, weight_ratio, max_session):
+    plan = copy.deepcopy(base_plan)
+    weekly_total = 0.0
+    for day_plan in plan.get('weekly_plan', []):
+        base_duration = sum(to_number(ex.get('duration_min'), 0.0) for ex in day_plan.get('exercises', []))
+        day_volume = volume
+        if max_session and base_duration:
+            # Past the user's available time, overload comes from intensity only
+            day_volume = max(min(volume, max_session / base_duration), min(volume, 1.0))
+        day_duration = 0
+        day_calories = 0.0
+        for ex in day_plan.get('exercises', []):
+            duration = to_number(ex.get('duration_min'), 0.0)
+            rate = to_number(ex.get('calories_burned'), 0.0) / duration if duration else 0.0
+            ex['duration_min'] = int(round(duration * day_volume))
+            ex['calories_burned'] = round(rate * intensity * weight_ratio * ex['duration_min'], 1)
+            ex['intensity'] = round(intensity, 2)
+            day_duration += ex['duration_min']
+            day_calories += ex['calories_burned']
+        day_plan['total_duration'] = day_duration
+        day_plan['total_calories'] = round(day_calories, 1)
+        weekly_total += day_calories
+    return plan, round(weekly_total, 1)
+
+
+def build_program(base_plan, user_data, calorie_targets, exercise_target, weeks=None):
+    """
+    Expand `base_plan` (one week, totals already recomputed locally) into a
+    program covering the user's target_months.
+
+    calorie_targets(user_data) -> tdee info dict (calculate_tdee_and_calorie_goal)
+    exercise_target(tdee_info)  -> weekly exercise kcal (estimate_weekly_exercise_target)
+    """
+    level = user_data.get('fitness_level', 'Beginner')
+    steps = PROGRESSION.get(level, PROGRESSION['Beginner'])
+    weeks = weeks or program_length(user_data.get('target_months', 3))
+    start_weight = float(user_data['weight'])
+    target_weight = float(user_data.get('target_weight', start_weight))
+    max_session = float(user_data.get('workout_duration') or 0) * MAX_SESSION_STRETCH
+
+    weight = start_weight
+    program = []
+    for week, (block, phase, step) in enumerate(week_phases(weeks, level), 1):
+        # 1. Calorie targets from the projected weight and the weeks left to the goal
+        weeks_left = max(1, weeks - week + 1)
+        reached = abs(target_weight - weight) < 0.05
+        week_user = dict(user_data, weight=round(weight, 2),
+                         target_weight=weight if reached else target_weight,
+                         target_months=weeks_left * 12 / 52)
+        tdee_info = calorie_targets(week_user)
+
+        # 2. Load for this week
+        volume = 1 + steps['volume_step'] * step
+        intensity = 1 + steps['intensity_step'] * step
+        if phase == 'deload':
+            volume *= DELOAD_VOLUME
+            intensity *= DELOAD_INTENSITY
+        plan, weekly_total = _scale_week(base_plan, volume, intensity, weight / start_weight, max_session)
+
+        program.append({
+            'week': week,
+            'block': block,
+            'phase': phase,
+            'volume': round(volume, 3),
+            'intensity': round(intensity, 3),
+            'projected_weight': round(weight, 2),
+            'tdee': tdee_info['tdee'],
+            'calorie_goal': tdee_info['calorie_goal'],
+            'weekly_exercise_target': exercise_target(tdee_info),
+            'weekly_total': weekly_total,
+            'weekly_plan': plan.get('weekly_plan', []),
+        })
+
+        # 3. Project next week's weight from this week's planned energy balance
+        change = (tdee_info['calorie_goal'] - tdee_info['tdee']) * 7 / KCAL_PER_KG
+        if target_weight < weight:
+            weight = max(target_weight, weight + change)
+        elif target_weight > weight:
+            weight = min(target_weight, weight + change)
+
+    return {
+        'weeks': program,
+        'summary': {
+            'weeks': weeks,
+            'start_weight': start_weight,
+            'target_weight': target_weight,
+            'projected_end_weight': round(weight, 2),
+            'deload_weeks': [w['week'] for w in program if w['phase'] == 'deload'],
+        },
+    }
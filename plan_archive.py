@@ -0,0 +1,285 @@
+"""
+Columnar archive of generated plans for analytics.
+
+Every exercise of a workout plan and every meal of a meal plan becomes one
+row in a Parquet dataset, hive-partitioned by date:
+
+    <root>/exercises/date=2026-10-19/part-<timestamp>-<id>.parquet
+    <root>/meals/date=2026-10-19/part-<timestamp>-<id>.parquet
+
+Rows are buffered and written in batches; each flush writes new files only,
+so appending never rewrites existing data. Read it back with
+`PlanArchive(root).dataset('exercises')` (a pyarrow dataset) or any
+Parquet-aware engine (DuckDB, Spark, pandas).
+"""
+import atexit
+from datetime import datetime, timezone
+import json
+import os
+import threading
+import time
+import uuid
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from meal_macros import parse_macros
+
+ARCHIVE_ROOT = os.environ.get('COVERFITNESS_ARCHIVE', 'plan_archive')
+
+EXERCISE_SCHEMA = pa.schema([
+    ('plan_id', pa.string()),
+    ('user_id', pa.string()),
+    ('created_at', pa.timestamp('ms', tz='UTC')),
+    ('week', pa.int16()),
+    ('day', pa.string()),
+    ('position', pa.int16()),
+    ('name', pa.string()),
+    ('duration_min', pa.float32()),
+    ('calories_burned', pa.float32()),
+    ('target_muscle', pa.string()),
+    ('intensity', pa.float32()),
+])
+
+MEAL_SCHEMA = pa.schema([
+    ('plan_id', pa.string()),
+    ('user_id', pa.string()),
+    ('created_at', pa.timestamp('ms', tz='UTC')),
+    ('day', pa.string()),
+    ('meal', pa.string()),
+    ('menu', pa.string()),
+    ('kcal', pa.float32()),
+    ('carbs_g', pa.float32()),
+    ('protein_g', pa.float32()),
+    ('fat_g', pa.float32()),
+    ('ingredients', pa.list_(pa.struct([('food', pa.string()), ('grams', pa.float32())]))),
+])
+
+SCHEMAS = {'exercises': EXERCISE_SCHEMA, 'meals': MEAL_SCHEMA}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _nan_to_none(value):
+    return None if value != value else value
+
+
+def flatten_workout(plan, plan_id, user_id, created_at, week=None):
+    """One row per exercise of a {'weekly_plan': [...]} workout plan."""
+    for day_plan in (plan or {}).get('weekly_plan', []):
+        for position, ex in enumerate(day_plan.get('exercises', []), 1):
+            yield {
+                'plan_id': plan_id,
+                'user_id': user_id,
+                'created_at': created_at,
+                'week': week,
+                'day': day_plan.get('day'),
+                'position': position,
+                'name': ex.get('name'),
+                'duration_min': _number(ex.get('duration_min')),
+                'calories_burned': _number(ex.get('calories_burned')),
+                'target_muscle': ex.get('target_muscle'),
+                'intensity': _number(ex.get('intensity')),
+            }
+
+
+def flatten_meals(meal_plan, plan_id, user_id, created_at):
+    """One row per meal of a {day: {'Meals': {...}}} meal plan."""
+    for day, day_data in (meal_plan or {}).items():
+        if not isinstance(day_data, dict):
+            continue
+        for meal_name, meal in (day_data.get('Meals') or {}).items():
+            kcal, carbs, protein, fat = parse_macros(meal.get('Macros'))
+            yield {
+                'plan_id': plan_id,
+                'user_id': user_id,
+                'created_at': created_at,
+                'day': day,
+                'meal': meal_name,
+                'menu': meal.get('Menu'),
+                'kcal': _nan_to_none(kcal),
+                'carbs_g': _nan_to_none(carbs),
+                'protein_g': _nan_to_none(protein),
+                'fat_g': _nan_to_none(fat),
+                'ingredients': [{'food': str(item.get('food', '')), 'grams': _number(item.get('grams'))}
+                                for item in meal.get('Ingredients') or [] if isinstance(item, dict)],
+            }
+
+
+class PlanArchive:
+    """
+    Buffered, append-only Parquet writer for plan rows.
+
+    Rows are kept column-wise per (table, date) partition and written once
+    `batch_rows` rows are buffered or the oldest buffered row is
+    `flush_interval` seconds old (checked on append and by a background
+    thread, so a quiet server still writes them), and on flush()/close() and
+    at process exit. Each write creates new zstd-compressed files with row
+    groups of at most `row_group_rows`; rows whose write fails go back into
+    the buffer for the next flush.
+    """
+
+    def __init__(self, root=ARCHIVE_ROOT, batch_rows=50000, flush_interval=60.0, row_group_rows=100000,
+                 compression='zstd'):
+        self.root = root
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.row_group_rows = row_group_rows
+        self.compression = compression
+        self._lock = threading.Lock()
+        self._buffers = {}  # (table, date) -> {column: [values]}
+        self._buffered = 0
+        self._oldest = None
+        self.stats = {'rows_written': 0, 'files_written': 0, 'write_errors': 0}
+        self._closed = threading.Event()
+        threading.Thread(target=self._flush_loop, name='plan-archive-flusher', daemon=True).start()
+        atexit.register(self.flush)
+
+    # ---------------- appends ----------------
+    def _append(self, table, rows, date):
+        schema = SCHEMAS[table]
+        with self._lock:
+            columns = self._buffers.get((table, date))
+            if columns is None:
+                columns = {name: [] for name in schema.names}
+                self._buffers[(table, date)] = columns
+            for row in rows:
+                for name in schema.names:
+                    columns[name].append(row.get(name))
+                self._buffered += 1
+            now = time.monotonic()
+            if self._oldest is None:
+                self._oldest = now
+            full = self._buffered >= self.batch_rows or now - self._oldest >= self.flush_interval
+        if full:
+            # Failed rows stay buffered for the next flush; archiving never fails the caller
+            try:
+                self.flush()
+            except Exception as e:
+                print("Plan archive flush failed:", e)
+
+    def add_workout_plan(self, plan, plan_id, user_id='local_user', created_at=None, week=None):
+        created_at = created_at or datetime.now(timezone.utc)
+        self._append('exercises', flatten_workout(plan, plan_id, user_id, created_at, week),
+                     created_at.date().isoformat())
+
+    def add_program(self, program, plan_id, user_id='local_user', created_at=None):
+        # Every week of a periodized program (see periodization.py)
+        created_at = created_at or datetime.now(timezone.utc)
+        for week in program.get('weeks', []):
+            self.add_workout_plan({'weekly_plan': week['weekly_plan']}, plan_id, user_id, created_at, week['week'])
+
+    def add_meal_plan(self, meal_plan, plan_id, user_id='local_user', created_at=None):
+        created_at = created_at or datetime.now(timezone.utc)
+        self._append('meals', flatten_meals(meal_plan, plan_id, user_id, created_at),
+                     created_at.date().isoformat())
+
+    # ---------------- writes ----------------
+    def flush(self):
+        with self._lock:
+            buffers, oldest = self._buffers, self._oldest
+            self._buffers, self._buffered, self._oldest = {}, 0, None
+        error = None
+        for (table, date), columns in buffers.items():
+            if not columns['plan_id']:
+                continue
+            try:
+                self._write(table, date, columns)
+            except Exception as e:
+                # Keep the rows for the next flush instead of losing them
+                self._restore(table, date, columns, oldest)
+                with self._lock:
+                    self.stats['write_errors'] += 1
+                error = error or e
+        if error is not None:
+            raise error
+
+    def _write(self, table, date, columns):
+        batch = pa.Table.from_pydict(columns, schema=SCHEMAS[table])
+        directory = os.path.join(self.root, table, f"date={date}")
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}.parquet"
+        # Written under a hidden temporary name so readers never see a half-written file
+        temp = os.path.join(directory, '.' + name)
+        try:
+            pq.write_table(batch, temp, compression=self.compression, row_group_size=self.row_group_rows)
+            os.replace(temp, os.path.join(directory, name))
+        except Exception:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        with self._lock:
+            self.stats['rows_written'] += batch.num_rows
+            self.stats['files_written'] += 1
+
+    def _restore(self, table, date, columns, oldest):
+        with self._lock:
+            current = self._buffers.get((table, date))
+            if current is None:
+                self._buffers[(table, date)] = columns
+            else:
+                # Failed rows are older than anything appended since
+                for name, values in columns.items():
+                    current[name][:0] = values
+            self._buffered += len(columns['plan_id'])
+            if oldest is not None and (self._oldest is None or oldest < self._oldest):
+                self._oldest = oldest
+
+    def _flush_loop(self):
+        while not self._closed.wait(min(60.0, self.flush_interval / 4)):
+            with self._lock:
+                due = self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+            if not due:
+                continue
+            try:
+                self.flush()
+            except Exception as e:
+                print("Plan archive flush failed:", e)
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+        atexit.unregister(self.flush)
+
+    # ---------------- reads ----------------
+    def dataset(self, table):
+        """pyarrow dataset over every file of `table`; `date` is a partition column."""
+        return ds.dataset(os.path.join(self.root, table), format='parquet', partitioning='hive',
+                          schema=SCHEMAS[table].append(pa.field('date', pa.string())))
+
+    def scan(self, table, columns=None, filter=None):
+        return self.dataset(table).to_table(columns=columns, filter=filter)
+
+
+def export_session_plans(archive, fitness_plans, meal_plans, user_id='local_user'):
+    """Archive plans kept in session state ({plan_id: plan} dicts)."""
+    for plan_id, plan in fitness_plans.items():
+        archive.add_workout_plan(plan, plan_id, user_id)
+    for plan_id, plan in meal_plans.items():
+        archive.add_meal_plan(plan, plan_id, user_id)
+    archive.flush()
+
+
+if __name__ == '__main__':
+    # Archive plans saved as JSON files: python plan_archive.py workout.json meal.json ...
+    import sys
+
+    archive = PlanArchive()
+    for path in sys.argv[1:]:
+        with open(path, 'r') as f:
+            plan = json.load(f)
+        plan_id = os.path.splitext(os.path.basename(path))[0]
+        if 'weekly_plan' in plan:
+            archive.add_workout_plan(plan, plan_id)
+        elif 'weeks' in plan:
+            archive.add_program(plan, plan_id)
+        else:
+            archive.add_meal_plan(plan, plan_id)
+    archive.close()
+    print(f"Archived {archive.stats['rows_written']} rows in {archive.stats['files_written']} files under {archive.root}")
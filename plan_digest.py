@@ -0,0 +1,48 @@
+"""
+Per-day workout digests for incremental meal-plan updates.
+
+Every meal-plan day is tagged with a digest of the workouts it was planned
+around (exercise names, durations and calories of that day):
+
+    meal_plan['Monday']['Workout_Digest'] == day_digest(workout_day('Monday'))
+
+After a workout adjustment only the days whose digest changed need new
+meals (AIHealthCoach.update_meal_plan); the others are kept as they are.
+Days without a workout (rest days) share the digest of an empty day.
+"""
+import hashlib
+import json
+
+from meal_macros import to_number
+
+DIGEST_KEY = 'Workout_Digest'
+
+
+def day_digest(day_plan):
+    """Short hash of one day's exercises; None / {} (a rest day) hash like an empty day."""
+    exercises = [[ex.get('name'), ex.get('duration_min'), round(to_number(ex.get('calories_burned'), 0.0), 1)]
+                 for ex in (day_plan or {}).get('exercises', [])]
+    return hashlib.sha256(json.dumps(exercises).encode('utf-8')).hexdigest()[:12]
+
+
+def workout_digests(plan):
+    """{day: digest} for every day of a workout plan ({'weekly_plan': [...]})."""
+    return {day_plan.get('day'): day_digest(day_plan) for day_plan in (plan or {}).get('weekly_plan', [])}
+
+
+def tag_meal_plan(meal_plan, workout_plan, days=None):
+    """Record on each meal-plan day (or only `days`) the digest of the workouts it was planned for."""
+    digests = workout_digests(workout_plan)
+    rest = day_digest(None)
+    for day, day_data in (meal_plan or {}).items():
+        if isinstance(day_data, dict) and (days is None or day in days):
+            day_data[DIGEST_KEY] = digests.get(day, rest)
+    return meal_plan
+
+
+def stale_days(meal_plan, workout_plan):
+    """Meal-plan days whose workouts changed since they were planned (untagged days count as changed)."""
+    digests = workout_digests(workout_plan)
+    rest = day_digest(None)
+    return [day for day, day_data in (meal_plan or {}).items()
+            if not isinstance(day_data, dict) or day_data.get(DIGEST_KEY) != digests.get(day, rest)]
@@ -0,0 +1,316 @@
+from array import array
+from datetime import date, datetime, timedelta
+import gzip
+import json
+import math
+import os
+import threading
+
+NAN = float('nan')
+
+# Metrics tracked for every user
+METRICS = ('weight', 'intake', 'workouts')
+
+
+def _to_date(day):
+    if isinstance(day, datetime):
+        return day.date()
+    if isinstance(day, date):
+        return day
+    return datetime.strptime(str(day), '%Y-%m-%d').date()
+
+
+class DailySeries:
+    """
+    Daily time series backed by flat `array('d')` buffers.
+
+    One slot per calendar day starting at `start`; missing days are NaN.
+    New days are appended; an earlier day can be overwritten (costing a
+    rebuild of the prefix sums from that day on).
+    Besides the raw values we keep:
+        1. prefix sums / counts of the non-missing values -> O(1) range means
+        2. a min/max pyramid (level k aggregates blocks of 2**k days)
+           -> downsampling reads at most `max_points` cells per chart
+    """
+
+    def __init__(self, start=None):
+        self.start = _to_date(start) if start is not None else None
+        self.values = array('d')
+        self._sums = array('d', [0.0])   # _sums[i] = sum of values[:i] (NaN skipped)
+        self._counts = array('l', [0])   # _counts[i] = non-missing values in values[:i]
+        self._mins = [array('d')]        # level 0 mirrors values, level k holds 2**k-day blocks
+        self._maxs = [array('d')]
+
+    @classmethod
+    def from_values(cls, start, values):
+        """Rebuild a series from its start day and raw values (NaN = missing day)."""
+        series = cls(start)
+        for value in values:
+            series._push(float(value))
+        return series
+
+    def __len__(self):
+        return len(self.values)
+
+    def _index(self, day):
+        return (_to_date(day) - self.start).days
+
+    def day_at(self, index):
+        return self.start + timedelta(days=index)
+
+    @property
+    def end(self):
+        """Last day covered by the series (None if empty)."""
+        if not self.values:
+            return None
+        return self.day_at(len(self.values) - 1)
+
+    def append(self, day, value):
+        """
+        Record `value` for `day`. Recording a day already covered overwrites it
+        (a corrected weigh-in, a workout logged late); a day before `start`
+        rebuilds the series from that day.
+        """
+        if self.start is None:
+            self.start = _to_date(day)
+        idx = self._index(day)
+        value = float(value)
+        if idx < 0:
+            self._prepend(idx, value)
+            return
+        if idx < len(self.values):
+            self._rewrite(idx, value)
+            return
+
+        # Pad the gap with missing days
+        while len(self.values) < idx:
+            self._push(NAN)
+        self._push(value)
+
+    def _prepend(self, idx, value):
+        # Rare (a log dated before the first one): rebuild everything from the new start
+        values = [value] + [NAN] * (-idx - 1) + list(self.values)
+        rebuilt = DailySeries.from_values(self.day_at(idx), values)
+        self.__dict__.update(rebuilt.__dict__)
+
+    def _push(self, value):
+        self.values.append(value)
+        present = not math.isnan(value)
+        self._sums.append(self._sums[-1] + (value if present else 0.0))
+        self._counts.append(self._counts[-1] + (1 if present else 0))
+        self._push_pyramid(len(self.values) - 1, value, value)
+
+    def _rewrite(self, idx, value):
+        # Prefix sums change from idx on; each pyramid level has one block covering idx
+        self.values[idx] = value
+        for i in range(idx, len(self.values)):
+            v = self.values[i]
+            present = not math.isnan(v)
+            self._sums[i + 1] = self._sums[i] + (v if present else 0.0)
+            self._counts[i + 1] = self._counts[i] + (1 if present else 0)
+
+        self._mins[0][idx] = value
+        self._maxs[0][idx] = value
+        for level in range(1, len(self._mins)):
+            below_min, below_max = self._mins[level - 1], self._maxs[level - 1]
+            block = idx >> level
+            lo, hi = below_min[2 * block], below_max[2 * block]
+            if 2 * block + 1 < len(below_min):
+                lo = _nanmin(lo, below_min[2 * block + 1])
+                hi = _nanmax(hi, below_max[2 * block + 1])
+            self._mins[level][block] = lo
+            self._maxs[level][block] = hi
+
+    def _push_pyramid(self, idx, lo, hi):
+        level = 0
+        while True:
+            mins, maxs = self._mins[level], self._maxs[level]
+            block = idx >> level
+            if block == len(mins):
+                mins.append(lo)
+                maxs.append(hi)
+            else:
+                # Block already exists: fold the new value into it
+                mins[block] = _nanmin(mins[block], lo)
+                maxs[block] = _nanmax(maxs[block], hi)
+            if block == 0:
+                break  # a single block at this level covers the whole series
+
+            if level + 1 == len(self._mins):
+                # Top level just got its second block: add a level above covering both
+                self._mins.append(array('d', [_nanmin(mins[0], mins[1])]))
+                self._maxs.append(array('d', [_nanmax(maxs[0], maxs[1])]))
+                break
+            lo, hi = mins[block], maxs[block]
+            level += 1
+
+    # ---------------- queries ----------------
+    def _clip(self, start, end):
+        lo = 0 if start is None else max(0, self._index(start))
+        hi = len(self.values) if end is None else min(len(self.values), self._index(end) + 1)
+        return lo, max(lo, hi)
+
+    def range(self, start=None, end=None):
+        """Return (dates, values) for the inclusive day range, skipping missing days."""
+        if self.start is None:
+            return [], []
+        lo, hi = self._clip(start, end)
+        dates, values = [], []
+        for i in range(lo, hi):
+            v = self.values[i]
+            if not math.isnan(v):
+                dates.append(self.day_at(i))
+                values.append(v)
+        return dates, values
+
+    def mean(self, start=None, end=None):
+        """Mean of the non-missing values in the inclusive day range, in O(1)."""
+        if self.start is None:
+            return None
+        lo, hi = self._clip(start, end)
+        count = self._counts[hi] - self._counts[lo]
+        if count == 0:
+            return None
+        return (self._sums[hi] - self._sums[lo]) / count
+
+    def rolling_mean(self, window=7, start=None, end=None):
+        """Trailing `window`-day average for every day in range (None where no data)."""
+        if self.start is None:
+            return [], []
+        lo, hi = self._clip(start, end)
+        dates, values = [], []
+        for i in range(lo, hi):
+            a = max(0, i - window + 1)
+            count = self._counts[i + 1] - self._counts[a]
+            dates.append(self.day_at(i))
+            values.append((self._sums[i + 1] - self._sums[a]) / count if count else None)
+        return dates, values
+
+    def downsample(self, max_points=200, start=None, end=None):
+        """
+        Min/max downsampling for charting.
+
+        Picks the coarsest pyramid level that still yields <= max_points blocks
+        over the range and returns (dates, mins, maxs), one entry per block.
+        Cost depends only on max_points, not on how many days were logged.
+        """
+        if self.start is None:
+            return [], [], []
+        lo, hi = self._clip(start, end)
+        if hi <= lo:
+            return [], [], []
+
+        level = 0
+        while ((hi - lo) >> level) > max_points and level + 1 < len(self._mins):
+            level += 1
+        mins, maxs = self._mins[level], self._maxs[level]
+
+        dates, lows, highs = [], [], []
+        for block in range(lo >> level, ((hi - 1) >> level) + 1):
+            if block >= len(mins) or math.isnan(mins[block]):
+                continue
+            dates.append(self.day_at(block << level))
+            lows.append(mins[block])
+            highs.append(maxs[block])
+        return dates, lows, highs
+
+    def latest(self):
+        """Most recent non-missing (day, value), or None."""
+        for i in range(len(self.values) - 1, -1, -1):
+            if not math.isnan(self.values[i]):
+                return self.day_at(i), self.values[i]
+        return None
+
+
+def _nanmin(a, b):
+    if math.isnan(a):
+        return b
+    if math.isnan(b):
+        return a
+    return a if a < b else b
+
+
+def _nanmax(a, b):
+    if math.isnan(a):
+        return b
+    if math.isnan(b):
+        return a
+    return a if a > b else b
+
+
+class ProgressStore:
+    """
+    Per-user collection of daily series (weight, intake, workouts completed).
+
+    With a `spill_path`, spill_all() moves every series to a gzip'd JSON file
+    (e.g. when the session goes idle) and the next access reads it back.
+    """
+
+    def __init__(self, spill_path=None):
+        self._users = {}
+        self.spill_path = spill_path
+        self.spilled_bytes = 0
+        self._lock = threading.RLock()
+
+    def user(self, user_id):
+        with self._lock:
+            self._load()
+            if user_id not in self._users:
+                self._users[user_id] = {metric: DailySeries() for metric in METRICS}
+            return self._users[user_id]
+
+    def series(self, user_id, metric):
+        if metric not in METRICS:
+            raise KeyError(f"Unknown metric: {metric}")
+        return self.user(user_id)[metric]
+
+    def log(self, user_id, day, **values):
+        """e.g. store.log(uid, '2025-04-01', weight=70.2, workouts=1)"""
+        for metric, value in values.items():
+            self.series(user_id, metric).append(day, value)
+
+    def chart_data(self, user_id, metric, max_points=200, window=7):
+        """
+        Everything the progress chart needs, bounded by max_points:
+            dates / min / max per block plus the rolling average at each block start.
+        """
+        s = self.series(user_id, metric)
+        dates, lows, highs = s.downsample(max_points)
+        rolling = [s.rolling_mean(window, start=d, end=d)[1][0] for d in dates]
+        return {
+            'Date': [d.strftime('%Y-%m-%d') for d in dates],
+            'Min': lows,
+            'Max': highs,
+            'Rolling': rolling,
+        }
+
+    # ---------------- spilling ----------------
+    def spill_all(self):
+        with self._lock:
+            if self.spill_path is None or not self._users:
+                return
+            data = {user_id: {metric: [s.start.isoformat() if s.start else None, list(s.values)]
+                              for metric, s in metrics.items()}
+                    for user_id, metrics in self._users.items()}
+            os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+            with gzip.open(self.spill_path + '.tmp', 'wt', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(self.spill_path + '.tmp', self.spill_path)
+            self.spilled_bytes = os.path.getsize(self.spill_path)
+            self._users = {}
+
+    def _load(self):
+        if not self.spilled_bytes:
+            return
+        with gzip.open(self.spill_path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        for user_id, metrics in data.items():
+            self._users[user_id] = {metric: DailySeries.from_values(start, values)
+                                    for metric, (start, values) in metrics.items()}
+        os.remove(self.spill_path)
+        self.spilled_bytes = 0
+
+    def forget_spilled(self):
+        """Drop what only exists on disk (the file is about to be deleted)."""
+        with self._lock:
+            self.spilled_bytes = 0
@@ -0,0 +1,137 @@
+from collections import deque
+import hashlib
+import random
+import threading
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+
+def prompt_version(text):
+    """Content hash of a template; changes whenever the prompt text does."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+
+
+class PromptStats:
+    """Latency and (estimated) token counters for one prompt version."""
+
+    def __init__(self, window=200):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency, prompt_tokens=0, output_tokens=0, ok=True):
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(latency)
+            self.prompt_tokens += prompt_tokens
+            self.output_tokens += output_tokens
+            if not ok:
+                self.errors += 1
+
+    def percentile(self, q):
+        with self._lock:
+            if not self.latencies:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self):
+        ok_calls = max(1, self.calls - self.errors)
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'avg_prompt_tokens': round(self.prompt_tokens / ok_calls, 1),
+            'avg_output_tokens': round(self.output_tokens / ok_calls, 1),
+        }
+
+
+class PromptVersion:
+    """
+    One parsed prompt variant. The template is parsed once, and the
+    `prompt | llm | StrOutputParser()` chain is built once per LLM client.
+    """
+
+    def __init__(self, name, text, variant='default', weight=1.0):
+        self.name = name
+        self.variant = variant
+        self.weight = weight
+        self.text = text
+        self.version = prompt_version(text)
+        self.template = ChatPromptTemplate.from_template(text)
+        self.stats = PromptStats()
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        return f"{self.name}/{self.variant}@{self.version}"
+
+    def chain(self, llm):
+        # Route clients are cached by RouteTable, so id(llm) is stable for the process
+        with self._lock:
+            entry = self._chains.get(id(llm))
+            if entry is None or entry[0] is not llm:
+                entry = (llm, self.template | llm | StrOutputParser())
+                self._chains[id(llm)] = entry
+            return entry[1]
+
+
+class PromptRegistry:
+    """
+    All coach prompts, parsed once at import.
+
+    A prompt name can have several variants for A/B tests; get() picks one
+    by weight (sticky per `bucket` when one is given, e.g. a user id), and
+    stats() reports latency and tokens per prompt version so variants can
+    be compared.
+    """
+
+    def __init__(self):
+        self._prompts = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, text, variant='default', weight=1.0):
+        prompt = PromptVersion(name, text, variant, weight)
+        with self._lock:
+            self._prompts.setdefault(name, {})[variant] = prompt
+        return prompt
+
+    def set_weights(self, name, weights):
+        with self._lock:
+            for variant, weight in weights.items():
+                self._prompts[name][variant].weight = weight
+
+    def variants(self, name):
+        with self._lock:
+            return dict(self._prompts[name])
+
+    def get(self, name, variant=None, bucket=None):
+        with self._lock:
+            variants = self._prompts[name]
+            if variant is not None:
+                return variants[variant]
+            candidates = [v for v in variants.values() if v.weight > 0]
+        if len(candidates) == 1:
+            return candidates[0]
+        weights = [v.weight for v in candidates]
+        if bucket is None:
+            return random.choices(candidates, weights)[0]
+        # Deterministic pick so the same bucket always sees the same variant
+        point = int(hashlib.sha256(f"{name}:{bucket}".encode('utf-8')).hexdigest()[:8], 16) / 0xFFFFFFFF
+        point *= sum(weights)
+        for candidate, weight in zip(candidates, weights):
+            point -= weight
+            if point <= 0:
+                return candidate
+        return candidates[-1]
+
+    def stats(self):
+        with self._lock:
+            prompts = [p for variants in self._prompts.values() for p in variants.values()]
+        return {p.key: p.stats.snapshot() for p in prompts}
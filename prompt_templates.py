@@ -0,0 +1,373 @@
+"""Prompt templates for the coach methods, registered once in PromptEngineer.prompts."""
+
+HEALTH_RECOMMENDATIONS_PROMPT = """
+            You are a certified fitness and nutrition expert.
+
+            User Profile:
+            {user_data}
+
+            Computed assessment: BMI {bmi} ({bmi_category}), overall risk {risk_level}.
+            Risk scores (1 = very healthy, 100 = very severe): {risks}
+
+            Provide one short recommendation (~20 words each), addressing the highest risks, from:
+               - Diet perspective
+               - Workout perspective
+
+            Return only a JSON list of the 2 sentences, diet first.
+            """
+
+GOAL_ADVICE_PROMPT = """
+                You are a certified health coach AI.
+                The user wants to {goal_type} from {current_weight} kg to {target_weight} kg in {target_months} months.
+                At a safe rate of {safe_rate} kg per week this takes about {realistic_months} months, so the goal is {verdict}.
+
+                Give the advice: explaining why the goal timeframe might need to be adjusted or not, considering the user's body state and health perspective:
+                    - Consider basic metabolic rate (BMR), which is roughly 22 * weight in kg, and realistic weekly rates from clinical research:
+                        - For fat loss: 0.5–1.0 kg/week
+                        - For muscle gain: 0.2–0.5 kg/week
+                    - Provide reasoning for adjusting the timeframe if necessary (e.g., faster or slower rate of progress due to body type, metabolism, and other health factors).
+                    - If the goal timeframe is feasible, explain why this is a safe and sustainable approach.
+                    - keep your word around 30-70 words
+
+                Return only the advice text.
+                """
+
+WORKOUT_PLAN_PROMPT = """
+            You are a certified health and fitness coach AI.
+
+            Help design a personalized weekly workout plan for a user. The plan must:
+            - Match user's fitness goal: {goal_type}
+            - Match user's current fitness level: {fitness_level}
+            - Fit user’s schedule: available {workout_days} days per week, {workout_duration} minutes per session
+            - Fit user’s preference: top exercises are {selected_sport_context}
+            - Satisfy weekly calorie consumption target: {target_consuming_cal} kcal/week
+            - Distribute daily workouts reasonably
+
+            Tasks:
+            1. From the listed exercises, choose a daily set for each of the {workout_days} days.
+                - Each day should contain 2-4 actions (can vary).
+                - Each action should include:
+                    • Name
+                    • Duration (minutes)
+                    • Estimated calorie burn
+                    • Primary target muscle group
+                - Try not to repeat same muscle group across consecutive days.
+                - Maintain variety.
+            2. Make sure daily total:
+                - Duration ≈ {workout_duration} ± 10 minutes
+                - Total calorie burn ≈ {target_consuming_cal} / {workout_days} kcal
+            3. Incorporate user's focus areas: {focus_areas}
+                - At least one action per day should match a focus area.
+            4. For each day, suggest an order of exercises for optimal effectiveness and recovery.
+
+            Output structured JSON:
+            {{
+                "weekly_plan": [
+                    {{
+                        "day": "Monday",
+                        "exercises": [
+                            {{
+                                "name": "Swimming",
+                                "duration_min": 30,
+                                "calories_burned": 210,
+                                "target_muscle": "Full body"
+                            }},
+                            ...
+                        ],
+                        "total_duration": 60,
+                        "total_calories": 450
+                    }},
+                    ...
+                ]
+            }}
+        """
+
+ADJUST_WORKOUT_PROMPT = """
+        You are a certified health and fitness coach AI.
+        The user wants to adjust their workout plan based on recent feedback.
+
+        Here is the current weekly workout plan to revise:
+        {orginal_plan}
+        
+        Adjustment instructions:
+        - Adjust workout intensity based on feedback: {adjust_intensity}
+        - Add more of these exercise types: {adjust_exercises}
+
+        Now adjust the plan by completing the following tasks:
+        1. From the listed exercises, choose a daily set for each of the {workout_days} days.
+            - Each day should contain 2-4 actions (can vary).
+            - Each action should include:
+                • Name
+                • Duration (minutes)
+                • Estimated calorie burn
+                • Primary target muscle group
+            - Avoid repeating the same muscle group on consecutive days.
+            - Maintain variety.
+
+        2. Make sure daily totals:
+            - Duration ≈ {workout_duration} ± 10 minutes
+            - Total calorie burn ≈ {target_consuming_cal} / {workout_days} kcal
+        
+        3. Incorporate user's focus areas: {focus_areas}
+            - At least one action per day should target a focus area.
+        
+        4. Suggest the best exercise order for each day to maximize effectiveness and recovery.
+
+        Context:
+        - User's goal: {goal_type}
+        - User's fitness level: {fitness_level}
+        - Preferred exercises and METs: {selected_sport_context}
+        
+        Output a valid JSON like:
+        {{
+            "weekly_plan": [
+                {{
+                    "day": "Monday",
+                    "exercises": [
+                        {{
+                            "name": "Swimming",
+                            "duration_min": 30,
+                            "calories_burned": 210,
+                            "target_muscle": "Full body"
+                        }},
+                        ...
+                    ],
+                    "total_duration": 60,
+                    "total_calories": 450
+                }},
+                ...
+            ]
+        }}
+        Make sure your output is well-structured and JSON-compatible.
+        """
+
+MEAL_PLAN_PROMPT = """
+        You are a certified nutrition expert specializing in personalized meal planning for fitness goals.
+
+        USER PROFILE:
+        - Fitness goal: {goal_type}
+        - TDEE (daily calorie needs): {daily_consuming_cal}
+        - Dietary preferences: {dietary_preferences}
+        - Dietary notes: {dietary_notes}
+
+        EXERCISE SCHEDULE:
+        {workout_plan}
+
+        Please design a comprehensive 7-day meal plan with the following requirements:
+        1. On exercise days, design meals that support performance and recovery, accounting for the specific exercises performed
+        2. On rest days, adjust the meal plan to support the user's fitness goals while maintaining appropriate calorie intake
+        3. Ensure all meals accommodate the user's dietary preferences and restrictions
+        4. Build every meal only from these foods, giving a portion in grams for each: {food_list}
+        5. Choose portions so each day's calories are reasonable for the user's physical condition and fitness goal.
+           Do NOT write calories or macros - they are computed from the ingredients automatically.
+
+        Output as structured JSON with the following format for each day:
+
+        {{
+          "Monday": {{
+            "Exercise": "Swimming (30 min) + Yoga (20 min)",
+            "Meals": {{
+              "Breakfast": {{
+                "Menu": "Vegan protein smoothie with berries and chia seeds",
+                "Ingredients": [{{"food": "pea protein powder", "grams": 30}}, {{"food": "mixed berries", "grams": 150}}, {{"food": "chia seeds", "grams": 15}}]
+              }},
+              "Lunch": {{
+                "Menu": "Quinoa bowl with roasted vegetables and tofu",
+                "Ingredients": [{{"food": "quinoa cooked", "grams": 200}}, {{"food": "tofu", "grams": 150}}, {{"food": "broccoli", "grams": 120}}]
+              }},
+              "Dinner": {{
+                "Menu": "Zucchini noodles with lentil bolognese",
+                "Ingredients": [{{"food": "zucchini", "grams": 250}}, {{"food": "lentils cooked", "grams": 200}}, {{"food": "tomato sauce", "grams": 150}}]
+              }}
+            }},
+            "Hydration": "Minimum 2.5 liters of water, +500ml during workout"
+          }},"Tuesday":{{ ...}}, ...}}
+        """
+
+# Compact wire formats (see wire_schema.py): short keys, no numbers that are
+# recomputed locally, reusable workout sessions and meals. Registered as the
+# 'compact' variants of the prompts above.
+
+COMPACT_WORKOUT_FORMAT = """
+            Output compact JSON only, no prose:
+            {{
+                "s": {{
+                    "A": [["Swimming", 30, "Full body"], ["Plank", 10, "Core"]],
+                    "B": [["Cycling", 40, "Legs"], ["Yoga", 20, "Flexibility"]]
+                }},
+                "d": {{"Monday": "A", "Tuesday": "B", "Thursday": "A"}}
+            }}
+            - "s": sessions; each is a list of [exercise name, minutes, primary target muscle] in the order to perform them.
+            - "d": every workout day mapped to a session key; reuse a session on several days where it fits.
+            - Do not write calories or totals; they are computed from the minutes. Only for an exercise that is
+              not among the listed exercises, append its estimated kcal as a 4th item.
+"""
+
+WORKOUT_PLAN_COMPACT_PROMPT = """
+            You are a certified health and fitness coach AI.
+
+            Help design a personalized weekly workout plan for a user. The plan must:
+            - Match user's fitness goal: {goal_type}
+            - Match user's current fitness level: {fitness_level}
+            - Fit user’s schedule: available {workout_days} days per week, {workout_duration} minutes per session
+            - Fit user’s preference: top exercises are {selected_sport_context}
+            - Satisfy weekly calorie consumption target: {target_consuming_cal} kcal/week
+
+            Tasks:
+            1. For each of the {workout_days} days, choose 2-4 of the listed exercises with their duration in minutes
+               and primary target muscle group. Try not to repeat the same muscle group on consecutive days.
+            2. Daily duration ≈ {workout_duration} ± 10 minutes; daily burn ≈ {target_consuming_cal} / {workout_days} kcal.
+            3. At least one exercise per day should match a focus area: {focus_areas}
+            4. Order each day's exercises for effectiveness and recovery.
+""" + COMPACT_WORKOUT_FORMAT
+
+ADJUST_WORKOUT_COMPACT_PROMPT = """
+        You are a certified health and fitness coach AI.
+        The user wants to adjust their workout plan based on recent feedback.
+
+        Current plan (sessions "s" as [exercise, minutes, target muscle], days "d" mapped to sessions):
+        {orginal_plan}
+
+        Adjustment instructions:
+        - Adjust workout intensity based on feedback: {adjust_intensity}
+        - Add more of these exercise types: {adjust_exercises}
+
+        Tasks:
+        1. For each of the {workout_days} days, choose 2-4 exercises. Avoid the same muscle group on consecutive days.
+        2. Daily duration ≈ {workout_duration} ± 10 minutes; daily burn ≈ {target_consuming_cal} / {workout_days} kcal.
+        3. At least one exercise per day should target a focus area: {focus_areas}
+        4. Order each day's exercises for effectiveness and recovery.
+
+        Context:
+        - User's goal: {goal_type}
+        - User's fitness level: {fitness_level}
+        - Preferred exercises and METs: {selected_sport_context}
+""" + COMPACT_WORKOUT_FORMAT
+
+MEAL_PLAN_COMPACT_PROMPT = """
+        You are a certified nutrition expert specializing in personalized meal planning for fitness goals.
+
+        USER PROFILE:
+        - Fitness goal: {goal_type}
+        - TDEE (daily calorie needs): {daily_consuming_cal}
+        - Dietary preferences: {dietary_preferences}
+        - Dietary notes: {dietary_notes}
+
+        EXERCISE SCHEDULE (sessions "s" as [exercise, minutes, target muscle], days "d" mapped to sessions):
+        {workout_plan}
+
+        Design a 7-day meal plan:
+        1. On exercise days, support performance and recovery for that day's exercises
+        2. On rest days, support the user's goal while keeping intake appropriate
+        3. Respect the dietary preferences and restrictions
+        4. Build every meal only from these foods, with a portion in grams for each: {food_list}
+        5. Choose portions so each day's calories suit the user's goal. Do NOT write calories or macros.
+
+        Output compact JSON only, no prose:
+        {{
+          "h": "Minimum 2.5 liters of water, +500ml during workout",
+          "t": {{"smoothie": ["Vegan protein smoothie with berries", [["pea protein powder", 30], ["mixed berries", 150], ["chia seeds", 15]]]}},
+          "d": {{
+            "Monday": {{
+              "x": "Swimming (30 min) + Yoga (20 min)",
+              "m": {{
+                "B": "smoothie",
+                "L": ["Quinoa bowl with roasted vegetables and tofu", [["quinoa cooked", 200], ["tofu", 150], ["broccoli", 120]]],
+                "D": ["Zucchini noodles with lentil bolognese", [["zucchini", 250], ["lentils cooked", 200], ["tomato sauce", 150]]]
+              }}
+            }},
+            "Tuesday": {{ ... }}, ...
+          }}
+        }}
+        - "h": hydration advice for every day; add "h" inside a day only if that day differs.
+        - "x": that day's exercise, or "Rest day".
+        - "m": meals keyed B (Breakfast), L (Lunch), D (Dinner), S (Snack); each is [menu, [[food, grams], ...]]
+          or the key of a meal defined once in "t" and reused on several days.
+        """
+
+# Fused mode (COVERFITNESS_PLAN_MODE=fused): the workout and the meal plan from one request,
+# in the compact wire formats above
+PLANS_FUSED_PROMPT = """
+        You are a certified health and fitness coach AI and nutrition expert.
+        Design a user's weekly workout plan and, matched to it, their 7-day meal plan.
+
+        USER PROFILE:
+        - Fitness goal: {goal_type}
+        - Fitness level: {fitness_level}
+        - Schedule: available {workout_days} days per week, {workout_duration} minutes per session
+        - Preferred exercises: {selected_sport_context}
+        - Weekly exercise calorie target: {target_consuming_cal} kcal/week
+        - Focus areas: {focus_areas}
+        - TDEE (daily calorie needs): {daily_consuming_cal}
+        - Dietary preferences: {dietary_preferences}
+        - Dietary notes: {dietary_notes}
+
+        Workout plan:
+        1. For each of the {workout_days} days, choose 2-4 of the listed exercises with their duration in minutes
+           and primary target muscle group. Try not to repeat the same muscle group on consecutive days.
+        2. Daily duration ≈ {workout_duration} ± 10 minutes; daily burn ≈ {target_consuming_cal} / {workout_days} kcal.
+        3. At least one exercise per day should match a focus area, and exercises are ordered for recovery.
+
+        Meal plan (after the workout plan, for all 7 days):
+        4. On exercise days, support performance and recovery for that day's exercises; on rest days,
+           support the goal while keeping intake appropriate.
+        5. Respect the dietary preferences and restrictions.
+        6. Build every meal only from these foods, with a portion in grams for each: {food_list}
+
+        Do NOT write calories, totals or macros; they are computed locally.
+
+        Output compact JSON only, no prose; one JSON object with both plans:
+        {{
+          "w": {{
+            "s": {{"A": [["Swimming", 30, "Full body"], ["Plank", 10, "Core"]], "B": [["Cycling", 40, "Legs"]]}},
+            "d": {{"Monday": "A", "Tuesday": "B", "Thursday": "A"}}
+          }},
+          "m": {{
+            "h": "Minimum 2.5 liters of water, +500ml during workout",
+            "t": {{"smoothie": ["Vegan protein smoothie with berries", [["pea protein powder", 30], ["mixed berries", 150]]]}},
+            "d": {{
+              "Monday": {{"x": "Swimming (30 min) + Plank (10 min)",
+                         "m": {{"B": "smoothie", "L": ["Quinoa bowl with tofu", [["quinoa cooked", 200], ["tofu", 150]]], "D": [...]}}}},
+              "Tuesday": {{ ... }}, ...
+            }}
+          }}
+        }}
+        - "w": sessions "s" as [exercise name, minutes, target muscle] (append estimated kcal as a 4th item only
+          for an exercise that is not listed), and every workout day in "d" mapped to a session key.
+        - "m": hydration "h" for every day, meals "t" defined once and reused by key, and per day "x" (that day's
+          exercise or "Rest day") and "m" with meals B, L, D, S, each [menu, [[food, grams], ...]] or a "t" key.
+        """
+
+# Incremental meal update (plan_digest.py): new meals only for the days whose workouts changed
+MEAL_DAYS_UPDATE_PROMPT = """
+        You are a certified nutrition expert specializing in personalized meal planning for fitness goals.
+        The user's workouts changed on some days; plan new meals for those days only.
+
+        USER PROFILE:
+        - Fitness goal: {goal_type}
+        - TDEE (daily calorie needs): {daily_consuming_cal}
+        - Dietary preferences: {dietary_preferences}
+        - Dietary notes: {dietary_notes}
+
+        Days to plan: {days}
+        Their new exercises ([exercise, minutes, target muscle] per day):
+        {day_workouts}
+        Meals kept on the other days (vary from these): {kept_menus}
+
+        1. On exercise days, support performance and recovery for that day's exercises; on rest days,
+           support the user's goal while keeping intake appropriate.
+        2. Respect the dietary preferences and restrictions.
+        3. Build every meal only from these foods, with a portion in grams for each: {food_list}
+        4. Do NOT write calories or macros.
+
+        Output compact JSON only, no prose, with exactly the days to plan:
+        {{
+          "h": "Minimum 2.5 liters of water, +500ml during workout",
+          "d": {{
+            "Tuesday": {{"x": "Cycling (40 min) + Yoga (20 min)",
+                        "m": {{"B": ["Oat porridge with berries", [["oats", 60], ["mixed berries", 100]]], "L": [...], "D": [...]}}}}
+          }}
+        }}
+        - "x": that day's exercise, or "Rest day"; "m": meals B (Breakfast), L (Lunch), D (Dinner), S (Snack),
+          each [menu, [[food, grams], ...]].
+        """
@@ -0,0 +1,243 @@
+import contextvars
+import os
+import random
+import threading
+import time
+
+from deadline import Cancelled, DeadlineExceeded, check, current
+from tracing import span
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English prose / JSON
+    return max(1, len(text) // 4)
+
+
+def is_rate_limit_error(error):
+    """True for provider 429s (openai.RateLimitError or anything carrying status 429)."""
+    if type(error).__name__ == 'RateLimitError':
+        return True
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 429
+
+
+# Tokens the provider reported for the rate-limited call running in this context
+_reported = contextvars.ContextVar('coverfitness_reported_tokens', default=None)
+
+
+def report_usage(total_tokens):
+    """Record the tokens a response actually used, from inside RateLimiter.call (no-op elsewhere)."""
+    reported = _reported.get()
+    if reported is not None and total_tokens is not None:
+        reported.append(int(total_tokens))
+
+
+def _retry_after(error):
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` units per second, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1, timeout=None):
+        """Block until `amount` units are available; returns False on timeout."""
+        amount = min(float(amount), self.capacity)  # an oversized request still gets through eventually
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return True
+                wait = (amount - self._tokens) / self.rate
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                self._cond.wait(wait)
+
+    def refund(self, amount):
+        with self._cond:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+            self._cond.notify_all()
+
+    def charge(self, amount):
+        """Take `amount` more units without waiting; the deficit delays later callers."""
+        with self._cond:
+            self._refill()
+            self._tokens = max(-self.capacity, self._tokens - amount)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit.
+
+    Each successful call under the latency target grows the limit by 1/limit
+    (about +1 per round trip of the whole window); a 429 or a call slower than
+    the target halves it.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=64, latency_target=30.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.latency_target = latency_target
+        self.in_flight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            self.in_flight += 1
+            return True
+
+    def release(self, latency=None, congested=False):
+        with self._cond:
+            self.in_flight -= 1
+            if congested or (latency is not None and latency > self.latency_target):
+                self.limit = max(self.minimum, self.limit / 2)
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """
+    Client-side limiter shared by every call to the provider.
+
+    A call first takes one unit from the request bucket (RPM), its estimated
+    prompt + completion tokens from the token bucket (TPM) and a concurrency
+    slot, then runs. 429s shrink the concurrency window and are retried with
+    full-jitter exponential backoff (or the server's Retry-After). When the
+    call reports its real usage (report_usage), the token bucket is settled
+    against it: over-estimates are refunded, under-estimates charged.
+    """
+
+    def __init__(self, rpm=3500, tpm=90000, concurrency=4, max_concurrency=64,
+                 latency_target=30.0, max_retries=5, base_delay=0.5, max_delay=20.0):
+        self.requests = TokenBucket(rpm / 60.0, max(1, rpm / 60.0 * 10))   # ~10s of burst
+        self.tokens = TokenBucket(tpm / 60.0, max(1, tpm / 60.0 * 10))
+        self.concurrency = AdaptiveConcurrency(concurrency, 1, max_concurrency, latency_target)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'rate_limited': 0, 'retries': 0, 'failures': 0,
+                      'estimated_tokens': 0, 'reported_tokens': 0}
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ.get
+        return cls(rpm=float(env('OPENAI_RPM', 3500)),
+                   tpm=float(env('OPENAI_TPM', 90000)),
+                   concurrency=int(env('OPENAI_CONCURRENCY', 4)),
+                   max_concurrency=int(env('OPENAI_MAX_CONCURRENCY', 64)),
+                   latency_target=float(env('OPENAI_LATENCY_TARGET', 30.0)),
+                   max_retries=int(env('OPENAI_MAX_RETRIES', 5)))
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _settle(self, estimated_tokens, reported):
+        # The bucket took at most its capacity for this call (TokenBucket.acquire)
+        taken = min(float(estimated_tokens), self.tokens.capacity)
+        actual = sum(reported)
+        if actual < taken:
+            self.tokens.refund(taken - actual)
+        elif actual > taken:
+            self.tokens.charge(actual - taken)
+        with self._lock:
+            self.stats['estimated_tokens'] += estimated_tokens
+            self.stats['reported_tokens'] += actual
+
+    def _admit(self, estimated_tokens):
+        # Waits for budget, but never past the caller's deadline
+        ctx = current()
+        if not self.requests.acquire(1, timeout=ctx and ctx.timeout()):
+            raise DeadlineExceeded('deadline exceeded waiting for request budget')
+        if not self.tokens.acquire(estimated_tokens, timeout=ctx and ctx.timeout()):
+            self.requests.refund(1)
+            raise DeadlineExceeded('deadline exceeded waiting for token budget')
+        if not self.concurrency.acquire(timeout=ctx and ctx.timeout()):
+            self.requests.refund(1)
+            self.tokens.refund(estimated_tokens)
+            raise DeadlineExceeded('deadline exceeded waiting for a concurrency slot')
+
+    def call(self, fn, estimated_tokens=1):
+        self._count('calls')
+        attempt = 0
+        while True:
+            check()
+            with span('rate_limit.admit', cat='wait', tokens=estimated_tokens, attempt=attempt):
+                self._admit(estimated_tokens)
+            started = time.monotonic()
+            reported = []
+            reset = _reported.set(reported)
+            try:
+                with span('llm.http', cat='network', attempt=attempt):
+                    result = fn()
+            except Exception as e:
+                congested = is_rate_limit_error(e)
+                self.concurrency.release(time.monotonic() - started, congested=congested)
+                if not congested:
+                    if reported:
+                        self._settle(estimated_tokens, reported)
+                    self._count('failures')
+                    raise
+                self._count('rate_limited')
+                if attempt >= self.max_retries:
+                    self._count('failures')
+                    raise RateLimitExceeded(f"Still rate limited after {attempt} retries") from e
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                ctx = current()
+                if ctx is not None and ctx.timeout() is not None and ctx.timeout() < delay:
+                    self._count('failures')
+                    raise DeadlineExceeded(f"deadline exceeded before retry (backoff {delay:.1f}s)") from e
+                attempt += 1
+                self._count('retries')
+                # Back off, but wake up as soon as the caller gives up
+                if ctx is None:
+                    time.sleep(delay)
+                elif ctx.token.wait(delay):
+                    raise Cancelled(ctx.token.reason or 'cancelled') from e
+                continue
+            finally:
+                _reported.reset(reset)
+            self.concurrency.release(time.monotonic() - started)
+            if reported:
+                self._settle(estimated_tokens, reported)
+            return result
+
+
+# Shared by every coach in this process
+rate_limiter = RateLimiter.from_env()
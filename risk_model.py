@@ -0,0 +1,133 @@
+"""
+Deterministic health risk scoring.
+
+Every score is a sum of rule contributions on top of a base value, clipped to
+1-100 (1 = very healthy, 100 = very severe), so the same profile always gets
+the same assessment and nothing waits on the LLM.
+"""
+
+RISK_KEYS = ['BMI Risk', 'Joint Injury Risk', 'Cardiovascular Risk', 'Overtraining Risk', 'Nutritional Risk']
+
+# Extra risk from each "constraints" option, per dimension
+CONSTRAINT_RISK = {
+    'Joint injury': {'Joint Injury Risk': 35, 'Overtraining Risk': 10},
+    'Back pain': {'Joint Injury Risk': 20, 'Overtraining Risk': 5},
+    'Limited mobility': {'Joint Injury Risk': 15, 'Overtraining Risk': 10},
+    'Heart condition': {'Cardiovascular Risk': 45, 'Overtraining Risk': 15},
+    'Diabetes': {'Cardiovascular Risk': 20, 'Nutritional Risk': 15},
+    'High blood pressure': {'Cardiovascular Risk': 25},
+}
+
+# Weekly training minutes each fitness level recovers from comfortably
+WEEKLY_CAPACITY_MIN = {'Beginner': 150, 'Intermediate': 250, 'Advanced': 400}
+
+RESTRICTIVE_DIETS = {'Vegan': 10, 'Keto': 10, 'Paleo': 5, 'Vegetarian': 3,
+                     'Pescatarian': 2, 'Gluten-free': 3, 'Dairy-free': 3}
+EATING_DISORDER_TERMS = ('anorex', 'bulim', 'eating disorder', 'binge', 'orthorex')
+ALLERGY_TERMS = ('allerg', 'intoleran', 'celiac', 'coeliac')
+
+
+def bmi_category(bmi):
+    if bmi < 18.5:
+        return 'Underweight'
+    if bmi < 25:
+        return 'Normal'
+    if bmi < 30:
+        return 'Overweight'
+    return 'Obese'
+
+
+def _clip(value):
+    return int(round(min(100, max(1, value))))
+
+
+def _bmi_risk(bmi):
+    if bmi < 18.5:
+        return 15 + (18.5 - bmi) * 12
+    if bmi < 25:
+        return 5 + abs(bmi - 21.7) * 2
+    return 15 + (bmi - 25) * 6
+
+
+def score_risks(user_data, bmi):
+    """Five risk scores (1-100) from BMI, age, constraints, goal, schedule and diet."""
+    age = user_data.get('age', 30)
+    goal = str(user_data.get('goal_type', '')).lower()
+    level = user_data.get('fitness_level', 'Beginner')
+    constraints = [c for c in user_data.get('constraints', []) if c != 'None']
+    diets = user_data.get('dietary_preferences', [])
+    notes = str(user_data.get('dietary_notes', '')).lower()
+
+    risks = {
+        'BMI Risk': _bmi_risk(bmi),
+        'Joint Injury Risk': 8.0,
+        'Cardiovascular Risk': 8.0,
+        'Overtraining Risk': 8.0,
+        'Nutritional Risk': 8.0,
+    }
+
+    # 1. Age and body weight
+    if age > 40:
+        risks['Cardiovascular Risk'] += (age - 40) * 0.9
+    if age > 50:
+        risks['Joint Injury Risk'] += (age - 50) * 0.8
+    if age > 60:
+        risks['Overtraining Risk'] += (age - 60) * 0.8
+    if bmi >= 25:
+        risks['Cardiovascular Risk'] += (bmi - 25) * 2.5
+    if bmi >= 30:
+        risks['Joint Injury Risk'] += (bmi - 30) * 3
+
+    # 2. Declared constraints
+    for constraint in constraints:
+        for key, points in CONSTRAINT_RISK.get(constraint, {}).items():
+            risks[key] += points
+
+    # 3. Training load against what the fitness level can absorb
+    weekly_min = len(user_data.get('workout_days', [])) * user_data.get('workout_duration', 0)
+    capacity = WEEKLY_CAPACITY_MIN.get(level, 150)
+    if weekly_min > capacity:
+        risks['Overtraining Risk'] += (weekly_min - capacity) / capacity * 60
+    if len(user_data.get('workout_days', [])) >= 6:
+        risks['Overtraining Risk'] += 10
+    if level == 'Beginner':
+        risks['Joint Injury Risk'] += 5
+    if 'muscle' in goal:
+        risks['Overtraining Risk'] += 5
+    if 'rehab' in goal:
+        risks['Overtraining Risk'] += 10
+        risks['Joint Injury Risk'] += 10
+
+    # 4. Diet
+    risks['Nutritional Risk'] += sum(RESTRICTIVE_DIETS.get(d, 0) for d in diets)
+    if any(term in notes for term in EATING_DISORDER_TERMS):
+        risks['Nutritional Risk'] += 40
+    if any(term in notes for term in ALLERGY_TERMS):
+        risks['Nutritional Risk'] += 5
+    if bmi < 18.5:
+        risks['Nutritional Risk'] += (18.5 - bmi) * 10
+    if 'lose' in goal and bmi < 22:
+        risks['Nutritional Risk'] += 15
+
+    return {key: _clip(risks[key]) for key in RISK_KEYS}
+
+
+def risk_level(risks):
+    # One severe dimension is enough to call the profile high risk
+    highest = max(risks.values())
+    mean = sum(risks.values()) / len(risks)
+    if highest >= 70 or mean >= 50:
+        return 'High'
+    if highest >= 40 or mean >= 30:
+        return 'Moderate'
+    return 'Low'
+
+
+def assess(user_data, bmi):
+    risks = score_risks(user_data, bmi)
+    return {
+        'bmi': bmi,
+        'bmi_category': bmi_category(bmi),
+        'risk_level': risk_level(risks),
+        'risks': risks,
+    }
@@ -0,0 +1,299 @@
+"""
+Per-session memory accounting and bounded plan history.
+
+Plan versions beyond the most recent few are kept as gzip'd JSON on disk
+instead of in server RAM, idle sessions have all their plans (and their
+health assessment and progress series) spilled, and
+every session's footprint is measured so it can be reported.
+
+Sizing (defaults overridable by environment variables):
+    COVERFITNESS_PLAN_HISTORY   plan versions kept in memory per kind   (2)
+    COVERFITNESS_IDLE_SECONDS   idle time before a session is spilled   (900)
+    COVERFITNESS_SPILL_DIR      where spilled plans go                  (plan_spill)
+"""
+from array import array
+from collections.abc import MutableMapping
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import weakref
+
+from progress_store import ProgressStore
+
+SPILL_DIR = os.environ.get('COVERFITNESS_SPILL_DIR', 'plan_spill')
+PLAN_HISTORY = int(os.environ.get('COVERFITNESS_PLAN_HISTORY', 2))
+IDLE_SECONDS = float(os.environ.get('COVERFITNESS_IDLE_SECONDS', 900))
+EXPIRE_SECONDS = 7 * 24 * 3600
+
+
+def deep_sizeof(obj, seen=None, exclude=()):
+    """
+    Approximate bytes held by `obj` and everything it references.
+    Objects in `exclude` (e.g. process-wide singletons) and anything already
+    seen are not counted.
+    """
+    seen = set() if seen is None else seen
+    seen.update(id(o) for o in exclude)
+    stack = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        if id(o) in seen:
+            continue
+        seen.add(id(o))
+        if isinstance(o, PlanHistory):
+            total += o.memory_bytes(seen)
+            continue
+        total += sys.getsizeof(o)
+        if isinstance(o, (str, bytes, bytearray, int, float, bool, array)) or o is None:
+            continue
+        if isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+        elif hasattr(o, '__dict__'):
+            stack.append(vars(o))
+        elif hasattr(o, '__slots__'):
+            stack.extend(getattr(o, s) for s in o.__slots__ if hasattr(o, s))
+    return total
+
+
+class PlanHistory(MutableMapping):
+    """
+    Ordered {plan_id: plan} that keeps only the newest `max_in_memory`
+    versions in RAM; older ones are written to `directory` and read back
+    on access. Drop-in for the plain dicts the app used to keep.
+    """
+
+    def __init__(self, directory, max_in_memory=PLAN_HISTORY):
+        self.directory = directory
+        self.max_in_memory = max_in_memory
+        self._order = []      # plan ids, oldest first
+        self._memory = {}     # plan_id -> plan, newest max_in_memory only
+        self._lock = threading.RLock()
+        self.spilled_bytes = 0
+
+    def _path(self, plan_id):
+        return os.path.join(self.directory, re.sub(r'[^\w.-]', '_', str(plan_id)) + '.json.gz')
+
+    def _spill(self, plan_id):
+        plan = self._memory.pop(plan_id)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(plan_id)
+        with gzip.open(path + '.tmp', 'wt', encoding='utf-8') as f:
+            json.dump(plan, f)
+        if os.path.exists(path):
+            # Spilled before (and read back since): replace its size, don't add to it
+            self.spilled_bytes -= os.path.getsize(path)
+        os.replace(path + '.tmp', path)
+        self.spilled_bytes += os.path.getsize(path)
+
+    def _evict(self, keep):
+        in_memory = [pid for pid in self._order if pid in self._memory]
+        for plan_id in in_memory[:max(0, len(in_memory) - keep)]:
+            self._spill(plan_id)
+
+    def __setitem__(self, plan_id, plan):
+        with self._lock:
+            if plan_id in self._order:
+                self._order.remove(plan_id)
+            self._order.append(plan_id)
+            self._memory[plan_id] = plan
+            self._evict(self.max_in_memory)
+
+    def __getitem__(self, plan_id):
+        with self._lock:
+            if plan_id in self._memory:
+                return self._memory[plan_id]
+            if plan_id not in self._order:
+                raise KeyError(plan_id)
+            with gzip.open(self._path(plan_id), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+
+    def __delitem__(self, plan_id):
+        with self._lock:
+            self._order.remove(plan_id)
+            if self._memory.pop(plan_id, None) is None:
+                path = self._path(plan_id)
+                if os.path.exists(path):
+                    self.spilled_bytes -= os.path.getsize(path)
+                    os.remove(path)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._order))
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, plan_id):
+        return plan_id in self._order
+
+    def latest(self):
+        """(plan_id, plan) of the newest version, or (None, None)."""
+        with self._lock:
+            if not self._order:
+                return None, None
+            plan_id = self._order[-1]
+            plan = self[plan_id]
+            if plan_id not in self._memory:
+                # Coming back from idle: the newest version is needed again
+                self._memory[plan_id] = plan
+            return plan_id, plan
+
+    def spill_all(self):
+        with self._lock:
+            self._evict(0)
+
+    def forget_spilled(self):
+        """Drop the versions that only exist on disk (their files are about to be deleted)."""
+        with self._lock:
+            self._order = [pid for pid in self._order if pid in self._memory]
+            self.spilled_bytes = 0
+
+    def memory_bytes(self, seen=None):
+        with self._lock:
+            return sys.getsizeof(self._order) + deep_sizeof(self._memory, seen)
+
+
+class SessionEntry:
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.last_seen = time.time()
+        self.bytes = 0
+        self.measured_at = 0.0
+        # PlanHistory / ProgressStore objects: spill_all(), forget_spilled(), spilled_bytes.
+        # Held weakly: they live in the session's state and go away with it
+        self._histories = []
+        self.released = False
+        self.expired = False
+
+    def add(self, history):
+        self._histories.append(weakref.ref(history))
+
+    @property
+    def histories(self):
+        live = [h for h in (ref() for ref in self._histories) if h is not None]
+        if len(live) < len(self._histories):
+            self._histories = [weakref.ref(h) for h in live]
+        return live
+
+
+class SessionRegistry:
+    """
+    Process-wide view of every Streamlit session's memory.
+
+    Sessions register their PlanHistory and ProgressStore objects and report
+    their measured size; a background thread spills the plans and progress
+    of sessions idle for `idle_seconds` and forgets (and deletes the spill
+    files of) sessions not seen for `expire_seconds`. A session that comes
+    back after expiring keeps only what was still in memory, and its plans
+    are spilled again the next time it goes idle. An expired session is
+    dropped once its state has been garbage-collected.
+    """
+
+    def __init__(self, spill_dir=SPILL_DIR, idle_seconds=IDLE_SECONDS, expire_seconds=EXPIRE_SECONDS,
+                 measure_every=10.0):
+        self.spill_dir = spill_dir
+        self.idle_seconds = idle_seconds
+        self.expire_seconds = expire_seconds
+        self.measure_every = measure_every
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.stats = {'released': 0, 'expired': 0}
+        threading.Thread(target=self._sweep_loop, name='session-sweeper', daemon=True).start()
+
+    def history(self, session_id, kind, max_in_memory=PLAN_HISTORY):
+        """A new PlanHistory for `kind` ('workout', 'meal', ...) owned by this session."""
+        entry = self._entry(session_id)
+        history = PlanHistory(os.path.join(self.spill_dir, session_id, kind), max_in_memory)
+        with self._lock:
+            entry.add(history)
+        return history
+
+    def progress_store(self, session_id):
+        """A new ProgressStore owned by this session, spilled with its plans."""
+        entry = self._entry(session_id)
+        store = ProgressStore(spill_path=os.path.join(self.spill_dir, session_id, 'progress.json.gz'))
+        with self._lock:
+            entry.add(store)
+        return store
+
+    def _entry(self, session_id):
+        with self._lock:
+            if session_id not in self._sessions:
+                self._sessions[session_id] = SessionEntry(session_id)
+            return self._sessions[session_id]
+
+    def touch(self, session_id, state, shared=()):
+        """
+        Mark the session active; re-measure its state (a dict of session values)
+        at most every `measure_every` seconds. `shared` objects are not counted.
+        """
+        entry = self._entry(session_id)
+        now = time.time()
+        entry.last_seen = now
+        entry.released = entry.expired = False
+        if now - entry.measured_at >= self.measure_every:
+            entry.bytes = deep_sizeof(state, exclude=shared)
+            entry.measured_at = now
+        return entry.bytes
+
+    def release_idle(self, now=None):
+        now = now or time.time()
+        with self._lock:
+            entries = list(self._sessions.values())
+        for entry in entries:
+            idle = now - entry.last_seen
+            histories = entry.histories
+            if entry.expired:
+                # Dropped once the session's state has been garbage-collected
+                if not histories:
+                    with self._lock:
+                        if entry.expired:
+                            self._sessions.pop(entry.session_id, None)
+            elif idle >= self.expire_seconds:
+                # A still-open page must not look up versions whose files are gone. The entry
+                # keeps its histories so they are spilled and counted again if the page returns
+                for history in histories:
+                    history.forget_spilled()
+                shutil.rmtree(os.path.join(self.spill_dir, entry.session_id), ignore_errors=True)
+                entry.bytes = sum(deep_sizeof(h) for h in histories)
+                entry.expired = True
+                with self._lock:
+                    self.stats['expired'] += 1
+            elif idle >= self.idle_seconds and not entry.released:
+                for history in histories:
+                    history.spill_all()
+                entry.bytes = sum(deep_sizeof(h) for h in histories)
+                entry.released = True
+                with self._lock:
+                    self.stats['released'] += 1
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(min(60.0, self.idle_seconds / 4))
+            try:
+                self.release_idle()
+            except Exception as e:
+                print("Session sweep failed:", e)
+
+    def report(self):
+        with self._lock:
+            entries = list(self._sessions.values())
+        active = [e for e in entries if not e.released and not e.expired]
+        return {
+            'sessions': len(entries),
+            'active_sessions': len(active),
+            'bytes_total': sum(e.bytes for e in entries),
+            'bytes_max': max((e.bytes for e in entries), default=0),
+            'spilled_bytes': sum(h.spilled_bytes for e in entries for h in e.histories),
+            'per_session': {e.session_id: e.bytes for e in entries},
+            **self.stats,
+        }
@@ -0,0 +1,58 @@
+import pytest
+
+from exercise_catalog import get_exercise_catalog
+
+
+@pytest.fixture(scope='module')
+def catalog():
+    return get_exercise_catalog()
+
+
+def name_of(catalog, query):
+    i = catalog.lookup(query)
+    return None if i is None else catalog.names[i]
+
+
+@pytest.mark.parametrize('query, expected', [
+    # Generic names get the generic entry, not a stem or word lookalike
+    ('Rowing', 'Rowing machine moderate'),          # was "Upright row"
+    ('Walking', 'Walking 3.0 mph'),                 # was "Walking lunge"
+    ('Squat', 'Bodyweight squat'),                  # was "Hack squat"
+    ('Indoor rowing', 'Rowing machine moderate'),   # was "Outdoor rowing"
+    # Exact names and whole-word matches
+    ('Upright row', 'Upright row'),
+    ('Outdoor rowing', 'Outdoor rowing'),
+    ('Walking lunges', 'Walking lunge'),
+    ('Push-ups', 'Push-up'),
+    ('Dumbbell lunges', 'Dumbbell walking lunge'),
+    ('Tennis', 'Tennis singles'),
+    ('Bench press', 'Barbell bench press'),
+    # Stems only help multi-word queries; difflib only near misses
+    ('Freestyle swim', 'Freestyle swimming slow'),
+    ('Conventional deadlfit', 'Conventional deadlift'),
+])
+def test_lookup(catalog, query, expected):
+    assert name_of(catalog, query) == expected
+
+
+@pytest.mark.parametrize('query', [
+    'Core workout',   # was "Core yoga flow"
+    'Row',            # upright, inverted, bent-over... no single answer
+    'Climbing',
+    '',
+])
+def test_lookup_unsure_returns_none(catalog, query):
+    assert catalog.lookup(query) is None
+    assert catalog.met_for(query) is None
+
+
+@pytest.mark.parametrize('preference, expected', [
+    ('weights', 'Weight training'),
+    ('swim', 'Swimming'),
+    ('HIIT workout', 'HIIT'),
+    ('Yoga class', 'Yoga'),
+    ('Interval training', None),   # was "Weight training" via "training"
+    ('Training', None),
+])
+def test_match_category(catalog, preference, expected):
+    assert catalog.match_category(preference) == expected
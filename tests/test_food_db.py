@@ -0,0 +1,44 @@
+import pytest
+
+from food_db import get_food_db
+
+
+@pytest.fixture(scope='module')
+def db():
+    return get_food_db()
+
+
+def name_of(db, query):
+    i = db.lookup(query)
+    return None if i is None else db.names[i]
+
+
+@pytest.mark.parametrize('query, expected', [
+    # Plurals, aliases and whole-word matches
+    ('Eggs', 'egg'),
+    ('blueberry', 'blueberries'),
+    ('milk', 'whole milk'),
+    ('cooked rice', 'white rice cooked'),
+    ('grilled chicken breast', 'chicken breast'),
+    ('brown rice', 'brown rice cooked'),
+    ('almond milk', 'almond milk unsweetened'),
+    ('lentils', 'lentils cooked'),
+    ('grilled salmon', 'salmon'),
+    ('tuna in water', 'canned tuna in water'),
+    # Unique prefixes
+    ('bage', 'bagel'),
+])
+def test_lookup_matches(db, query, expected):
+    assert name_of(db, query) == expected
+
+
+@pytest.mark.parametrize('query', [
+    # A food the query only names part of is a guess
+    'water',     # was "canned tuna in water", and not "watermelon" either
+    'oil',       # was "olive oil"
+    'vinegar',   # was "balsamic vinegar"
+    'pepper',    # was "bell pepper"
+    'ric',       # ambiguous prefix
+])
+def test_lookup_rejects_low_confidence(db, query):
+    assert db.lookup(query) is None
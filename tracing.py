@@ -0,0 +1,203 @@
+"""
+Lightweight tracing spans.
+
+    with span('plotly.risk_radar', cat='plotly', plan_id=plan_id):
+        ...
+
+    @traced(cat='coach')
+    def generate_workout_plan(...):
+        ...
+
+Spans nest through a context variable, so a span opened in a plan job or a
+hedged attempt records the span that submitted it as its parent. Finished
+spans go to a rolling in-memory buffer that can be exported as Chrome
+trace-event JSON (open it in chrome://tracing or https://ui.perfetto.dev).
+
+Tracing is off unless COVERFITNESS_TRACE is set; while off, span() returns a
+shared no-op object and traced functions only pay one attribute check.
+
+    COVERFITNESS_TRACE          enable tracing                          (off)
+    COVERFITNESS_TRACE_BUFFER   finished spans kept in memory           (20000)
+    COVERFITNESS_TRACE_FILE     write the buffer here at process exit   (unset)
+"""
+import atexit
+from collections import deque
+import contextvars
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+
+ENABLED = os.environ.get('COVERFITNESS_TRACE', '').lower() in ('1', 'true', 'yes', 'on')
+BUFFER_EVENTS = int(os.environ.get('COVERFITNESS_TRACE_BUFFER', 20000))
+TRACE_FILE = os.environ.get('COVERFITNESS_TRACE_FILE')
+
+# Wall-clock anchor for perf_counter, so traces from several processes line up
+_EPOCH_US = time.time() * 1e6 - time.perf_counter() * 1e6
+
+_current = contextvars.ContextVar('coverfitness_span', default=None)
+
+
+def _now_us():
+    return _EPOCH_US + time.perf_counter() * 1e6
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    __slots__ = ('tracer', 'name', 'cat', 'attrs', 'id', 'parent_id', 'start', '_token')
+
+    def __init__(self, tracer, name, cat, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.attrs = attrs
+        self.id = None
+        self.parent_id = None
+        self.start = None
+        self._token = None
+
+    def set(self, **attrs):
+        """Add attributes known only once the span is running (plan id, model, ...)."""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        parent = _current.get()
+        self.parent_id = parent.id if parent is not None else None
+        self.id = next(self.tracer._ids)
+        self._token = _current.set(self)
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = _now_us()
+        try:
+            _current.reset(self._token)
+        except ValueError:
+            _current.set(None)  # exited in another context (generator closed elsewhere)
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.tracer._record(self, end)
+        return False
+
+
+class Tracer:
+    """
+    Process-wide span recorder: a bounded deque of finished spans (oldest
+    dropped first) plus per-name totals that survive the buffer rolling over.
+    """
+
+    def __init__(self, enabled=ENABLED, max_events=BUFFER_EVENTS):
+        self.enabled = enabled
+        self._events = deque(maxlen=max_events)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._threads = {}
+        self._totals = {}  # name -> [count, total_us, max_us]
+        self.dropped = 0
+
+    def span(self, name, cat='app', **attrs):
+        if not self.enabled:
+            return _NOOP
+        return Span(self, name, cat, attrs)
+
+    def traced(self, name=None, cat='app'):
+        """Decorator: run the function inside a span named after it."""
+        def decorator(fn):
+            span_name = name or fn.__qualname__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with Span(self, span_name, cat, {}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def annotate(self, **attrs):
+        """Set attributes on the innermost open span, if any."""
+        current = _current.get()
+        if current is not None:
+            current.set(**attrs)
+
+    def _record(self, span, end):
+        thread = threading.current_thread()
+        event = {
+            'name': span.name,
+            'cat': span.cat,
+            'ph': 'X',
+            'ts': round(span.start, 1),
+            'dur': round(end - span.start, 1),
+            'pid': os.getpid(),
+            'tid': thread.ident,
+            'args': dict(span.attrs, span_id=span.id, parent_id=span.parent_id),
+        }
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self.dropped += 1
+            self._events.append(event)
+            self._threads[thread.ident] = thread.name
+            totals = self._totals.setdefault(span.name, [0, 0.0, 0.0])
+            totals[0] += 1
+            totals[1] += event['dur']
+            totals[2] = max(totals[2], event['dur'])
+
+    # ---------------- export ----------------
+    def events(self):
+        with self._lock:
+            return list(self._events)
+
+    def chrome_trace(self):
+        """The buffer as a Chrome trace-event document (dict)."""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        pid = os.getpid()
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                    for tid, name in threads.items()]
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms',
+                'otherData': {'dropped_spans': self.dropped}}
+
+    def export(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    def summary(self):
+        """{name: {'count', 'total_ms', 'mean_ms', 'max_ms'}}, slowest total first."""
+        with self._lock:
+            totals = {name: list(values) for name, values in self._totals.items()}
+        rows = sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+        return {name: {'count': count, 'total_ms': round(total / 1000, 2),
+                       'mean_ms': round(total / count / 1000, 2), 'max_ms': round(peak / 1000, 2)}
+                for name, (count, total, peak) in rows}
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._totals.clear()
+            self.dropped = 0
+
+
+tracer = Tracer()
+span = tracer.span
+traced = tracer.traced
+annotate = tracer.annotate
+
+if TRACE_FILE:
+    atexit.register(lambda: tracer.export(TRACE_FILE))
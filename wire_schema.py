@@ -0,0 +1,239 @@
+"""
+Compact wire formats for plan completions and their local expansion.
+
+The model's output tokens dominate plan latency, so the 'compact' prompt
+variants (prompt_templates.py) ask for short keys and no numbers that are
+recomputed locally anyway:
+
+    workout  {"s": {"A": [["Swimming", 30, "Full body"], ...]}, "d": {"Monday": "A", ...}}
+    meals    {"h": "<hydration>", "t": {"<name>": [menu, [[food, grams], ...]]},
+              "d": {"Monday": {"x": "<exercise>", "m": {"B": [menu, [[food, grams], ...]] | "<name>"}}}}
+
+The fused prompt (PLANS_FUSED_PROMPT) asks for both at once as {"w": <workout>,
+"m": <meals>}; split_fused_plans takes that apart.
+
+expand_workout_plan / expand_meal_plan rebuild the verbose structures the
+app consumes ({'weekly_plan': [...]} and {day: {'Meals': {...}}}); calories,
+totals and macros are then filled in by recompute_plan_totals and
+fill_macros_from_ingredients as before. Verbose responses pass through
+unchanged, so both prompt variants can run side by side.
+"""
+
+MEAL_NAMES = {'B': 'Breakfast', 'L': 'Lunch', 'D': 'Dinner', 'S': 'Snack'}
+DEFAULT_HYDRATION = 'Stay hydrated throughout the day'
+
+
+def _session_key(index):
+    # A, B, ..., Z, AA, AB, ...
+    key = ''
+    index += 1
+    while index:
+        index, rest = divmod(index - 1, 26)
+        key = chr(ord('A') + rest) + key
+    return key
+
+
+def _number(value, default=0):
+    try:
+        return float(value) if '.' in str(value) else int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _exercise(item):
+    """[name, minutes, target muscle(, kcal)] -> the verbose exercise dict."""
+    if isinstance(item, dict):
+        return item
+    name, minutes, muscle, kcal = (list(item) + [None] * 4)[:4]
+    return {
+        'name': str(name or ''),
+        'duration_min': _number(minutes),
+        'calories_burned': _number(kcal),  # recomputed from kcal/min unless the exercise is unknown
+        'target_muscle': str(muscle or ''),
+    }
+
+
+def expand_workout_plan(response):
+    """Compact workout response -> {'weekly_plan': [...]}; verbose ones are returned as they are."""
+    if not isinstance(response, dict) or 'weekly_plan' in response or 'd' not in response:
+        return response
+    sessions = response.get('s') or {}
+    weekly_plan = []
+    for day, session in (response.get('d') or {}).items():
+        # A day is a session key, or (if the model inlined it) the exercise list itself
+        items = sessions.get(session) if isinstance(session, str) else session
+        if items is None:
+            print(f"Workout day {day} refers to unknown session {session!r}")
+            items = []
+        exercises = [_exercise(item) for item in items if isinstance(item, (list, tuple, dict)) and item]
+        weekly_plan.append({
+            'day': day,
+            'exercises': exercises,
+            'total_duration': sum(ex['duration_min'] for ex in exercises),
+            'total_calories': sum(ex['calories_burned'] for ex in exercises),
+        })
+    return {'weekly_plan': weekly_plan}
+
+
+def compact_workout_plan(plan):
+    """Verbose workout plan -> compact form (for prompts that embed a plan); identical days share a session."""
+    sessions = {}
+    keys = {}
+    days = {}
+    for day_plan in (plan or {}).get('weekly_plan', []):
+        items = tuple((ex.get('name'), ex.get('duration_min'), ex.get('target_muscle'))
+                      for ex in day_plan.get('exercises', []))
+        if items not in keys:
+            keys[items] = _session_key(len(keys))
+            sessions[keys[items]] = [list(item) for item in items]
+        days[day_plan.get('day')] = keys[items]
+    return {'s': sessions, 'd': days}
+
+
+def _meal(value, templates):
+    if isinstance(value, str):
+        value = templates.get(value)
+        if value is None:
+            return None
+    if isinstance(value, dict):
+        return value
+    menu, ingredients = (list(value) + [None, None])[:2]
+    return {
+        'Menu': str(menu or ''),
+        'Ingredients': [{'food': str(item[0]), 'grams': _number(item[1] if len(item) > 1 else None)}
+                        for item in ingredients or [] if isinstance(item, (list, tuple)) and item],
+    }
+
+
+def expand_meal_plan(response):
+    """Compact meal response -> {day: {'Exercise', 'Meals', 'Hydration'}}; verbose ones are returned as they are."""
+    if not isinstance(response, dict) or set(response) - {'h', 't', 'd'} or 'd' not in response:
+        return response
+    hydration = response.get('h') or DEFAULT_HYDRATION
+    templates = response.get('t') or {}
+    meal_plan = {}
+    for day, day_data in (response.get('d') or {}).items():
+        if not isinstance(day_data, dict):
+            continue
+        meals = {}
+        for key, value in (day_data.get('m') or {}).items():
+            meal = _meal(value, templates)
+            if meal is None:
+                print(f"Meal {key} on {day} refers to unknown meal {value!r}")
+                continue
+            meals[MEAL_NAMES.get(key, key)] = meal
+        meal_plan[day] = {
+            'Exercise': day_data.get('x', 'Rest day'),
+            'Meals': meals,
+            'Hydration': day_data.get('h') or hydration,
+        }
+    return meal_plan
+
+
+def compact_meal_plan(meal_plan):
+    """Verbose meal plan -> compact form; used to measure the wire savings (benchmarks/bench_wire.py)."""
+    names = {v: k for k, v in MEAL_NAMES.items()}
+    hydration = [d.get('Hydration') for d in meal_plan.values() if isinstance(d, dict)]
+    common = max(set(hydration), key=hydration.count) if hydration else None
+    templates = {}
+    seen = {}
+    days = {}
+    for day, day_data in meal_plan.items():
+        meals = {}
+        for meal_name, meal in (day_data.get('Meals') or {}).items():
+            wire = [meal.get('Menu', ''), [[i.get('food'), i.get('grams')] for i in meal.get('Ingredients') or []]]
+            signature = repr(wire)
+            if signature in seen:
+                # Second use of the same meal: define it once under "t"
+                templates.setdefault(seen[signature], wire)
+                wire = seen[signature]
+            else:
+                seen[signature] = f"{names.get(meal_name, meal_name)}{len(seen) + 1}"
+            meals[names.get(meal_name, meal_name)] = wire
+        days[day] = {'x': day_data.get('Exercise', 'Rest day'), 'm': meals}
+        if day_data.get('Hydration') != common:
+            days[day]['h'] = day_data.get('Hydration')
+    # Meals used only once stay inline
+    for day_data in days.values():
+        for key, wire in day_data['m'].items():
+            if isinstance(wire, list) and repr(wire) in seen and seen[repr(wire)] in templates:
+                day_data['m'][key] = seen[repr(wire)]
+    return {'h': common, 't': templates, 'd': days}
+
+
+def split_fused_plans(response):
+    """Fused {"w": ..., "m": ...} response -> (workout plan, meal plan), each {} when missing."""
+    if not isinstance(response, dict):
+        return {}, {}
+    workout = expand_workout_plan(response.get('w') or {})
+    meal_plan = expand_meal_plan(response.get('m') or {})
+    return (workout if isinstance(workout, dict) else {}), (meal_plan if isinstance(meal_plan, dict) else {})
+
+
+# JSON Schemas of the plan responses, for backends that constrain decoding to a
+# grammar (local_llm.py). Each accepts the compact or the verbose form, so the
+# same grammar serves both prompt variants.
+_EXERCISE_ROW = {'type': 'array', 'items': {'anyOf': [{'type': 'string'}, {'type': 'number'}]},
+                 'minItems': 3, 'maxItems': 4}
+_MEAL_ROW = {'type': 'array', 'minItems': 2, 'maxItems': 2,
+             'prefixItems': [{'type': 'string'},
+                             {'type': 'array', 'items': {'type': 'array', 'minItems': 2, 'maxItems': 2,
+                                                         'prefixItems': [{'type': 'string'}, {'type': 'number'}]}}]}
+_COMPACT_WORKOUT = {
+    'type': 'object',
+    'properties': {'s': {'type': 'object', 'additionalProperties': {'type': 'array', 'items': _EXERCISE_ROW}},
+                   'd': {'type': 'object', 'additionalProperties': {'type': 'string'}}},
+    'required': ['s', 'd'],
+}
+_VERBOSE_WORKOUT = {
+    'type': 'object',
+    'properties': {'weekly_plan': {'type': 'array', 'items': {
+        'type': 'object',
+        'properties': {'day': {'type': 'string'},
+                       'exercises': {'type': 'array', 'items': {
+                           'type': 'object',
+                           'properties': {'name': {'type': 'string'}, 'duration_min': {'type': 'number'},
+                                          'calories_burned': {'type': 'number'}, 'target_muscle': {'type': 'string'}},
+                           'required': ['name', 'duration_min', 'calories_burned', 'target_muscle']}},
+                       'total_duration': {'type': 'number'}, 'total_calories': {'type': 'number'}},
+        'required': ['day', 'exercises']}}},
+    'required': ['weekly_plan'],
+}
+_COMPACT_MEAL_DAY = {
+    'type': 'object',
+    'properties': {'x': {'type': 'string'}, 'h': {'type': 'string'},
+                   'm': {'type': 'object', 'additionalProperties': {'anyOf': [_MEAL_ROW, {'type': 'string'}]}}},
+    'required': ['x', 'm'],
+}
+_COMPACT_MEAL = {
+    'type': 'object',
+    'properties': {'h': {'type': 'string'},
+                   't': {'type': 'object', 'additionalProperties': _MEAL_ROW},
+                   'd': {'type': 'object', 'additionalProperties': _COMPACT_MEAL_DAY}},
+    'required': ['d'],
+}
+_VERBOSE_MEAL = {
+    'type': 'object',
+    'additionalProperties': {
+        'type': 'object',
+        'properties': {
+            'Exercise': {'type': 'string'},
+            'Meals': {'type': 'object', 'additionalProperties': {
+                'type': 'object',
+                'properties': {'Menu': {'type': 'string'},
+                               'Ingredients': {'type': 'array', 'items': {
+                                   'type': 'object',
+                                   'properties': {'food': {'type': 'string'}, 'grams': {'type': 'number'}},
+                                   'required': ['food', 'grams']}}},
+                'required': ['Menu', 'Ingredients']}},
+            'Hydration': {'type': 'string'}},
+        'required': ['Exercise', 'Meals']},
+}
+
+JSON_SCHEMAS = {
+    'workout': {'anyOf': [_COMPACT_WORKOUT, _VERBOSE_WORKOUT]},
+    'meal': {'anyOf': [_COMPACT_MEAL, _VERBOSE_MEAL]},
+    'meal_days': _COMPACT_MEAL,
+    'plans': {'type': 'object', 'properties': {'w': _COMPACT_WORKOUT, 'm': _COMPACT_MEAL}, 'required': ['w', 'm']},
+    'recommendations': {'type': 'array', 'items': {'type': 'string'}, 'minItems': 2, 'maxItems': 2},
+}
@@ -0,0 +1,92 @@
+import difflib
+
+from meal_macros import to_number
+
+
+def _normalize(name):
+    return ' '.join(str(name).lower().replace('-', ' ').replace('_', ' ').split())
+
+
+def match_activity(name, kcal_per_min, fuzzy=True):
+    """
+    Find the kcal/min entry for an exercise name coming back from the LLM.
+    Tries exact and case-insensitive matches, then (if fuzzy) whole-word
+    containment and difflib matching.
+    """
+    if name in kcal_per_min:
+        return name
+    normalized = {_normalize(k): k for k in kcal_per_min}
+    key = _normalize(name)
+    if key in normalized:
+        return normalized[key]
+    if not fuzzy:
+        return None
+    # "Freestyle Swimming" -> "Swimming", "Bodyweight exercises" -> "Bodyweight";
+    # whole words only, so "Row" is not "Rowing". Most shared words wins, then the shorter name.
+    words = set(key.split())
+    contained = [(len(words & set(norm.split())), -len(norm), original) for norm, original in normalized.items()
+                 if set(norm.split()) <= words or words <= set(norm.split())]
+    if contained:
+        return max(contained)[2]
+    close = difflib.get_close_matches(key, list(normalized), n=1, cutoff=0.75)
+    return normalized[close[0]] if close else None
+
+
+def recompute_workout_totals(plan, kcal_per_min, weekly_target=None, lookup=None):
+    """
+    Rewrite calories_burned for every exercise as kcal/min x duration_min and
+    rebuild each day's total_duration / total_calories from its exercises.
+
+    The rate comes from an exact entry in `kcal_per_min`, then `lookup(name)`
+    (e.g. the exercise catalog), then a fuzzy entry in `kcal_per_min`.
+    Exercises that match nothing keep the per-minute rate implied by the
+    model's own numbers, so only their total is re-derived.
+
+    Returns a report with the weekly total and its deviation from weekly_target.
+    """
+    weekly_total = 0.0
+    unmatched = []
+
+    days = plan.get('weekly_plan', []) if isinstance(plan, dict) else []
+    for day_plan in days if isinstance(days, list) else []:
+        if not isinstance(day_plan, dict):
+            continue
+        day_duration = 0
+        day_calories = 0.0
+        for ex in day_plan.get('exercises', []):
+            # LLM values like "30 min" count; anything unparseable counts as missing
+            duration = to_number(ex.get('duration_min'), 0.0)
+            if isinstance(ex.get('duration_min'), str):
+                ex['duration_min'] = int(duration) if duration.is_integer() else duration
+            name = ex.get('name', '')
+            activity = match_activity(name, kcal_per_min, fuzzy=False)
+            rate = kcal_per_min[activity] if activity is not None else None
+            if rate is None and lookup is not None:
+                rate = lookup(name)
+            if rate is None:
+                activity = match_activity(name, kcal_per_min)
+                rate = kcal_per_min[activity] if activity is not None else None
+            if rate is None:
+                unmatched.append(ex.get('name', ''))
+                stated = to_number(ex.get('calories_burned'), 0.0)
+                rate = stated / duration if duration else 0.0
+
+            ex['calories_burned'] = round(rate * duration, 1)
+            day_duration += duration
+            day_calories += ex['calories_burned']
+
+        day_plan['total_duration'] = int(round(day_duration))
+        day_plan['total_calories'] = round(day_calories, 1)
+        weekly_total += day_calories
+
+    report = {
+        'weekly_total': round(weekly_total, 1),
+        'weekly_target': weekly_target,
+        'deviation': None,
+        'deviation_pct': None,
+        'unmatched_exercises': sorted(set(unmatched)),
+    }
+    if weekly_target:
+        report['deviation'] = round(weekly_total - weekly_target, 1)
+        report['deviation_pct'] = round((weekly_total - weekly_target) / weekly_target * 100, 1)
+    return report